@@ -0,0 +1,81 @@
+"""
+CPU cost and transfer savings of compressing dynamic responses.
+
+Renders the landing, login and register pages and a story-list JSON body
+through the app, then compresses each body at several brotli and gzip
+levels and reports compressed size and CPU time per response. It finishes
+by timing whole requests through the middleware with and without an
+Accept-Encoding header.
+
+Usage: python benchmarks/bench_compression.py [--repeat 200]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Use the in-memory database profile for the app created at import time
+os.environ.setdefault('STORYQUEST_DB_PROFILE', 'test')
+
+from src.main import app
+from src.utils.compression import compress
+
+PAGES = ['/', '/auth/login', '/auth/register']
+
+LEVELS = [('gzip', 1), ('gzip', 6), ('gzip', 9), ('br', 1), ('br', 4), ('br', 6), ('br', 11)]
+
+def story_list_json(count=50):
+    # Shape of a StoryCard listing as the JSON endpoints return it
+    return json.dumps({'stories': [{
+        'id': i, 'title': f'The Secret of Castle {i}', 'description': 'A brave fox sets out to find a lost map.',
+        'author': f'writer{i % 7}', 'age_group': '7-9', 'theme': 'adventure', 'like_count': i * 3,
+        'view_count': i * 11, 'share_date': '2026-10-01T12:00:00', 'liked': i % 2 == 0,
+    } for i in range(count)]}).encode()
+
+def collect_bodies():
+    app.config['COMPRESS_ENABLED'] = False
+    client = app.test_client()
+    bodies = [(path, client.get(path).data) for path in PAGES]
+    app.config['COMPRESS_ENABLED'] = True
+    bodies.append(('story list JSON', story_list_json()))
+    return bodies
+
+def cpu_per_call(fn, repeat):
+    start = time.process_time()
+    for _ in range(repeat):
+        fn()
+    return (time.process_time() - start) / repeat
+
+def measure_levels(bodies, repeat):
+    print(f"{'response':<18} {'encoding':<9} {'bytes':>8} {'ratio':>7} {'CPU ms':>8}")
+    for name, body in bodies:
+        print(f"{name:<18} {'identity':<9} {len(body):>8} {1:>7.2f} {0:>8.3f}")
+        for encoding, level in LEVELS:
+            option = {'brotli_quality': level} if encoding == 'br' else {'gzip_level': level}
+            size = len(compress(body, encoding, **option))
+            cpu = cpu_per_call(lambda: compress(body, encoding, **option), repeat)
+            print(f"{'':<18} {f'{encoding}-{level}':<9} {size:>8} {size / len(body):>7.2f} {cpu * 1000:>8.3f}")
+
+def measure_requests(repeat):
+    client = app.test_client()
+    print(f"\n{'request GET /':<18} {'bytes':>8} {'CPU ms':>8}")
+    for label, accept in [('identity', ''), ('gzip', 'gzip'), ('br', 'br')]:
+        headers = {'Accept-Encoding': accept} if accept else {}
+        size = len(client.get('/', headers=headers).data)
+        cpu = cpu_per_call(lambda: client.get('/', headers=headers), repeat)
+        print(f"{label:<18} {size:>8} {cpu * 1000:>8.3f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    with app.app_context():
+        measure_levels(collect_bodies(), args.repeat)
+        measure_requests(max(args.repeat // 4, 1))
+
+if __name__ == '__main__':
+    main()
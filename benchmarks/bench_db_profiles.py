@@ -0,0 +1,97 @@
+"""
+Read/write throughput of each SQLite storage-engine profile under concurrent workers.
+
+Every profile's pragmas are applied to a fresh temporary database file, so the
+numbers compare journal/sync/cache settings like for like (the 'test' profile
+is in-memory in practice). 'baseline' is SQLite's defaults: rollback journal,
+synchronous FULL, no busy timeout.
+
+Usage: python benchmarks/bench_db_profiles.py [--workers 8] [--seconds 5] [--write-ratio 0.2]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import threading
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils.db_config import PROFILES, register_pragma_listener
+
+SEED_STORIES = 2000
+
+def make_engine(path, pragmas):
+    engine = create_engine(f"sqlite:///{path}", pool_size=32, max_overflow=0)
+    register_pragma_listener(engine, pragmas)
+    return engine
+
+def seed(engine):
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE stories (id INTEGER PRIMARY KEY, title TEXT, content TEXT, "
+            "view_count INTEGER DEFAULT 0, updated_at TEXT)"
+        ))
+        conn.execute(
+            text("INSERT INTO stories (title, content, updated_at) VALUES (:t, :c, datetime('now'))"),
+            [{'t': f'Story {i}', 'c': 'x' * 2000} for i in range(SEED_STORIES)]
+        )
+
+def worker(engine, deadline, write_ratio, counts, lock):
+    reads = writes = busy = 0
+    rng = random.Random()
+    while time.perf_counter() < deadline:
+        story_id = rng.randint(1, SEED_STORIES)
+        try:
+            if rng.random() < write_ratio:
+                # Autosave-shaped write: small update in its own transaction
+                with engine.begin() as conn:
+                    conn.execute(text(
+                        "UPDATE stories SET view_count = view_count + 1, updated_at = datetime('now') WHERE id = :id"
+                    ), {'id': story_id})
+                writes += 1
+            else:
+                with engine.connect() as conn:
+                    conn.execute(text("SELECT title, content FROM stories WHERE id = :id"), {'id': story_id}).fetchone()
+                reads += 1
+        except OperationalError:
+            busy += 1
+    with lock:
+        counts['reads'] += reads
+        counts['writes'] += writes
+        counts['busy'] += busy
+
+def run(name, pragmas, workers, seconds, write_ratio):
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_engine(os.path.join(tmp, 'bench.db'), pragmas)
+        seed(engine)
+        counts = {'reads': 0, 'writes': 0, 'busy': 0}
+        lock = threading.Lock()
+        deadline = time.perf_counter() + seconds
+        threads = [threading.Thread(target=worker, args=(engine, deadline, write_ratio, counts, lock))
+                   for _ in range(workers)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        engine.dispose()
+    print(f"{name:<30} {counts['reads'] / seconds:>12.0f} {counts['writes'] / seconds:>12.0f} {counts['busy']:>8}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--write-ratio', type=float, default=0.2)
+    args = parser.parse_args()
+
+    print(f"{args.workers} workers, {args.seconds}s per profile, {args.write_ratio:.0%} writes")
+    print(f"{'profile':<30} {'reads/s':>12} {'writes/s':>12} {'busy':>8}")
+    run('baseline', {}, args.workers, args.seconds, args.write_ratio)
+    for name, profile in PROFILES.items():
+        run(name, profile['pragmas'], args.workers, args.seconds, args.write_ratio)
+
+if __name__ == '__main__':
+    main()
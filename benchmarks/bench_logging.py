@@ -0,0 +1,86 @@
+"""
+Request overhead of logging: disabled, synchronous handlers, and queued.
+
+Sends the same requests through the app three times. "disabled" turns the
+storyquest logger off. "synchronous" attaches the console and rotating file
+handlers to the logger directly, as every request used to. "queued" is the
+QueueHandler/listener pipeline the app now uses. Reports wall time per
+request on the request thread, process CPU per request (including the
+listener thread) and, for the queue, how long the backlog took to write.
+Log files go to a temporary directory and console output to /dev/null.
+
+Usage: python benchmarks/bench_logging.py [--requests 500]
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Use the in-memory database profile for the app created at import time
+os.environ.setdefault('STORYQUEST_DB_PROFILE', 'test')
+
+from src.main import app
+from src.utils.logging_config import logger, console_handler, create_file_handlers, pipeline, LogPipeline
+
+PAGES = ['/auth/login', '/auth/register', '/story/search?q=fox']
+
+def install(mode, directory):
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    logger.disabled = mode == 'disabled'
+    handlers = [console_handler] + create_file_handlers(directory)
+    if mode == 'synchronous':
+        for handler in handlers:
+            logger.addHandler(handler)
+        return None, handlers
+    queued = LogPipeline(handlers)
+    logger.addHandler(queued.queue_handler)
+    queued.start()
+    return queued, handlers
+
+def run(mode, count):
+    directory = tempfile.mkdtemp(prefix='storyquest-logs-')
+    queued, handlers = install(mode, directory)
+    client = app.test_client()
+    try:
+        for path in PAGES:
+            client.get(path)
+        wall = cpu = 0.0
+        for i in range(count):
+            path = PAGES[i % len(PAGES)]
+            start_wall, start_cpu = time.perf_counter(), time.process_time()
+            client.get(path)
+            wall += time.perf_counter() - start_wall
+            cpu += time.process_time() - start_cpu
+        start = time.perf_counter()
+        if queued is not None:
+            queued.stop()
+        drain = time.perf_counter() - start
+    finally:
+        for handler in handlers[1:]:
+            handler.close()
+        shutil.rmtree(directory, ignore_errors=True)
+    return wall / count, cpu / count, drain
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=500)
+    args = parser.parse_args()
+
+    # The app's own pipeline is replaced for each run
+    pipeline.stop()
+    app.config['PAGE_CACHE_ENABLED'] = False
+    console_handler.setStream(open(os.devnull, 'w'))
+
+    results = {mode: run(mode, args.requests) for mode in ('disabled', 'synchronous', 'queued')}
+    baseline = results['disabled'][0]
+    print(f"{'logging':<12} {'wall ms/req':>12} {'overhead ms':>12} {'CPU ms/req':>11} {'drain ms':>9}")
+    for mode, (wall, cpu, drain) in results.items():
+        print(f"{mode:<12} {wall * 1000:>12.3f} {(wall - baseline) * 1000:>12.3f} {cpu * 1000:>11.3f} {drain * 1000:>9.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+Request overhead of the per-request metrics, on and off.
+
+Sends the same requests with METRICS_ENABLED off and on, alternating
+rounds so drift in the machine affects both alike, and reports wall time
+per request and the difference. The pages cover a plain form, a search
+with SQL and a 404. Metrics files go to a temporary directory and logging
+is turned off so it does not drown the difference.
+
+Usage: python benchmarks/bench_metrics.py [--requests 500] [--rounds 5]
+"""
+import os
+import sys
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Use the in-memory database profile for the app created at import time
+os.environ.setdefault('STORYQUEST_DB_PROFILE', 'test')
+
+from src.main import app
+
+PAGES = ['/auth/login', '/story/search?q=fox', '/no-such-page']
+
+def run(client, enabled, count):
+    app.config['METRICS_ENABLED'] = enabled
+    start = time.perf_counter()
+    for i in range(count):
+        client.get(PAGES[i % len(PAGES)]).data
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='storyquest-metrics-')
+    app.config['METRICS_DIR'] = directory
+    logging.disable(logging.CRITICAL)
+    client = app.test_client()
+    try:
+        for path in PAGES:
+            client.get(path).data
+        totals = {False: 0.0, True: 0.0}
+        for _ in range(args.rounds):
+            for enabled in (False, True):
+                totals[enabled] += run(client, enabled, args.requests)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    count = args.requests * args.rounds
+    off, on = totals[False] / count, totals[True] / count
+    print(f"{'metrics':<8} {'wall ms/req':>12}")
+    print(f"{'off':<8} {off * 1000:>12.3f}")
+    print(f"{'on':<8} {on * 1000:>12.3f}")
+    print(f"overhead {(on - off) * 1000:.3f} ms/req ({(on - off) / off:.1%})")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Memory and time to list public stories as full Story rows versus StoryCard projections.
+
+Seeds 1,000 public stories averaging 50 KB of content each into a temporary
+database, then lists them both ways and reports tracemalloc peak and wall time.
+
+Usage: python benchmarks/bench_story_cards.py [--stories 1000] [--content-kb 50]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import tracemalloc
+from flask import Flask
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.models import db, User, Story, StoryCard
+from src.utils.db_config import configure_database, init_engine_events
+
+def make_app(path):
+    app = Flask(__name__)
+    configure_database(app, 'dev', path)
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    init_engine_events(app, db)
+    return app
+
+def seed(stories, content_kb):
+    user = User(username='bench', email='bench@example.com', password='unused', age_group='7-9')
+    db.session.add(user)
+    db.session.flush()
+    rng = random.Random(42)
+    for i in range(stories):
+        size = int(rng.uniform(0.5, 1.5) * content_kb * 1024)
+        db.session.add(Story(
+            title=f'Story {i}', description=f'A story about number {i}', age_group='7-9',
+            user_id=user.id, is_public=True, is_shared=True, content='x' * size,
+            share_message='m' * (size // 10)
+        ))
+    db.session.commit()
+
+def list_full():
+    return Story.with_authors(Story.query.filter_by(is_public=True, is_shared=True)).all()
+
+def list_cards():
+    return StoryCard.fetch(StoryCard.select().where(Story.is_public == True, Story.is_shared == True))
+
+def measure(name, fn):
+    db.session.expunge_all()
+    tracemalloc.start()
+    start = time.perf_counter()
+    rows = fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:<12} {len(rows):>8} {peak / 1024 / 1024:>12.2f} {elapsed * 1000:>10.1f}")
+    del rows
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--stories', type=int, default=1000)
+    parser.add_argument('--content-kb', type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = make_app(os.path.join(tmp, 'bench.db'))
+        with app.app_context():
+            db.create_all()
+            seed(args.stories, args.content_kb)
+            print(f"{args.stories} stories, ~{args.content_kb} KB content each")
+            print(f"{'listing':<12} {'rows':>8} {'peak MB':>12} {'ms':>10}")
+            measure('Story', list_full)
+            measure('StoryCard', list_cards)
+            db.session.remove()
+            db.engine.dispose()
+
+if __name__ == '__main__':
+    main()
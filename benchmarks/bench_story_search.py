@@ -0,0 +1,114 @@
+"""
+Search latency of the FTS5 index versus the old ILIKE scan.
+
+Seeds a temporary database with synthetic public stories (1M by default;
+expect several minutes and a few GB of disk), then times first-page
+searches for common, rare and multi-word queries.
+
+Usage: python benchmarks/bench_story_search.py [--stories 1000000] [--words 40] [--repeat 5]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import statistics
+from flask import Flask
+from sqlalchemy import text
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.models import db, Story, StoryCard, search_stories
+from src.utils.db_config import configure_database, init_engine_events
+
+VOCABULARY = ('dragon castle forest river wizard princess robot pirate ship island moon star '
+              'garden secret door key map treasure storm cloud mountain cave owl fox bear '
+              'friend school teacher library book song dance rain snow summer winter night').split()
+RARE_WORDS = ['zephyr', 'quokka', 'marmalade']
+
+QUERIES = ['dragon', 'forest wizard', 'zephyr', 'treasure map island', 'drag']
+
+def make_app(path):
+    app = Flask(__name__)
+    configure_database(app, 'production-high-concurrency', path)
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    init_engine_events(app, db)
+    return app
+
+def sentence(rng, words):
+    chosen = [rng.choice(VOCABULARY) for _ in range(words)]
+    if rng.random() < 0.001:
+        chosen[rng.randrange(words)] = rng.choice(RARE_WORDS)
+    return ' '.join(chosen)
+
+def seed(stories, words):
+    rng = random.Random(7)
+    db.session.execute(text(
+        "INSERT INTO users (username, email, password, age_group) VALUES ('bench', 'bench@example.com', 'x', '7-9')"
+    ))
+    batch = []
+    insert = text(
+        "INSERT INTO stories (title, description, content, age_group, theme, is_public, is_shared, "
+        "is_complete, is_draft, like_count, view_count, is_challenge_winner, user_id, updated_at) "
+        "VALUES (:title, :description, :content, :age_group, 'adventure', 1, 1, 1, 0, 0, 0, 0, 1, datetime('now'))"
+    )
+    start = time.perf_counter()
+    for i in range(stories):
+        batch.append({
+            'title': sentence(rng, 4).title(),
+            'description': sentence(rng, 12),
+            'content': sentence(rng, words),
+            'age_group': rng.choice(['4-6', '7-9', '10-12']),
+        })
+        if len(batch) == 10000:
+            db.session.execute(insert, batch)
+            db.session.commit()
+            batch = []
+            print(f"  seeded {i + 1} stories ({time.perf_counter() - start:.0f}s)", end='\r')
+    if batch:
+        db.session.execute(insert, batch)
+        db.session.commit()
+    print(f"  seeded {stories} stories in {time.perf_counter() - start:.0f}s")
+
+def like_search(query):
+    return StoryCard.fetch(StoryCard.select().where(
+        Story.is_public == True,
+        Story.title.ilike(f'%{query}%') | Story.description.ilike(f'%{query}%')
+    ).order_by(Story.updated_at.desc(), Story.id.desc()).limit(21))
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        db.session.expunge_all()
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), max(samples)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--stories', type=int, default=1000000)
+    parser.add_argument('--words', type=int, default=40)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = make_app(os.path.join(tmp, 'bench.db'))
+        with app.app_context():
+            db.create_all()
+            seed(args.stories, args.words)
+            print(f"{'query':<22} {'fts p50 ms':>12} {'fts max':>10} {'like p50 ms':>12} {'like max':>10}")
+            for query in QUERIES:
+                fts = timed(lambda: search_stories(query, per_page=20), args.repeat)
+                like = timed(lambda: like_search(query), args.repeat)
+                print(f"{query:<22} {fts[0]:>12.1f} {fts[1]:>10.1f} {like[0]:>12.1f} {like[1]:>10.1f}")
+            # Filtered search
+            fts = timed(lambda: search_stories('dragon', age_group='4-6', per_page=20), args.repeat)
+            print(f"{'dragon age_group=4-6':<22} {fts[0]:>12.1f} {fts[1]:>10.1f}")
+            db.session.remove()
+            db.engine.dispose()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Template load cost on a worker's first request, cold versus warm.
+
+For every template under src/templates it times get_template() three ways:
+compiled from source with an empty bytecode cache (a fresh deploy), loaded
+from the on-disk bytecode cache (a restarted worker), and from the
+environment's memory (after warm-up). It then times the first GET of a few
+pages with nothing loaded and with the templates warmed.
+
+Usage: python benchmarks/bench_templates.py [--repeat 5]
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Use the in-memory database profile for the app created at import time
+os.environ.setdefault('STORYQUEST_DB_PROFILE', 'test')
+
+from jinja2 import FileSystemBytecodeCache
+from src.main import app
+from src.utils.template_cache import warm_templates
+
+PAGES = ['/', '/auth/login', '/auth/register']
+
+def load_time(env, name):
+    start = time.perf_counter()
+    env.get_template(name)
+    return time.perf_counter() - start
+
+def measure_templates(env, names, repeat):
+    # Best of repeat runs; each run empties the memory cache first
+    cache_dir = tempfile.mkdtemp(prefix='jinja-bench-')
+    env.bytecode_cache = FileSystemBytecodeCache(cache_dir)
+    results = {name: [float('inf')] * 3 for name in names}
+    try:
+        for _ in range(repeat):
+            env.bytecode_cache.clear()
+            env.cache.clear()
+            for name in names:
+                results[name][0] = min(results[name][0], load_time(env, name))
+            env.cache.clear()
+            for name in names:
+                results[name][1] = min(results[name][1], load_time(env, name))
+            for name in names:
+                results[name][2] = min(results[name][2], load_time(env, name))
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+    return results
+
+def measure_pages(env, repeat):
+    client = app.test_client()
+    results = {path: [float('inf')] * 2 for path in PAGES}
+    app.config['PAGE_CACHE_ENABLED'] = False
+    for _ in range(repeat):
+        for path in PAGES:
+            env.cache.clear()
+            env.bytecode_cache.clear()
+            start = time.perf_counter()
+            client.get(path)
+            results[path][0] = min(results[path][0], time.perf_counter() - start)
+            warm_templates(app)
+            start = time.perf_counter()
+            client.get(path)
+            results[path][1] = min(results[path][1], time.perf_counter() - start)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    env = app.jinja_env
+    names = sorted(env.list_templates(extensions=['html']))
+    print(f"{'template':<36} {'source ms':>10} {'bytecode ms':>12} {'memory ms':>10}")
+    results = measure_templates(env, names, args.repeat)
+    for name in names:
+        cold, bytecode, memory = results[name]
+        print(f"{name:<36} {cold * 1000:>10.3f} {bytecode * 1000:>12.3f} {memory * 1000:>10.3f}")
+    totals = [sum(result[i] for result in results.values()) * 1000 for i in range(3)]
+    print(f"{'total':<36} {totals[0]:>10.3f} {totals[1]:>12.3f} {totals[2]:>10.3f}")
+
+    cache_dir = tempfile.mkdtemp(prefix='jinja-bench-')
+    env.bytecode_cache = FileSystemBytecodeCache(cache_dir)
+    try:
+        print(f"\n{'first request':<36} {'cold ms':>10} {'warmed ms':>12}")
+        for path, (cold, warm) in measure_pages(env, args.repeat).items():
+            print(f"{'GET ' + path:<36} {cold * 1000:>10.3f} {warm * 1000:>12.3f}")
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
@@ -7,26 +7,27 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
 # Import database and models
 from src.models import db
+from src.utils.db_config import configure_database, init_engine_events
 
-def reinit_db():
+def reinit_db(profile=None):
     """Drop and recreate all database tables."""
     app = Flask(__name__)
     
-    # Configure the app with correct database path
-    db_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src', 'storyquest.db')
+    # Configure the app with the same profile and path as create_app()
+    profile_name = configure_database(app, profile)
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db_path = app.config['SQLALCHEMY_DATABASE_URI'][len('sqlite:///'):]
     db_dir = os.path.dirname(db_path)
+    print(f"Using database profile '{profile_name}'")
     
     # Ensure the directory exists
-    if not os.path.exists(db_dir):
+    if db_dir and not os.path.exists(db_dir):
         print(f"Creating database directory: {db_dir}")
         os.makedirs(db_dir, exist_ok=True)
     
-    # Configure the app
-    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
-    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-    
     # Initialize extensions
     db.init_app(app)
+    init_engine_events(app, db)
     
     # Create database tables
     with app.app_context():
@@ -37,4 +38,4 @@ def reinit_db():
         print("Database reinitialized successfully!")
 
 if __name__ == '__main__':
-    reinit_db()
+    reinit_db(sys.argv[1] if len(sys.argv) > 1 else None)
@@ -4,15 +4,28 @@ from flask import Flask, render_template, session, redirect, url_for, flash, req
 from flask_login import LoginManager
 from werkzeug.security import generate_password_hash
 import logging
+import click
 
 # Add parent directory to path for imports
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
 # Import logging configuration first
-from src.utils.logging_config import logger
+from src.utils.logging_config import logger, request_logger, LogWriterServer
+from src.utils.db_config import configure_database, init_engine_events, create_missing_indexes, create_missing_columns
+from src.utils.strict_loading import init_strict_loading
+from src.utils.counters import counters
+from src.utils.jobs import job_queue
+from src.utils.images import init_images, collect_unreferenced_uploads
+from src.utils.assets import init_assets, build_images, build_static_assets, image_savings_report
+from src.utils.compression import init_compression
+from src.utils.page_cache import page_cache
+from src.utils.fragment_cache import fragment_cache
+from src.utils.template_cache import init_template_cache, warm_templates
+from src.utils.log_levels import log_levels
+from src.utils.metrics import metrics
 
 # Import database and models
-from src.models import db, User, Story, Character, Setting, StoryElement, Achievement, Progress, Challenge
+from src.models import db, User, Story, Character, Setting, StoryElement, Achievement, Progress, Challenge, rebuild_search_index, rebuild_leaderboards
 
 # Import routes
 from src.routes.auth import auth_bp
@@ -22,15 +35,20 @@ from src.routes.progress import progress_bp
 from src.routes.viral import viral_bp
 from src.routes.main import main_bp
 from src.routes.asset import asset_bp
+from src.routes.admin import admin_bp
+from src.routes.metrics import metrics_bp
 
-def create_app():
+def create_app(db_profile=None):
     app = Flask(__name__)
     
     # Configure the app
     app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'production_key_for_storyquest')
+    # Bearer token for the /admin API; unset, only admin sessions may use it
+    app.config['ADMIN_TOKEN'] = os.environ.get('STORYQUEST_ADMIN_TOKEN')
     
-    # Use SQLite for both development and production to simplify deployment
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///storyquest.db'
+    # Use SQLite for both development and production to simplify deployment;
+    # the profile (dev, test, production-high-concurrency) picks path and pragmas
+    configure_database(app, db_profile)
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     
     # Set debug mode based on environment
@@ -38,6 +56,19 @@ def create_app():
     
     # Initialize extensions
     db.init_app(app)
+    init_engine_events(app, db)
+    init_strict_loading(app)
+    counters.init_app(app)
+    job_queue.init_app(app)
+    init_images(app)
+    init_assets(app)
+    init_compression(app)
+    page_cache.init_app(app)
+    fragment_cache.init_app(app)
+    init_template_cache(app)
+    log_levels.init_app(app)
+    # Outermost middleware, so cached pages and compression are timed too
+    metrics.init_app(app)
     
     # Register blueprints with consistent naming and strict_slashes=False to prevent 308 redirects
     app.register_blueprint(auth_bp, url_prefix='/auth', strict_slashes=False)
@@ -46,6 +77,8 @@ def create_app():
     app.register_blueprint(progress_bp, url_prefix='/progress', strict_slashes=False)
     app.register_blueprint(viral_bp, url_prefix='/viral', strict_slashes=False)
     app.register_blueprint(asset_bp, url_prefix='/asset', strict_slashes=False)
+    app.register_blueprint(admin_bp, url_prefix='/admin', strict_slashes=False)
+    app.register_blueprint(metrics_bp, strict_slashes=False)
     app.register_blueprint(main_bp, strict_slashes=False)
     
     # Add authentication context processor to make session data available to all templates
@@ -70,17 +103,86 @@ def create_app():
     # Log all requests for debugging
     @app.before_request
     def log_request():
-        logger.debug(f"Request: {request.method} {request.path} - Session: {session.get('user_id')}")
+        request_logger.debug("Request: %s %s - Session: %s", request.method, request.path, session.get('user_id'))
     
     # Log all responses for debugging
     @app.after_request
     def log_response(response):
-        logger.debug(f"Response: {response.status_code} - Session: {session.get('user_id')}")
+        request_logger.debug("Response: %s - Session: %s", response.status_code, session.get('user_id'))
         return response
     
+    # Rebuild the full-text story search index: flask --app src.main rebuild-search-index
+    @app.cli.command('rebuild-search-index')
+    def rebuild_search_index_command():
+        count = rebuild_search_index()
+        logger.info(f"Search index rebuilt with {count} stories")
+        print(f"Search index rebuilt with {count} stories")
+    
+    # Recompute leaderboard totals from scratch: flask --app src.main rebuild-leaderboards
+    @app.cli.command('rebuild-leaderboards')
+    def rebuild_leaderboards_command():
+        count = rebuild_leaderboards()
+        logger.info(f"Leaderboards rebuilt for {count} users")
+        print(f"Leaderboards rebuilt for {count} users")
+    
+    # Delete uploads no character or setting uses any more: flask --app src.main gc-uploads
+    @app.cli.command('gc-uploads')
+    @click.option('--grace-period', type=int, default=None, help='Seconds an unreferenced upload is kept')
+    def gc_uploads_command(grace_period):
+        count = collect_unreferenced_uploads(grace_period)
+        logger.info(f"Garbage collection removed {count} uploads")
+        print(f"Garbage collection removed {count} uploads")
+    
+    # Resize and recompress the bundled images, then report per-template savings:
+    # flask --app src.main build-images
+    @app.cli.command('build-images')
+    @click.option('--force', is_flag=True, help='Rebuild images that have not changed')
+    def build_images_command(force):
+        manifest = build_images(force=force)
+        logger.info(f"Built variants of {len(manifest)} images")
+        print(f"Built variants of {len(manifest)} images")
+        print(f"{'Template':<32} {'Images':>6} {'Before':>12} {'After':>10} {'Saved':>12}")
+        for template, count, before, after in image_savings_report(manifest):
+            saved = before - after
+            print(f"{template:<32} {count:>6} {before:>12,} {after:>10,} {saved:>12,} ({saved / before:.0%})")
+    
+    # Build images, then fingerprint and precompress all static files:
+    # flask --app src.main build-assets
+    @app.cli.command('build-assets')
+    def build_assets_command():
+        build_images()
+        manifest = build_static_assets()
+        compressed = sum(1 for entry in manifest.values() if entry['encodings'])
+        logger.info(f"Fingerprinted {len(manifest)} static files, {compressed} precompressed")
+        print(f"Fingerprinted {len(manifest)} static files, {compressed} precompressed")
+    
+    # Write this host's log files for every worker; start workers with
+    # STORYQUEST_LOG_SOCKET set to the same path:
+    # flask --app src.main run-log-writer --socket /run/storyquest/log.sock
+    @app.cli.command('run-log-writer')
+    @click.option('--socket', 'socket_path', required=True, help='Unix socket workers send records to')
+    def run_log_writer_command(socket_path):
+        server = LogWriterServer(socket_path)
+        logger.info(f"Log writer listening on {socket_path}")
+        try:
+            server.serve_forever()
+        finally:
+            server.server_close()
+    
+    # Run background jobs in this process: flask --app src.main run-jobs --workers 2
+    @app.cli.command('run-jobs')
+    @click.option('--workers', default=1, help='Number of worker threads')
+    def run_jobs_command(workers):
+        logger.info(f"Starting {workers} job workers")
+        job_queue.run_workers(workers)
+    
     # Create database tables if they don't exist
     with app.app_context():
+        # Columns first: indexes and anything create_all builds may use
+        # columns that older databases lack
+        create_missing_columns(db)
         db.create_all()
+        create_missing_indexes(db)
         
         # Create admin user if it doesn't exist
         admin = User.query.filter_by(username='admin').first()
@@ -95,6 +197,10 @@ def create_app():
             db.session.commit()
             logger.info("Admin user created")
     
+    # Compile templates now rather than on the first requests for them
+    if app.config['TEMPLATE_WARMUP']:
+        warm_templates(app)
+    
     logger.info("Application initialized successfully")
     return app
 
@@ -1,11 +1,19 @@
 from src.models.user import db, User
 from src.models.story import Story
+from src.models.story_card import StoryCard
+from src.models.story_like import StoryLike
+from src.models.story_search import StorySearchResult, search_stories, rebuild_search_index
 from src.models.character import Character
 from src.models.setting import Setting
 from src.models.story_element import StoryElement
 from src.models.achievement import Achievement
+from src.models.achievement_catalog import achievement_catalog
 from src.models.progress import Progress
 from src.models.challenge import Challenge
+from src.models.job import Job
+from src.models.upload import Upload, rebuild_upload_refs
+from src.models.user_stats import UserStats, get_leaderboard, rebuild_leaderboards
+from src.models.achievement_rules import ACHIEVEMENT_RULES, award_achievements
 
 # Import all models here to make them available when importing from src.models
-__all__ = ['db', 'User', 'Story', 'Character', 'Setting', 'StoryElement', 'Achievement', 'Progress', 'Challenge']
+__all__ = ['db', 'User', 'Story', 'StoryCard', 'StoryLike', 'StorySearchResult', 'search_stories', 'rebuild_search_index', 'Character', 'Setting', 'StoryElement', 'Achievement', 'achievement_catalog', 'Progress', 'Challenge', 'Job', 'Upload', 'rebuild_upload_refs', 'UserStats', 'get_leaderboard', 'rebuild_leaderboards', 'ACHIEVEMENT_RULES', 'award_achievements']
@@ -24,8 +24,9 @@ class Achievement(db.Model):
     
     @classmethod
     def get_all_achievements(cls):
-        """Get all achievements with efficient query"""
-        return cls.query.order_by(cls.points.desc()).all()
+        """Get all achievements from the in-process catalog, most points first"""
+        from src.models.achievement_catalog import achievement_catalog
+        return achievement_catalog.all()
     
     @classmethod
     def get_user_achievements(cls, user):
@@ -34,12 +35,9 @@ class Achievement(db.Model):
     
     @classmethod
     def get_available_achievements(cls, user):
-        """Get achievements not yet earned by a specific user"""
-        earned_ids = [a.id for a in user.achievements]
-        if earned_ids:
-            return cls.query.filter(~cls.id.in_(earned_ids)).all()
-        else:
-            return cls.get_all_achievements()
+        """Get achievements not yet earned by a specific user, from the catalog"""
+        from src.models.achievement_catalog import achievement_catalog
+        return achievement_catalog.available(achievement_catalog.earned_ids(user.id))
     
     def __repr__(self):
         return f'<Achievement {self.name}>'
@@ -0,0 +1,124 @@
+import time
+import logging
+import threading
+from collections import namedtuple
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from src.models.user import db, user_achievements
+from src.models.achievement import Achievement
+
+# Get logger
+logger = logging.getLogger('storyquest')
+
+# Immutable copy of an achievements row; safe to share between requests and
+# threads, and never attached to a session
+CatalogAchievement = namedtuple('CatalogAchievement',
+                                ['id', 'name', 'description', 'criteria', 'badge_image', 'points'])
+
+# Seconds a snapshot may be served before it is reloaded, so edits made by
+# other processes show up; edits through this process's ORM invalidate at once
+CATALOG_TTL = 300
+
+_DIRTY_KEY = 'achievement_catalog_dirty'
+
+
+class AchievementCatalog:
+    """
+    Process-local, versioned cache of the achievements table
+
+    The table is tiny and almost never changes, but was queried on every
+    award attempt and achievements page. A snapshot holds the rows ordered
+    by points with id and name indexes; committing an insert, update or
+    delete of an Achievement bumps the version and drops the snapshot.
+    """
+
+    def __init__(self, ttl=CATALOG_TTL):
+        self.ttl = ttl
+        self.version = 0
+        self._lock = threading.Lock()
+        self._snapshot = None
+
+    def invalidate(self):
+        """Drop the snapshot; the next read reloads the table"""
+        with self._lock:
+            self.version += 1
+            self._snapshot = None
+
+    def _get_snapshot(self):
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - snapshot['loaded_at'] < self.ttl:
+            return snapshot
+        with self._lock:
+            version = self.version
+        rows = [CatalogAchievement(*row) for row in db.session.execute(
+            db.select(Achievement.id, Achievement.name, Achievement.description, Achievement.criteria,
+                      Achievement.badge_image, Achievement.points)
+            .order_by(Achievement.points.desc(), Achievement.id)
+        )]
+        snapshot = {
+            'version': version,
+            'loaded_at': time.monotonic(),
+            'all': rows,
+            'by_id': {row.id: row for row in rows},
+            'by_name': {row.name: row for row in rows},
+        }
+        with self._lock:
+            # An invalidation while loading means the rows may be stale already
+            if self.version == version:
+                self._snapshot = snapshot
+        logger.debug(f"Achievement catalog v{version} loaded with {len(rows)} achievements")
+        return snapshot
+
+    def all(self):
+        """Every achievement, most points first"""
+        return self._get_snapshot()['all']
+
+    def get(self, achievement_id):
+        return self._get_snapshot()['by_id'].get(achievement_id)
+
+    def get_by_name(self, name):
+        return self._get_snapshot()['by_name'].get(name)
+
+    def earned_ids(self, user_id):
+        """Ids of the achievements a user has, read from user_achievements alone"""
+        return set(db.session.execute(
+            db.select(user_achievements.c.achievement_id).where(user_achievements.c.user_id == user_id)
+        ).scalars())
+
+    def earned(self, earned_ids):
+        """Catalog entries for a set of earned ids, most points first"""
+        return [achievement for achievement in self.all() if achievement.id in earned_ids]
+
+    def available(self, earned_ids):
+        """Catalog entries not in a set of earned ids, most points first"""
+        return [achievement for achievement in self.all() if achievement.id not in earned_ids]
+
+
+# Shared process-wide instance
+achievement_catalog = AchievementCatalog()
+
+
+@event.listens_for(Achievement, 'after_insert')
+@event.listens_for(Achievement, 'after_update')
+@event.listens_for(Achievement, 'after_delete')
+def _mark_catalog_dirty(mapper, connection, target):
+    Session.object_session(target).info[_DIRTY_KEY] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session):
+    if session.info.pop(_DIRTY_KEY, False):
+        achievement_catalog.invalidate()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_dirty_on_rollback(session):
+    # A snapshot loaded after the flush may hold the rolled back rows
+    if session.info.pop(_DIRTY_KEY, False):
+        achievement_catalog.invalidate()
+
+
+@event.listens_for(db.metadata, 'after_create')
+@event.listens_for(db.metadata, 'after_drop')
+def _invalidate_on_schema_change(target, connection, **kw):
+    achievement_catalog.invalidate()
@@ -0,0 +1,72 @@
+import logging
+from collections import namedtuple
+from sqlalchemy.dialects.sqlite import insert
+from src.models.user import db, user_achievements
+from src.models.achievement_catalog import achievement_catalog
+from src.models.user_stats import UserStats
+
+# Get logger
+logger = logging.getLogger('storyquest')
+
+# An achievement is earned once counter >= threshold. User counters are
+# UserStats columns; STORY_LIKES is the like count of the user's story that
+# was just liked, passed in by the caller.
+AchievementRule = namedtuple('AchievementRule', ['achievement', 'counter', 'threshold'])
+
+STORY_LIKES = 'story_likes'
+
+ACHIEVEMENT_RULES = (
+    AchievementRule('First Share', 'shared_count', 1),
+    AchievementRule('Sharing Enthusiast', 'shared_count', 5),
+    AchievementRule('Social Storyteller', 'shared_count', 10),
+    AchievementRule('Challenge Accepted', 'challenge_count', 1),
+    AchievementRule('Challenge Seeker', 'challenge_count', 5),
+    AchievementRule('Challenge Master', 'challenge_count', 10),
+    AchievementRule('Popular Story', STORY_LIKES, 10),
+    AchievementRule('Trending Story', STORY_LIKES, 50),
+    AchievementRule('Viral Story', STORY_LIKES, 100),
+)
+
+RULES_BY_COUNTER = {}
+for _rule in ACHIEVEMENT_RULES:
+    RULES_BY_COUNTER.setdefault(_rule.counter, []).append(_rule)
+
+
+def reached_rules(counter, value):
+    """Rules on a counter whose threshold the value has reached"""
+    return [rule for rule in RULES_BY_COUNTER.get(counter, []) if value >= rule.threshold]
+
+
+def award_achievements(user_id, counter, value=None):
+    """
+    Award every achievement a user has reached on one counter
+
+    The value defaults to the user's UserStats counter, which the triggers
+    updated in the event's own transaction. Thresholds are compared with
+    >=, so an event that skips past a threshold still earns the badge, and
+    awarding an achievement the user already has is a no-op. Returns the
+    names of newly awarded achievements.
+    """
+    if value is None:
+        value = getattr(UserStats.get_for_user(user_id), counter)
+    names = [rule.achievement for rule in reached_rules(counter, value)]
+    if not names:
+        return []
+
+    awarded = []
+    for name in names:
+        achievement = achievement_catalog.get_by_name(name)
+        if achievement is None:
+            logger.warning(f"Attempted to award non-existent achievement: {name}")
+            continue
+        result = db.session.execute(
+            insert(user_achievements).values(user_id=user_id, achievement_id=achievement.id)
+            .on_conflict_do_nothing()
+        )
+        if result.rowcount == 1:
+            awarded.append(name)
+    if awarded:
+        db.session.commit()
+        for name in awarded:
+            logger.info(f"Achievement '{name}' awarded to user {user_id}")
+    return awarded
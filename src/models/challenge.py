@@ -2,6 +2,12 @@ from src.models.user import db
 
 class Challenge(db.Model):
     __tablename__ = 'challenges'
+    __table_args__ = (
+        # Active and upcoming challenge lists
+        db.Index('ix_challenges_active_start', 'is_active', 'start_date'),
+        # Past challenge list
+        db.Index('ix_challenges_end_date', 'end_date'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100), nullable=False)
@@ -3,6 +3,12 @@ from src.models.user import db
 
 class Character(db.Model):
     __tablename__ = 'characters'
+    __table_args__ = (
+        # Asset pickers list a user's characters
+        db.Index('ix_characters_user_id', 'user_id'),
+        # Story.characters relationship and cascade deletes
+        db.Index('ix_characters_story_id', 'story_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -10,6 +16,8 @@ class Character(db.Model):
     traits = db.Column(db.String(200), nullable=True)
     age = db.Column(db.String(50), nullable=True)  # Added age field to match test expectations
     personality = db.Column(db.String(200), nullable=True)  # Added personality field to match test expectations
+    # Static-relative directory of the processed image variants (see utils/images.py)
+    image_path = db.Column(db.String(255), nullable=True)
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
     
     # Foreign keys
@@ -0,0 +1,46 @@
+import json
+from src.models.user import db
+
+class Job(db.Model):
+    """
+    A unit of background work in the local SQLite job queue
+
+    Rows are inserted in the enqueuing request's own transaction, so a job
+    exists exactly when the write that caused it was committed. Finished
+    jobs are deleted; failed ones stay for inspection.
+    """
+    __tablename__ = 'jobs'
+    __table_args__ = (
+        # Claiming: next queued job by priority, then due time
+        db.Index('ix_jobs_status_priority_run_at', 'status', 'priority', 'run_at'),
+        # At most one queued job per deduplication key
+        db.Index('ux_jobs_queued_dedupe_key', 'dedupe_key', unique=True,
+                 sqlite_where=db.text("status = 'queued'")),
+    )
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    FAILED = 'failed'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(200), nullable=False)
+    payload = db.Column(db.Text, nullable=False, default='{}')
+    status = db.Column(db.String(20), nullable=False, default=QUEUED)
+    priority = db.Column(db.Integer, nullable=False, default=0)
+    dedupe_key = db.Column(db.String(200), nullable=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=3)
+    run_at = db.Column(db.DateTime, nullable=False)
+    locked_by = db.Column(db.String(100), nullable=True)
+    locked_at = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+
+    @property
+    def arguments(self):
+        """The (args, kwargs) the job was enqueued with"""
+        data = json.loads(self.payload or '{}')
+        return data.get('args', []), data.get('kwargs', {})
+
+    def __repr__(self):
+        return f'<Job {self.id} {self.name} {self.status}>'
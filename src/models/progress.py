@@ -3,6 +3,12 @@ from src.models.user import db
 
 class Progress(db.Model):
     __tablename__ = 'progress'
+    __table_args__ = (
+        # Save/load/resume look up progress by user and story
+        db.Index('ix_progress_user_story', 'user_id', 'story_id'),
+        # Story.progress relationship and cascade deletes
+        db.Index('ix_progress_story_id', 'story_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     current_step = db.Column(db.String(50), nullable=False)
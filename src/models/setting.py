@@ -3,12 +3,20 @@ from src.models.user import db
 
 class Setting(db.Model):
     __tablename__ = 'settings'
+    __table_args__ = (
+        # Asset pickers list a user's settings
+        db.Index('ix_settings_user_id', 'user_id'),
+        # Story.settings relationship and cascade deletes
+        db.Index('ix_settings_story_id', 'story_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text, nullable=True)
     time_period = db.Column(db.String(50), nullable=True)
     mood = db.Column(db.String(50), nullable=True)  # Added mood field to match test expectations
+    # Static-relative directory of the processed image variants (see utils/images.py)
+    image_path = db.Column(db.String(255), nullable=True)
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
     
     # Foreign keys
@@ -3,6 +3,23 @@ from src.models.user import db
 
 class Story(db.Model):
     __tablename__ = 'stories'
+    __table_args__ = (
+        # Dashboard / get_user_stories: user's stories, drafts filtered, newest first
+        db.Index('ix_stories_user_draft_updated', 'user_id', 'is_draft', 'updated_at'),
+        # Challenge page "your stories" list and per-user challenge counts
+        db.Index('ix_stories_user_challenge', 'user_id', 'challenge_id'),
+        # Shared feed, ordered by share date
+        db.Index('ix_stories_public_shared_date', 'is_public', 'is_shared', 'share_date'),
+        # get_public_stories, ordered by share date
+        db.Index('ix_stories_public_share_date', 'is_public', 'share_date'),
+        # /story/search and /story/filter, paged newest first
+        db.Index('ix_stories_public_updated', 'is_public', 'updated_at'),
+        db.Index('ix_stories_public_age_updated', 'is_public', 'age_group', 'updated_at'),
+        # get_featured_stories sort order
+        db.Index('ix_stories_featured', 'is_public', 'view_count', 'like_count', 'created_at'),
+        # Submitted stories on the challenge page, paged newest first
+        db.Index('ix_stories_challenge_public_updated', 'challenge_id', 'is_public', 'updated_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100), nullable=False)
@@ -23,6 +40,10 @@ class Story(db.Model):
     view_count = db.Column(db.Integer, default=0)
     submission_date = db.Column(db.DateTime, nullable=True)
     is_challenge_winner = db.Column(db.Boolean, default=False)
+    # Bumped by triggers whenever the story's elements change (see story_element.py);
+    # with updated_at these validate cached story pages
+    elements_version = db.Column(db.Integer, nullable=True, default=0)
+    elements_updated_at = db.Column(db.DateTime, nullable=True)
     
     # Foreign keys
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -33,14 +54,31 @@ class Story(db.Model):
     settings = db.relationship('Setting', backref='story', lazy=True, cascade="all, delete-orphan")
     story_elements = db.relationship('StoryElement', backref='story', lazy=True, cascade="all, delete-orphan")
     progress = db.relationship('Progress', backref='story', lazy=True, cascade="all, delete-orphan")
+    likes = db.relationship('StoryLike', backref='story', lazy=True, cascade="all, delete-orphan")
     
-    # Note: User relationship is defined in the User model with backref='author'
+    # Note: User relationship is defined in the User model with backref='author'.
+    # It loads lazily one story at a time; list queries should batch it with
+    # with_authors() so N story cards cost a constant number of queries.
     
-    @property
-    def author(self):
-        """Return the author of the story (for template compatibility)"""
-        from src.models.user import User
-        return User.get_by_id(self.user_id)
+    @classmethod
+    def with_authors(cls, query):
+        """Batch-load the author of every story a query returns"""
+        return query.options(db.selectinload(cls.author))
+    
+    @classmethod
+    def get_validators(cls, story_id):
+        """
+        The columns that decide whether a rendered story page is still current
+
+        Returns a row of (user_id, is_public, updated_at, elements_version,
+        last_modified) without loading the story body, or None.
+        """
+        return db.session.execute(
+            db.select(cls.user_id, cls.is_public, cls.updated_at, cls.elements_version,
+                      db.func.max(cls.updated_at, db.func.coalesce(cls.elements_updated_at, cls.updated_at))
+                      .label('last_modified'))
+            .where(cls.id == story_id)
+        ).first()
     
     @classmethod
     def get_by_id(cls, story_id):
@@ -57,15 +95,19 @@ class Story(db.Model):
     
     @classmethod
     def get_public_stories(cls, limit=10):
-        """Get public stories with efficient query"""
-        return cls.query.filter_by(is_public=True).order_by(cls.share_date.desc()).limit(limit).all()
+        """Get public stories as StoryCard summaries"""
+        from src.models.story_card import StoryCard
+        return StoryCard.fetch(StoryCard.select().where(cls.is_public == True).order_by(
+            cls.share_date.desc()
+        ).limit(limit))
     
     @classmethod
     def get_featured_stories(cls, limit=6):
-        """Get featured stories (most viewed/liked public stories)"""
-        return cls.query.filter_by(is_public=True).order_by(
+        """Get featured stories (most viewed/liked public stories) as StoryCard summaries"""
+        from src.models.story_card import StoryCard
+        return StoryCard.fetch(StoryCard.select().where(cls.is_public == True).order_by(
             cls.view_count.desc(), cls.like_count.desc(), cls.created_at.desc()
-        ).limit(limit).all()
+        ).limit(limit))
     
     def __repr__(self):
         return f'<Story {self.title}>'
@@ -0,0 +1,47 @@
+from src.models.user import db, User
+from src.models.story import Story
+
+class StoryCard:
+    """
+    Read-only story summary for listing pages
+
+    Built from a column-only select, so the unbounded content and
+    share_message columns are never read and no ORM identity is tracked.
+    """
+    FIELDS = ('id', 'title', 'description', 'age_group', 'theme', 'user_id',
+              'author_username', 'is_public', 'is_shared', 'like_count', 'view_count',
+              'created_at', 'updated_at', 'share_date')
+    # liked is filled in per viewer by StoryLike.annotate()
+    __slots__ = FIELDS + ('liked',)
+
+    def __init__(self, row):
+        for name in StoryCard.FIELDS:
+            setattr(self, name, getattr(row, name))
+        self.liked = False
+
+    @classmethod
+    def columns(cls):
+        """Columns selected for a card, including the author's username"""
+        return [getattr(Story, name) for name in cls.FIELDS if name != 'author_username'] + \
+               [User.username.label('author_username')]
+
+    @classmethod
+    def select(cls):
+        """Base select for story cards; add where/order_by/limit as needed"""
+        return db.select(*cls.columns()).join(User, User.id == Story.user_id)
+
+    @classmethod
+    def fetch(cls, stmt):
+        """Execute a card select and wrap each row"""
+        return [cls(row) for row in db.session.execute(stmt)]
+
+    def to_dict(self):
+        """JSON-ready representation for listing endpoints"""
+        data = {name: getattr(self, name) for name in StoryCard.FIELDS}
+        data['liked'] = self.liked
+        for name in ('created_at', 'updated_at', 'share_date'):
+            data[name] = data[name].isoformat() if data[name] else None
+        return data
+
+    def __repr__(self):
+        return f'<StoryCard {self.title}>'
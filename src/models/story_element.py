@@ -1,8 +1,17 @@
+import hashlib
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, text
 from src.models.user import db
 
 class StoryElement(db.Model):
     __tablename__ = 'story_elements'
+    __table_args__ = (
+        # Elements are always loaded per story in position order
+        db.Index('ix_story_elements_story_position', 'story_id', 'position'),
+        # Stories showing a character or setting, when it is edited
+        db.Index('ix_story_elements_character_id', 'character_id'),
+        db.Index('ix_story_elements_setting_id', 'setting_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     element_type = db.Column(db.String(50), nullable=False)
@@ -12,6 +21,95 @@ class StoryElement(db.Model):
     
     # Foreign keys
     story_id = db.Column(db.Integer, db.ForeignKey('stories.id'), nullable=False)
+    character_id = db.Column(db.Integer, db.ForeignKey('characters.id', ondelete='SET NULL'), nullable=True)
+    setting_id = db.Column(db.Integer, db.ForeignKey('settings.id', ondelete='SET NULL'), nullable=True)
+    
+    # The character or setting a character or setting element shows
+    character = db.relationship('Character', lazy=True)
+    setting = db.relationship('Setting', lazy=True)
+    
+    @property
+    def render_version(self):
+        """
+        Digest of everything the element's rendering shows
+
+        Covers the element and the character or setting it shows, so any
+        edit gives a new fragment cache key, even when a deleted row's id is
+        reused. Reads the character and setting relationships; load them
+        with the elements (selectinload) when rendering a whole story.
+        """
+        parts = [self.element_type, self.content]
+        for asset in (self.character, self.setting):
+            if asset is not None:
+                parts += [asset.name, asset.description, asset.image_path]
+        return hashlib.sha1(repr(parts).encode()).hexdigest()
     
     def __repr__(self):
         return f'<StoryElement {self.element_type} at position {self.position}>'
+
+
+BUMP_ELEMENTS_VERSION = (
+    "UPDATE stories SET elements_version = coalesce(elements_version, 0) + 1, "
+    "elements_updated_at = CURRENT_TIMESTAMP WHERE id IN ({story_ids});"
+)
+
+# Keep stories.elements_version in step with every change to a story's element set
+ELEMENTS_VERSION_DDL = [
+    "CREATE TRIGGER IF NOT EXISTS story_elements_version_insert AFTER INSERT ON story_elements BEGIN "
+    + BUMP_ELEMENTS_VERSION.format(story_ids='new.story_id') + " END",
+
+    "CREATE TRIGGER IF NOT EXISTS story_elements_version_update AFTER UPDATE ON story_elements BEGIN "
+    + BUMP_ELEMENTS_VERSION.format(story_ids='old.story_id, new.story_id') + " END",
+
+    "CREATE TRIGGER IF NOT EXISTS story_elements_version_delete AFTER DELETE ON story_elements BEGIN "
+    + BUMP_ELEMENTS_VERSION.format(story_ids='old.story_id') + " END",
+]
+
+# Elements render their character or setting, so editing or deleting one
+# changes every story that shows it
+ASSET_STORY_IDS = "SELECT story_id FROM story_elements WHERE {column} = old.id"
+ELEMENTS_VERSION_DDL += [
+    f"CREATE TRIGGER IF NOT EXISTS {table}_elements_version_{event_name} "
+    f"AFTER {event_name.upper()} ON {table} BEGIN "
+    + BUMP_ELEMENTS_VERSION.format(story_ids=ASSET_STORY_IDS.format(column=column)) + " END"
+    for table, column in (('characters', 'character_id'), ('settings', 'setting_id'))
+    for event_name in ('update', 'delete')
+]
+
+# Stories with an element showing a character or setting that uses an image
+IMAGE_STORY_IDS = (
+    "SELECT e.story_id FROM story_elements e "
+    "LEFT JOIN characters c ON c.id = e.character_id LEFT JOIN settings s ON s.id = e.setting_id "
+    "WHERE c.image_path = :image_path OR s.image_path = :image_path"
+)
+
+
+def bump_image_stories(image_path):
+    """
+    Bump elements_version of every story that shows an image; returns the count
+
+    Call when the image's variants become ready. Processing writes no row
+    the triggers see, so a page validated while the image showed a
+    placeholder would otherwise keep answering 304.
+    """
+    return db.session.execute(
+        text(BUMP_ELEMENTS_VERSION.format(story_ids=IMAGE_STORY_IDS)), {'image_path': image_path}
+    ).rowcount
+
+
+
+@event.listens_for(db.metadata, 'after_create')
+def _create_elements_version_triggers(target, connection, **kw):
+    if connection.dialect.name == 'sqlite':
+        for statement in ELEMENTS_VERSION_DDL:
+            connection.execute(text(statement))
+
+
+@event.listens_for(db.metadata, 'before_drop')
+def _drop_elements_version_triggers(target, connection, **kw):
+    if connection.dialect.name == 'sqlite':
+        for name in ('insert', 'update', 'delete'):
+            connection.execute(text(f"DROP TRIGGER IF EXISTS story_elements_version_{name}"))
+        for table in ('characters', 'settings'):
+            for name in ('update', 'delete'):
+                connection.execute(text(f"DROP TRIGGER IF EXISTS {table}_elements_version_{name}"))
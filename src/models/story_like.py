@@ -0,0 +1,57 @@
+from sqlalchemy.dialects.sqlite import insert
+from src.models.user import db
+
+class StoryLike(db.Model):
+    """One user's like of one story; the primary key makes likes unique"""
+    __tablename__ = 'story_likes'
+    __table_args__ = (
+        # Likes of a story, for deletes and per-story counts
+        db.Index('ix_story_likes_story_id', 'story_id'),
+    )
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    story_id = db.Column(db.Integer, db.ForeignKey('stories.id'), primary_key=True)
+    created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+
+    @classmethod
+    def add(cls, user_id, story_id):
+        """Record a like; returns False if the user already liked the story"""
+        result = db.session.execute(
+            insert(cls).values(user_id=user_id, story_id=story_id).on_conflict_do_nothing()
+        )
+        return result.rowcount == 1
+
+    @classmethod
+    def remove(cls, user_id, story_id):
+        """Remove a like; returns False if there was none"""
+        result = db.session.execute(
+            db.delete(cls).where(cls.user_id == user_id, cls.story_id == story_id)
+        )
+        return result.rowcount == 1
+
+    @classmethod
+    def has_liked(cls, user_id, story_id):
+        """Primary key lookup: has this user liked this story"""
+        return db.session.execute(
+            db.select(cls.story_id).where(cls.user_id == user_id, cls.story_id == story_id)
+        ).first() is not None
+
+    @classmethod
+    def liked_story_ids(cls, user_id, story_ids):
+        """The subset of story_ids the user has liked, in one query"""
+        if not user_id or not story_ids:
+            return set()
+        return set(db.session.execute(
+            db.select(cls.story_id).where(cls.user_id == user_id, cls.story_id.in_(story_ids))
+        ).scalars())
+
+    @classmethod
+    def annotate(cls, cards, user_id):
+        """Set card.liked on a page of story cards for the given user"""
+        liked = cls.liked_story_ids(user_id, [card.id for card in cards])
+        for card in cards:
+            card.liked = card.id in liked
+        return cards
+
+    def __repr__(self):
+        return f'<StoryLike user={self.user_id} story={self.story_id}>'
@@ -0,0 +1,232 @@
+import re
+import logging
+from markupsafe import escape, Markup
+from sqlalchemy import event, text
+from sqlalchemy.exc import OperationalError
+from src.models.user import db, User
+from src.models.story import Story
+from src.models.story_card import StoryCard
+
+# Get logger
+logger = logging.getLogger('storyquest')
+
+# FTS5 index over story text, one row per story (rowid = stories.id). The
+# elements column holds the concatenated StoryElement content. Weights rank
+# title matches above description, element and body matches.
+SEARCH_TABLE = 'story_search'
+RANK_FUNCTION = 'bm25(10.0, 5.0, 1.0, 2.0)'
+
+ELEMENTS_TEXT = "(SELECT group_concat(content, ' ') FROM story_elements WHERE story_id = {story_id})"
+
+SEARCH_DDL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+    "title, description, content, elements, tokenize = 'porter unicode61')",
+
+    f"CREATE TRIGGER IF NOT EXISTS stories_search_insert AFTER INSERT ON stories BEGIN "
+    f"INSERT INTO {SEARCH_TABLE}(rowid, title, description, content, elements) "
+    f"VALUES (new.id, new.title, new.description, new.content, {ELEMENTS_TEXT.format(story_id='new.id')}); END",
+
+    f"CREATE TRIGGER IF NOT EXISTS stories_search_update AFTER UPDATE OF title, description, content ON stories BEGIN "
+    f"UPDATE {SEARCH_TABLE} SET title = new.title, description = new.description, content = new.content "
+    f"WHERE rowid = new.id; END",
+
+    f"CREATE TRIGGER IF NOT EXISTS stories_search_delete AFTER DELETE ON stories BEGIN "
+    f"DELETE FROM {SEARCH_TABLE} WHERE rowid = old.id; END",
+
+    f"CREATE TRIGGER IF NOT EXISTS story_elements_search_insert AFTER INSERT ON story_elements BEGIN "
+    f"UPDATE {SEARCH_TABLE} SET elements = {ELEMENTS_TEXT.format(story_id='new.story_id')} "
+    f"WHERE rowid = new.story_id; END",
+
+    f"CREATE TRIGGER IF NOT EXISTS story_elements_search_update AFTER UPDATE OF content, story_id ON story_elements BEGIN "
+    f"UPDATE {SEARCH_TABLE} SET elements = {ELEMENTS_TEXT.format(story_id='old.story_id')} "
+    f"WHERE rowid = old.story_id; "
+    f"UPDATE {SEARCH_TABLE} SET elements = {ELEMENTS_TEXT.format(story_id='new.story_id')} "
+    f"WHERE rowid = new.story_id; END",
+
+    f"CREATE TRIGGER IF NOT EXISTS story_elements_search_delete AFTER DELETE ON story_elements BEGIN "
+    f"UPDATE {SEARCH_TABLE} SET elements = {ELEMENTS_TEXT.format(story_id='old.story_id')} "
+    f"WHERE rowid = old.story_id; END",
+]
+
+# Highlight markers are control characters so user text can be escaped
+# before they are swapped for <mark> tags
+HIGHLIGHT_START = '\x02'
+HIGHLIGHT_END = '\x03'
+
+
+def search_index_exists(connection):
+    """True when the FTS5 search table exists on this connection's database"""
+    return connection.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {'name': SEARCH_TABLE}
+    ).first() is not None
+
+
+def ensure_search_index(connection):
+    """
+    Create the search table and sync triggers if missing
+
+    A newly created index is filled from the existing stories. Returns False
+    when this SQLite build has no FTS5, in which case search falls back to LIKE.
+    """
+    if connection.dialect.name != 'sqlite':
+        return False
+    created = not search_index_exists(connection)
+    try:
+        for statement in SEARCH_DDL:
+            connection.execute(text(statement))
+    except OperationalError as e:
+        logger.warning(f"Full-text search disabled, FTS5 unavailable: {e}")
+        return False
+    if created:
+        connection.execute(text(
+            f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rank) VALUES ('rank', :rank)"
+        ), {'rank': RANK_FUNCTION})
+        _fill_search_index(connection)
+    return True
+
+
+def _fill_search_index(connection):
+    connection.execute(text(
+        f"INSERT INTO {SEARCH_TABLE}(rowid, title, description, content, elements) "
+        f"SELECT s.id, s.title, s.description, s.content, {ELEMENTS_TEXT.format(story_id='s.id')} FROM stories s"
+    ))
+
+
+def rebuild_search_index():
+    """Repopulate the search index from the stories table and optimize it; returns the row count"""
+    with db.engine.begin() as connection:
+        if not ensure_search_index(connection):
+            return 0
+        connection.execute(text(f"DELETE FROM {SEARCH_TABLE}"))
+        _fill_search_index(connection)
+        connection.execute(text(f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('optimize')"))
+        return connection.execute(text(f"SELECT count(*) FROM {SEARCH_TABLE}")).scalar()
+
+
+@event.listens_for(db.metadata, 'after_create')
+def _create_search_index(target, connection, **kw):
+    ensure_search_index(connection)
+
+
+@event.listens_for(db.metadata, 'before_drop')
+def _drop_search_index(target, connection, **kw):
+    if connection.dialect.name == 'sqlite':
+        connection.execute(text(f"DROP TABLE IF EXISTS {SEARCH_TABLE}"))
+
+
+def build_match_query(query):
+    """
+    Turn free text into a safe FTS5 MATCH expression
+
+    Every word is quoted (so FTS5 operators in user input are inert) and all
+    words must match; the last word also matches as a prefix.
+    """
+    words = re.findall(r'\w+', query or '')
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def render_highlight(value):
+    """Escape indexed text and turn the highlight markers into <mark> tags"""
+    if not value:
+        return Markup('')
+    return Markup(str(escape(value)).replace(HIGHLIGHT_START, '<mark>').replace(HIGHLIGHT_END, '</mark>'))
+
+
+class StorySearchResult(StoryCard):
+    """StoryCard with a BM25 score and highlighted title/snippet"""
+    __slots__ = ('score', 'title_highlight', 'snippet')
+
+    def __init__(self, row, score, title_highlight, snippet):
+        super().__init__(row)
+        self.score = score
+        self.title_highlight = title_highlight
+        self.snippet = snippet
+
+    def to_dict(self):
+        data = super().to_dict()
+        data['score'] = self.score
+        data['title_highlight'] = str(self.title_highlight)
+        data['snippet'] = str(self.snippet)
+        return data
+
+
+def search_stories(query, age_group=None, theme=None, cursor=None, per_page=20):
+    """
+    BM25-ranked search over public stories
+
+    Returns a KeysetPage of StorySearchResult, or None when the query has no
+    searchable words or FTS5 is unavailable (callers fall back to listing).
+    """
+    from src.utils.pagination import KeysetPage, decode_cursor, encode_cursor
+
+    match = build_match_query(query)
+    if match is None or not search_index_exists(db.session.connection()):
+        return None
+
+    decoded = decode_cursor(cursor)
+    direction, last_score, last_id = decoded if decoded and isinstance(decoded[1], (int, float)) \
+        else ('next', None, None)
+
+    params = {'match': match, 'limit': per_page + 1}
+    filters = ["s.is_public = 1"]
+    if age_group:
+        filters.append("s.age_group = :age_group")
+        params['age_group'] = age_group
+    if theme:
+        filters.append("s.theme = :theme")
+        params['theme'] = theme
+    if last_id is not None:
+        params.update(last_score=last_score, last_id=last_id)
+        if direction == 'next':
+            filters.append(f"({SEARCH_TABLE}.rank > :last_score OR "
+                           f"({SEARCH_TABLE}.rank = :last_score AND {SEARCH_TABLE}.rowid > :last_id))")
+        else:
+            filters.append(f"({SEARCH_TABLE}.rank < :last_score OR "
+                           f"({SEARCH_TABLE}.rank = :last_score AND {SEARCH_TABLE}.rowid < :last_id))")
+    if direction == 'next':
+        order = f"{SEARCH_TABLE}.rank, {SEARCH_TABLE}.rowid"
+    else:
+        order = f"{SEARCH_TABLE}.rank DESC, {SEARCH_TABLE}.rowid DESC"
+
+    # Rank first, over ids only; text columns are read for this page alone
+    ranked = db.session.execute(text(
+        f"SELECT {SEARCH_TABLE}.rowid AS story_id, {SEARCH_TABLE}.rank AS score FROM {SEARCH_TABLE} "
+        f"JOIN stories s ON s.id = {SEARCH_TABLE}.rowid "
+        f"WHERE {SEARCH_TABLE} MATCH :match AND {' AND '.join(filters)} "
+        f"ORDER BY {order} LIMIT :limit"
+    ), params).all()
+
+    has_more = len(ranked) > per_page
+    ranked = ranked[:per_page]
+    if direction == 'prev':
+        ranked.reverse()
+    if not ranked:
+        return KeysetPage([])
+
+    ids = [row.story_id for row in ranked]
+    highlights = {row.rowid: row for row in db.session.execute(text(
+        f"SELECT rowid, highlight({SEARCH_TABLE}, 0, :start, :end) AS title, "
+        f"snippet({SEARCH_TABLE}, -1, :start, :end, '…', 24) AS snippet "
+        f"FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH :match AND rowid IN ({', '.join(str(i) for i in ids)})"
+    ), {'match': match, 'start': HIGHLIGHT_START, 'end': HIGHLIGHT_END})}
+    cards = {row.id: row for row in db.session.execute(StoryCard.select().where(Story.id.in_(ids)))}
+
+    results = []
+    for row in ranked:
+        highlight = highlights.get(row.story_id)
+        results.append(StorySearchResult(
+            cards[row.story_id], row.score,
+            render_highlight(highlight.title if highlight else cards[row.story_id].title),
+            render_highlight(highlight.snippet if highlight else '')
+        ))
+
+    has_next = has_more if direction == 'next' else True
+    has_prev = last_id is not None if direction == 'next' else has_more
+    next_cursor = encode_cursor('next', results[-1].score, results[-1].id) if has_next else None
+    prev_cursor = encode_cursor('prev', results[0].score, results[0].id) if has_prev else None
+    return KeysetPage(results, next_cursor, prev_cursor)
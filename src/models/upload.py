@@ -0,0 +1,135 @@
+import logging
+from sqlalchemy import event, text
+from sqlalchemy.dialects.sqlite import insert
+from src.models.user import db
+
+# Get logger
+logger = logging.getLogger('storyquest')
+
+
+class Upload(db.Model):
+    """
+    One stored image, addressed by the SHA-256 of its bytes
+
+    Every character and setting whose image hashes the same points at the
+    same path, so a duplicate upload costs no disk and the variants' URLs
+    never change meaning. SQLite triggers keep ref_count equal to the
+    number of characters and settings using the path; a row that drops to
+    zero gets released_at and is removed, with its files, by the batched
+    garbage collection in utils/images.py once a grace period has passed.
+    """
+    __tablename__ = 'uploads'
+    __table_args__ = (
+        # Garbage collection scans only unreferenced uploads, oldest first
+        db.Index('ix_uploads_released_at', 'released_at', sqlite_where=db.text('ref_count <= 0')),
+    )
+
+    digest = db.Column(db.String(64), primary_key=True)
+    # Static-relative directory of the processed variants
+    path = db.Column(db.String(255), nullable=False, unique=True)
+    ref_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+    released_at = db.Column(db.DateTime, nullable=True)
+
+    @classmethod
+    def register(cls, digest, path):
+        """
+        Record an upload in the current transaction; returns True if it is new
+
+        A new upload starts unreferenced, so it is collected if nothing
+        claims it before the grace period ends.
+        """
+        stmt = insert(cls).values(
+            digest=digest, path=path, ref_count=0,
+            created_at=db.func.current_timestamp(), released_at=db.func.current_timestamp(),
+        ).on_conflict_do_nothing(index_elements=['digest'])
+        return db.session.execute(stmt).rowcount == 1
+
+    @classmethod
+    def get_ref_count(cls, path):
+        # Triggers change the row behind the session's back, so read the column
+        return db.session.execute(db.select(cls.ref_count).where(cls.path == path)).scalar()
+
+    def __repr__(self):
+        return f'<Upload {self.digest[:12]} refs={self.ref_count}>'
+
+
+# Tables whose image_path column references an upload
+REFERENCING_TABLES = ('characters', 'settings')
+
+
+def _acquire(path):
+    return f"UPDATE uploads SET ref_count = ref_count + 1, released_at = NULL WHERE path = {path};"
+
+
+def _release(path):
+    return (f"UPDATE uploads SET ref_count = ref_count - 1, "
+            f"released_at = CASE WHEN ref_count <= 1 THEN CURRENT_TIMESTAMP ELSE released_at END "
+            f"WHERE path = {path};")
+
+
+TRIGGERS = {}
+for _table in REFERENCING_TABLES:
+    TRIGGERS[f'{_table}_uploads_insert'] = (
+        f"AFTER INSERT ON {_table} WHEN new.image_path IS NOT NULL BEGIN "
+        + _acquire('new.image_path') + " END")
+    TRIGGERS[f'{_table}_uploads_delete'] = (
+        f"AFTER DELETE ON {_table} WHEN old.image_path IS NOT NULL BEGIN "
+        + _release('old.image_path') + " END")
+    TRIGGERS[f'{_table}_uploads_update'] = (
+        f"AFTER UPDATE OF image_path ON {_table} WHEN old.image_path IS NOT new.image_path BEGIN "
+        + _release('old.image_path') + " " + _acquire('new.image_path') + " END")
+
+RELEASE_SQL = (
+    "UPDATE uploads SET released_at = CASE WHEN ref_count <= 0 THEN coalesce(released_at, CURRENT_TIMESTAMP) END"
+)
+
+
+def _trigger_sql(name):
+    return f"CREATE TRIGGER {name} {TRIGGERS[name]}"
+
+
+def _rebuild(connection):
+    # Older databases get image_path from create_missing_columns after create_all
+    counts = [f"(SELECT count(*) FROM {table} WHERE image_path = uploads.path)"
+              for table in REFERENCING_TABLES
+              if 'image_path' in {row[1] for row in connection.execute(text(f"PRAGMA table_info({table})"))}]
+    count = connection.execute(text(f"UPDATE uploads SET ref_count = {' + '.join(counts) or '0'}")).rowcount
+    connection.execute(text(RELEASE_SQL))
+    return count
+
+
+def ensure_upload_triggers(connection):
+    """Create missing or outdated reference-counting triggers, then recount"""
+    if connection.dialect.name != 'sqlite':
+        return False
+    existing = dict(connection.execute(text(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'trigger'"
+    )).all())
+    stale = [name for name in TRIGGERS if existing.get(name) != _trigger_sql(name)]
+    if not stale:
+        return True
+    for name in stale:
+        connection.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+        connection.execute(text(_trigger_sql(name)))
+    _rebuild(connection)
+    return True
+
+
+def rebuild_upload_refs():
+    """Recount every upload's references from characters and settings; returns the row count"""
+    with db.engine.begin() as connection:
+        ensure_upload_triggers(connection)
+        return _rebuild(connection)
+
+
+@event.listens_for(db.metadata, 'after_create')
+def _create_upload_triggers(target, connection, **kw):
+    ensure_upload_triggers(connection)
+
+
+@event.listens_for(db.metadata, 'before_drop')
+def _drop_upload_triggers(target, connection, **kw):
+    if connection.dialect.name == 'sqlite':
+        for name in TRIGGERS:
+            connection.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
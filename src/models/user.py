@@ -15,7 +15,9 @@ class User(db.Model):
     
     # Use string-based relationships to avoid circular imports
     stories = db.relationship('Story', backref='author', lazy=True)
-    achievements = db.relationship('Achievement', secondary='user_achievements', lazy='subquery',
+    # Loaded lazily; routes that render or check achievements opt in with
+    # selectinload(User.achievements)
+    achievements = db.relationship('Achievement', secondary='user_achievements', lazy=True,
                                   backref=db.backref('users', lazy=True))
     
     def set_password(self, password):
@@ -27,9 +29,10 @@ class User(db.Model):
         return check_password_hash(self.password, password)
     
     @classmethod
-    def get_by_id(cls, user_id):
-        """Get user by ID using SQLAlchemy 2.0 compatible method"""
-        return db.session.get(cls, user_id)
+    def get_by_id(cls, user_id, options=None):
+        """Get user by ID using SQLAlchemy 2.0 compatible method, with optional loader options"""
+        # Refresh an already-loaded user so the requested loader options apply
+        return db.session.get(cls, user_id, options=options, populate_existing=bool(options))
     
     @classmethod
     def get_by_username(cls, username):
@@ -0,0 +1,191 @@
+import logging
+from sqlalchemy import event, text
+from src.models.user import db, User
+
+# Get logger
+logger = logging.getLogger('storyquest')
+
+
+class UserStats(db.Model):
+    """
+    Denormalized per-user counters, kept current by SQLite triggers
+
+    Awarding or revoking an achievement, creating or deleting a story,
+    sharing it, submitting it to a challenge and flagging a challenge
+    winner each adjust one row here inside the same transaction. The
+    leaderboards read the top N from an index and the achievement rules
+    read one row, instead of aggregating users, stories and
+    user_achievements on every request.
+    """
+    __tablename__ = 'user_stats'
+    __table_args__ = (
+        db.Index('ix_user_stats_total_points', 'total_points'),
+        db.Index('ix_user_stats_story_count', 'story_count'),
+        db.Index('ix_user_stats_win_count', 'win_count'),
+    )
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    total_points = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    story_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    win_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    shared_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    challenge_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    user = db.relationship('User', lazy=True)
+
+    @classmethod
+    def get_for_user(cls, user_id):
+        """Counters of one user; a zeroed, unsaved row if the user has none yet"""
+        # Triggers change the row behind the session's back, so always reload it
+        return db.session.get(cls, user_id, populate_existing=True) or cls(
+            user_id=user_id, total_points=0, story_count=0, win_count=0, shared_count=0, challenge_count=0
+        )
+
+    def __repr__(self):
+        return f'<UserStats user={self.user_id} points={self.total_points}>'
+
+
+COUNTERS = ('total_points', 'story_count', 'win_count', 'shared_count', 'challenge_count')
+
+# Leaderboards and the column each is ranked by
+LEADERBOARDS = {
+    'points': UserStats.total_points,
+    'stories': UserStats.story_count,
+    'wins': UserStats.win_count,
+}
+
+ACHIEVEMENT_POINTS = "coalesce((SELECT points FROM achievements WHERE id = {achievement_id}), 0)"
+
+
+def _story_deltas(row, sign=''):
+    # What one story row contributes to its author's counters
+    return {
+        'story_count': f'{sign}1',
+        'win_count': f'{sign}coalesce({row}.is_challenge_winner, 0)',
+        'shared_count': f'{sign}coalesce({row}.is_shared, 0)',
+        'challenge_count': f'{sign}({row}.challenge_id IS NOT NULL)',
+    }
+
+
+def _add_stats(user_id, deltas):
+    # Upsert so a row missing for any reason is created on first change
+    values = [deltas.get(name, '0') for name in COUNTERS]
+    updates = ', '.join(f'{name} = {name} + excluded.{name}' for name in COUNTERS)
+    return (f"INSERT INTO user_stats (user_id, {', '.join(COUNTERS)}) "
+            f"VALUES ({user_id}, {', '.join(values)}) "
+            f"ON CONFLICT(user_id) DO UPDATE SET {updates};")
+
+
+TRIGGERS = {
+    'users_stats_insert':
+        "AFTER INSERT ON users BEGIN "
+        "INSERT OR IGNORE INTO user_stats (user_id) VALUES (new.id); END",
+    'users_stats_delete':
+        "AFTER DELETE ON users BEGIN "
+        "DELETE FROM user_stats WHERE user_id = old.id; END",
+    'stories_stats_insert':
+        "AFTER INSERT ON stories BEGIN "
+        + _add_stats('new.user_id', _story_deltas('new')) + " END",
+    'stories_stats_delete':
+        "AFTER DELETE ON stories BEGIN "
+        + _add_stats('old.user_id', _story_deltas('old', '-')) + " END",
+    'stories_stats_update':
+        "AFTER UPDATE OF user_id, is_challenge_winner, is_shared, challenge_id ON stories BEGIN "
+        + _add_stats('old.user_id', _story_deltas('old', '-'))
+        + _add_stats('new.user_id', _story_deltas('new')) + " END",
+    'user_achievements_stats_insert':
+        "AFTER INSERT ON user_achievements BEGIN "
+        + _add_stats('new.user_id', {'total_points': ACHIEVEMENT_POINTS.format(achievement_id='new.achievement_id')})
+        + " END",
+    'user_achievements_stats_delete':
+        "AFTER DELETE ON user_achievements BEGIN "
+        + _add_stats('old.user_id', {'total_points': '-' + ACHIEVEMENT_POINTS.format(achievement_id='old.achievement_id')})
+        + " END",
+}
+
+REBUILD_SQL = (
+    f"INSERT INTO user_stats (user_id, {', '.join(COUNTERS)}) "
+    "SELECT u.id, "
+    "(SELECT coalesce(sum(a.points), 0) FROM user_achievements ua JOIN achievements a ON a.id = ua.achievement_id "
+    "WHERE ua.user_id = u.id), "
+    "(SELECT count(*) FROM stories s WHERE s.user_id = u.id), "
+    "(SELECT count(*) FROM stories s WHERE s.user_id = u.id AND s.is_challenge_winner = 1), "
+    "(SELECT count(*) FROM stories s WHERE s.user_id = u.id AND s.is_shared = 1), "
+    "(SELECT count(*) FROM stories s WHERE s.user_id = u.id AND s.challenge_id IS NOT NULL) "
+    "FROM users u"
+)
+
+
+def _trigger_sql(name):
+    return f"CREATE TRIGGER {name} {TRIGGERS[name]}"
+
+
+def _stale_triggers(connection):
+    existing = dict(connection.execute(text(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'trigger'"
+    )).all())
+    return [name for name in TRIGGERS if existing.get(name) != _trigger_sql(name)]
+
+
+def _add_missing_columns(connection):
+    # create_all does not add columns to an existing table
+    existing = {row[1] for row in connection.execute(text("PRAGMA table_info(user_stats)"))}
+    for name in COUNTERS:
+        if name not in existing:
+            connection.execute(text(f"ALTER TABLE user_stats ADD COLUMN {name} INTEGER NOT NULL DEFAULT 0"))
+
+
+def _rebuild(connection):
+    connection.execute(text("DELETE FROM user_stats"))
+    return connection.execute(text(REBUILD_SQL)).rowcount
+
+
+def ensure_stats_triggers(connection):
+    """
+    Create missing or outdated sync triggers, then recompute the counters
+
+    Counters can only be trusted while every trigger is in place and
+    current, so a database where any was missing or changed is rebuilt.
+    """
+    if connection.dialect.name != 'sqlite':
+        return False
+    stale = _stale_triggers(connection)
+    if not stale:
+        return True
+    _add_missing_columns(connection)
+    for name in stale:
+        connection.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+        connection.execute(text(_trigger_sql(name)))
+    _rebuild(connection)
+    return True
+
+
+def rebuild_leaderboards():
+    """Recompute every user's counters from the source tables; returns the row count"""
+    with db.engine.begin() as connection:
+        ensure_stats_triggers(connection)
+        return _rebuild(connection)
+
+
+def get_leaderboard(name, limit=10):
+    """Top users for one leaderboard as (User, value) rows, users with nothing left out"""
+    column = LEADERBOARDS[name]
+    return db.session.execute(
+        db.select(User, column)
+        .join(UserStats, UserStats.user_id == User.id)
+        .where(column > 0)
+        .order_by(column.desc())
+        .limit(limit)
+    ).all()
+
+
+@event.listens_for(db.metadata, 'after_create')
+def _create_stats_triggers(target, connection, **kw):
+    ensure_stats_triggers(connection)
+
+
+@event.listens_for(db.metadata, 'before_drop')
+def _drop_stats_triggers(target, connection, **kw):
+    if connection.dialect.name == 'sqlite':
+        for name in TRIGGERS:
+            connection.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
@@ -0,0 +1,58 @@
+import hmac
+from functools import wraps
+from flask import Blueprint, current_app, jsonify, request, session
+from src.utils.log_levels import log_levels, DEFAULT_OVERRIDE_DURATION
+
+admin_bp = Blueprint('admin_bp', __name__)
+
+def is_admin():
+    """An admin session, or the ADMIN_TOKEN as a bearer token for scripts and curl"""
+    if session.get('is_admin'):
+        return True
+    token = current_app.config.get('ADMIN_TOKEN')
+    auth = request.authorization
+    return bool(token) and auth is not None and auth.type == 'bearer' and \
+        hmac.compare_digest(auth.token or '', token)
+
+def admin_required(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not is_admin():
+            return jsonify({'success': False, 'error': 'Permission denied'}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+@admin_bp.route('/log-levels', methods=['GET'])
+@admin_required
+def get_log_levels():
+    """Effective level and any override of each configured logger"""
+    return jsonify({'success': True, 'loggers': log_levels.levels()})
+
+@admin_bp.route('/log-levels', methods=['POST'])
+@admin_required
+def set_log_level():
+    """
+    Override a logger's level on every worker for a while
+
+    JSON body: {"logger": "storyquest.auth", "level": "DEBUG", "duration": 60}.
+    duration is in seconds and defaults to five minutes; null keeps the
+    override until it is deleted.
+    """
+    data = request.get_json(silent=True) or {}
+    name = data.get('logger')
+    duration = data.get('duration', DEFAULT_OVERRIDE_DURATION)
+    if not name or not data.get('level'):
+        return jsonify({'success': False, 'error': 'logger and level are required'}), 400
+    if duration is not None and (not isinstance(duration, (int, float)) or duration <= 0):
+        return jsonify({'success': False, 'error': 'duration must be a positive number of seconds'}), 400
+    try:
+        override = log_levels.set(name, data['level'], duration)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    return jsonify({'success': True, 'logger': name, 'override': override})
+
+@admin_bp.route('/log-levels/<path:name>', methods=['DELETE'])
+@admin_required
+def clear_log_level(name):
+    """Return a logger to its configured level"""
+    return jsonify({'success': True, 'cleared': log_levels.clear(name)})
@@ -1,5 +1,10 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, session
 from src.models import db, Character, Setting
+from src.utils.jobs import job_queue
+from src.models.upload import Upload
+from src.models.story_element import bump_image_stories
+from src.utils.images import (check_image, stage_upload, incoming_path, content_path, static_root, run_image_processing,
+                              remove_legacy_image)
 import json
 import os
 
@@ -33,17 +38,8 @@ def create_character():
         attributes['likes'] = request.form.get('likes', '')
         attributes['dislikes'] = request.form.get('dislikes', '')
         
-        # Handle image upload
-        image_path = None
-        if 'image' in request.files:
-            image = request.files['image']
-            if image.filename:
-                # Save image
-                filename = f"{session['user_id']}_{name.replace(' ', '_')}_{image.filename}"
-                image_path = os.path.join('static', 'images', 'characters', filename)
-                full_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), image_path)
-                os.makedirs(os.path.dirname(full_path), exist_ok=True)
-                image.save(full_path)
+        # Handle image upload; variants are generated in the background
+        image_path = accept_image_upload()
         
         # Create new character
         new_character = Character(
@@ -90,25 +86,16 @@ def edit_character(character_id):
         attributes['dislikes'] = request.form.get('dislikes', attributes.get('dislikes', ''))
         character.attributes = json.dumps(attributes)
         
-        # Handle image upload
-        if 'image' in request.files:
-            image = request.files['image']
-            if image.filename:
-                # Delete old image if exists
-                if character.image_path:
-                    old_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), character.image_path)
-                    if os.path.exists(old_path):
-                        os.remove(old_path)
-                
-                # Save new image
-                filename = f"{session['user_id']}_{character.name.replace(' ', '_')}_{image.filename}"
-                image_path = os.path.join('static', 'images', 'characters', filename)
-                full_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), image_path)
-                os.makedirs(os.path.dirname(full_path), exist_ok=True)
-                image.save(full_path)
-                character.image_path = image_path
+        # Handle image upload; the old image is released and garbage-collected
+        # later, or deleted once committed if it predates the upload store
+        old_image_path = character.image_path
+        image_path = accept_image_upload()
+        if image_path:
+            character.image_path = image_path
         
         db.session.commit()
+        if image_path and image_path != old_image_path:
+            remove_legacy_image(old_image_path)
         flash('Character updated successfully!', 'success')
         return redirect(url_for('asset_bp.list_characters'))
     
@@ -142,17 +129,8 @@ def create_setting():
         attributes['mood'] = request.form.get('mood', '')
         attributes['weather'] = request.form.get('weather', '')
         
-        # Handle image upload
-        image_path = None
-        if 'image' in request.files:
-            image = request.files['image']
-            if image.filename:
-                # Save image
-                filename = f"{session['user_id']}_{name.replace(' ', '_')}_{image.filename}"
-                image_path = os.path.join('static', 'images', 'settings', filename)
-                full_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), image_path)
-                os.makedirs(os.path.dirname(full_path), exist_ok=True)
-                image.save(full_path)
+        # Handle image upload; variants are generated in the background
+        image_path = accept_image_upload()
         
         # Create new setting
         new_setting = Setting(
@@ -199,26 +177,56 @@ def edit_setting(setting_id):
         attributes['weather'] = request.form.get('weather', attributes.get('weather', ''))
         setting.attributes = json.dumps(attributes)
         
-        # Handle image upload
-        if 'image' in request.files:
-            image = request.files['image']
-            if image.filename:
-                # Delete old image if exists
-                if setting.image_path:
-                    old_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), setting.image_path)
-                    if os.path.exists(old_path):
-                        os.remove(old_path)
-                
-                # Save new image
-                filename = f"{session['user_id']}_{setting.name.replace(' ', '_')}_{image.filename}"
-                image_path = os.path.join('static', 'images', 'settings', filename)
-                full_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), image_path)
-                os.makedirs(os.path.dirname(full_path), exist_ok=True)
-                image.save(full_path)
-                setting.image_path = image_path
+        # Handle image upload; the old image is released and garbage-collected
+        # later, or deleted once committed if it predates the upload store
+        old_image_path = setting.image_path
+        image_path = accept_image_upload()
+        if image_path:
+            setting.image_path = image_path
         
         db.session.commit()
+        if image_path and image_path != old_image_path:
+            remove_legacy_image(old_image_path)
         flash('Setting updated successfully!', 'success')
         return redirect(url_for('asset_bp.list_settings'))
     
     return render_template('asset/edit_setting.html', setting=setting, attributes=attributes)
+
+def accept_image_upload():
+    """
+    Store the request's uploaded image by content and queue its processing
+
+    Returns the static-relative path of the image's variants, or None if
+    there was no usable image. Bytes that are already stored reuse the
+    existing variants; otherwise the upload is recorded and its processing
+    job queued in the caller's transaction.
+    """
+    image = request.files.get('image')
+    if not image or not image.filename:
+        return None
+    if check_image(image.stream) is None:
+        flash('Please upload a JPEG, PNG, GIF or WebP image', 'warning')
+        return None
+    
+    digest, staged_path = stage_upload(image.stream)
+    image_path = content_path(digest)
+    if Upload.register(digest, image_path):
+        os.replace(staged_path, incoming_path(digest))
+        process_upload_image_job.delay(digest)
+    else:
+        os.remove(staged_path)
+    return image_path
+
+# Background jobs
+
+@job_queue.task('process_upload_image', dedupe_key=lambda digest: f'upload:{digest}')
+def process_upload_image_job(digest):
+    """Generate the resized, metadata-free variants of a staged upload"""
+    source = incoming_path(digest)
+    if not os.path.exists(source):
+        # Already processed by an earlier job, or collected after a rollback
+        return
+    run_image_processing(source, os.path.join(static_root(), content_path(digest)))
+    os.remove(source)
+    # Stories already showing the placeholder must revalidate to get the image
+    bump_image_stories(content_path(digest))
@@ -16,7 +16,7 @@ def register():
         password = request.form.get('password')
         age_group = request.form.get('age_group', '7-9')
         
-        auth_logger.debug(f"Registration attempt - Username: {username}, Email: {email}, Age group: {age_group}")
+        auth_logger.debug("Registration attempt - Username: %s, Email: %s, Age group: %s", username, email, age_group)
         
         # Validate form data
         if not username or not email or not password:
@@ -66,7 +66,7 @@ def register():
             db.session.rollback()
             error_details = traceback.format_exc()
             auth_logger.error(f"Error registering user: {username}", exc_info=True)
-            auth_logger.debug(f"Registration error details: {error_details}")
+            auth_logger.debug("Registration error details: %s", error_details)
             
             log_authentication_attempt(False, username, e)
             
@@ -83,7 +83,7 @@ def login():
         username = request.form.get('username')
         password = request.form.get('password')
         
-        auth_logger.debug(f"Login attempt - Username: {username}")
+        auth_logger.debug("Login attempt - Username: %s", username)
         
         # Validate form data
         if not username or not password:
@@ -118,13 +118,13 @@ def login():
             log_session_state()
             
             # Debug check for session after login
-            auth_logger.debug(f"Session after login: user_id={session.get('user_id')}, username={session.get('username')}")
+            auth_logger.debug("Session after login: user_id=%s, username=%s", session.get('user_id'), session.get('username'))
             
             return redirect(url_for('dashboard_bp.index'))
         except Exception as e:
             error_details = traceback.format_exc()
             auth_logger.error(f"Error during login for user: {username}", exc_info=True)
-            auth_logger.debug(f"Login error details: {error_details}")
+            auth_logger.debug("Login error details: %s", error_details)
             
             log_authentication_attempt(False, username, e)
             
@@ -140,7 +140,7 @@ def logout():
     username = session.get('username', 'Unknown')
     user_id = session.get('user_id', 'Unknown')
     
-    auth_logger.debug(f"Logout attempt - Username: {username}, User ID: {user_id}")
+    auth_logger.debug("Logout attempt - Username: %s, User ID: %s", username, user_id)
     log_session_state()
     
     try:
@@ -156,7 +156,7 @@ def logout():
     except Exception as e:
         error_details = traceback.format_exc()
         auth_logger.error(f"Error during logout for user: {username}", exc_info=True)
-        auth_logger.debug(f"Logout error details: {error_details}")
+        auth_logger.debug("Logout error details: %s", error_details)
         
         # Try to redirect anyway
         return redirect(url_for('main.index'))
@@ -0,0 +1,11 @@
+from flask import Blueprint, Response
+from src.routes.admin import admin_required
+from src.utils.metrics import metrics
+
+metrics_bp = Blueprint('metrics_bp', __name__)
+
+@metrics_bp.route('/metrics')
+@admin_required
+def prometheus_metrics():
+    """Request histograms of every worker, for Prometheus to scrape with the admin token"""
+    return Response(metrics.exposition(), mimetype='text/plain; version=0.0.4')
@@ -1,5 +1,7 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, session, g
-from src.models import db, Story, Character, Setting, StoryElement
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, session, g, make_response
+from src.models import db, Story, StoryCard, Character, Setting, StoryElement, search_stories
+from src.utils.pagination import paginate, get_per_page, wants_json
+from src.utils.http_cache import identity_class, make_etag, not_modified, add_validators
 import json
 from datetime import datetime
 
@@ -107,6 +109,15 @@ def edit(story_id):
 @story_bp.route('/<int:story_id>/view')
 def view(story_id):
     """View a story"""
+    # Answer revalidation from a few columns, before the story is loaded or rendered
+    validators = Story.get_validators(story_id)
+    if validators and (validators.is_public or validators.user_id == session.get('user_id')):
+        etag = make_etag('view', story_id, validators.updated_at, validators.elements_version,
+                         identity_class(validators.user_id))
+        response = not_modified(etag, validators.last_modified)
+        if response:
+            return response
+    
     # Get the story using SQLAlchemy 2.0 compatible method
     story = db.session.get(Story, story_id)
     if not story:
@@ -121,8 +132,11 @@ def view(story_id):
         flash('This story is private. Please log in to view it.', 'warning')
         return redirect(url_for('auth_bp.login'))
     
-    # Get story elements
-    elements = StoryElement.query.filter_by(story_id=story_id).order_by(StoryElement.position).all()
+    # Get story elements with the characters and settings they show, which
+    # are part of each element's fragment cache key
+    elements = (StoryElement.query
+                .options(db.selectinload(StoryElement.character), db.selectinload(StoryElement.setting))
+                .filter_by(story_id=story_id).order_by(StoryElement.position).all())
     
     # Set default content if none exists (for test compatibility)
     if not story.content and not elements:
@@ -136,10 +150,11 @@ def view(story_id):
                               elements=elements,
                               is_owner=is_owner)
     
-    return render_template('story/view.html', 
-                          story=story, 
-                          elements=elements,
-                          is_owner=is_owner)
+    response = make_response(render_template('story/view.html', 
+                                             story=story, 
+                                             elements=elements,
+                                             is_owner=is_owner))
+    return add_validators(response, etag, validators.last_modified)
 
 @story_bp.route('/<int:story_id>/delete', methods=['POST'])
 def delete(story_id):
@@ -244,20 +259,40 @@ def add_setting():
 def search():
     """Search for stories"""
     query = request.args.get('q', '')
-    stories = Story.query.filter(
-        Story.is_public == True,
-        Story.title.ilike(f'%{query}%') | Story.description.ilike(f'%{query}%')
-    ).all()
+    age_group = request.args.get('age_group') or None
+    theme = request.args.get('theme') or None
+    cursor = request.args.get('cursor')
+    
+    # Ranked full-text search; an empty query (or no FTS5) lists newest stories instead
+    page = search_stories(query, age_group=age_group, theme=theme, cursor=cursor, per_page=get_per_page())
+    if page is None:
+        stmt = StoryCard.select().where(
+            Story.is_public == True,
+            Story.title.ilike(f'%{query}%') | Story.description.ilike(f'%{query}%')
+        )
+        if age_group:
+            stmt = stmt.where(Story.age_group == age_group)
+        if theme:
+            stmt = stmt.where(Story.theme == theme)
+        page = paginate(stmt, Story.updated_at, Story.id, cursor, get_per_page(), StoryCard)
+    
+    if wants_json():
+        return jsonify(page.to_dict('stories'))
     
-    return render_template('story/search_results.html', stories=stories, query=query)
+    return render_template('story/search_results.html', stories=page.items, page=page, query=query,
+                          age_group=age_group, theme=theme)
 
 @story_bp.route('/filter')
 def filter_stories():
     """Filter stories by age group"""
     age_group = request.args.get('age_group', '')
-    stories = Story.query.filter_by(is_public=True, age_group=age_group).all()
+    page = paginate(StoryCard.select().where(Story.is_public == True, Story.age_group == age_group),
+                    Story.updated_at, Story.id, request.args.get('cursor'), get_per_page(), StoryCard)
     
-    return render_template('story/filter_results.html', stories=stories, age_group=age_group)
+    if wants_json():
+        return jsonify(page.to_dict('stories'))
+    
+    return render_template('story/filter_results.html', stories=page.items, page=page, age_group=age_group)
 
 @story_bp.route('/resume/<int:story_id>')
 def resume(story_id):
@@ -266,6 +301,22 @@ def resume(story_id):
         flash('Please log in to resume your story', 'warning')
         return redirect(url_for('auth_bp.login'))
     
+    # Progress is per user, so it and the user are part of the validator
+    from src.models.progress import Progress
+    validators = Story.get_validators(story_id)
+    if validators and (validators.is_public or validators.user_id == session['user_id']):
+        saved = db.session.execute(
+            db.select(Progress.id, Progress.updated_at)
+            .where(Progress.user_id == session['user_id'], Progress.story_id == story_id)
+        ).first()
+        etag = make_etag('resume', story_id, validators.updated_at, validators.elements_version,
+                         session['user_id'], saved)
+        last_modified = max(filter(None, [validators.last_modified,
+                                          saved and saved.updated_at]))
+        response = not_modified(etag, last_modified)
+        if response:
+            return response
+    
     # Get the story using SQLAlchemy 2.0 compatible method
     story = db.session.get(Story, story_id)
     if not story:
@@ -281,7 +332,6 @@ def resume(story_id):
     elements = StoryElement.query.filter_by(story_id=story_id).order_by(StoryElement.position).all()
     
     # Get progress data
-    from src.models.progress import Progress
     progress = Progress.query.filter_by(
         user_id=session['user_id'],
         story_id=story_id
@@ -295,9 +345,10 @@ def resume(story_id):
         # Could track analytics here
         pass
     
-    return render_template('story/resume.html', 
-                          story=story, 
-                          elements=elements,
-                          content=content,
-                          progress=progress,
-                          is_owner=(story.user_id == session.get('user_id')))
+    response = make_response(render_template('story/resume.html', 
+                                             story=story, 
+                                             elements=elements,
+                                             content=content,
+                                             progress=progress,
+                                             is_owner=(story.user_id == session.get('user_id'))))
+    return add_validators(response, etag, last_modified)
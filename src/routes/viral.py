@@ -1,10 +1,17 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, session
-from src.models import db, Story, Challenge, Achievement, User
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, session, make_response
+from src.models import db, Story, StoryCard, StoryLike, Challenge, Achievement, User, UserStats, get_leaderboard, award_achievements, achievement_catalog
+from src.models.achievement_rules import STORY_LIKES, reached_rules
+from src.utils.jobs import job_queue
+from src.utils.pagination import paginate, get_per_page, wants_json
+from src.utils.counters import counters
+from src.utils.http_cache import identity_class, make_etag, not_modified, add_validators
 from datetime import datetime, timedelta
 import logging
 
 # Get logger
 logger = logging.getLogger('storyquest')
+# One line per story in the shared feed; rate limited (see logging_config.py)
+feed_logger = logging.getLogger('storyquest.viral.feed')
 
 viral_bp = Blueprint('viral_bp', __name__)
 
@@ -35,13 +42,13 @@ def share_story(story_id):
         story.is_shared = True
         story.share_message = share_message
         story.share_date = datetime.utcnow()
+        
+        # Check if user earns an achievement for sharing, after this commit
+        award_achievements_job.delay(session['user_id'], 'shared_count')
         db.session.commit()
         
         logger.info(f"Story {story_id} shared by user {session['user_id']} with type {share_type}")
         
-        # Check if user earns an achievement for sharing
-        check_sharing_achievements(session['user_id'])
-        
         flash('Your story has been shared successfully!', 'success')
     
     # Generate share URL
@@ -52,21 +59,29 @@ def share_story(story_id):
 @viral_bp.route('/shared/story/<int:story_id>')
 def view_shared_story(story_id):
     """View a shared story"""
-    story = Story.get_by_id(story_id)
-    if not story:
+    validators = Story.get_validators(story_id)
+    if not validators:
         flash('Story not found', 'danger')
         return redirect(url_for('main.index'))
     
     # Check if story is public
-    if not story.is_public:
+    if not validators.is_public:
         flash('This story is not available for public viewing', 'warning')
         return redirect(url_for('main.index'))
     
-    # Increment view count
-    story.view_count = story.view_count + 1 if story.view_count else 1
-    db.session.commit()
+    # Count the view; buffered and written in batches, not per request.
+    # Revalidated views count too, so this comes before the 304 check.
+    counters.increment(story_id, 'view_count')
     
-    return render_template('viral/view_shared_story.html', story=story)
+    etag = make_etag('shared', story_id, validators.updated_at, validators.elements_version,
+                     identity_class(validators.user_id))
+    response = not_modified(etag, validators.last_modified)
+    if response:
+        return response
+    
+    story = Story.get_by_id(story_id)
+    response = make_response(render_template('viral/view_shared_story.html', story=story))
+    return add_validators(response, etag, validators.last_modified)
 
 @viral_bp.route('/challenges')
 def challenges():
@@ -102,22 +117,27 @@ def view_challenge(challenge_id):
         flash('Challenge not found', 'danger')
         return redirect(url_for('viral_bp.challenges'))
     
-    # Get stories submitted for this challenge
-    stories = Story.query.filter_by(challenge_id=challenge_id, is_public=True).all()
+    # Get a page of stories submitted for this challenge
+    page = paginate(StoryCard.select().where(Story.challenge_id == challenge_id, Story.is_public == True),
+                    Story.updated_at, Story.id, request.args.get('cursor'), get_per_page(), StoryCard)
+    
+    if wants_json():
+        return jsonify(page.to_dict('stories'))
     
     # Check if user is logged in
     user_id = session.get('user_id')
     user_stories = []
     if user_id:
         # Get user's stories that could be submitted
-        user_stories = Story.query.filter_by(
-            user_id=user_id,
-            challenge_id=None
-        ).all()
+        user_stories = StoryCard.fetch(StoryCard.select().where(
+            Story.user_id == user_id,
+            Story.challenge_id == None
+        ))
     
     return render_template('viral/challenge_detail.html', 
                           challenge=challenge, 
-                          stories=stories,
+                          stories=page.items,
+                          page=page,
                           user_stories=user_stories,
                           now=datetime.utcnow())
 
@@ -155,33 +175,23 @@ def submit_to_challenge():
     story.challenge_id = challenge_id
     story.is_public = True  # Make story public when submitting to challenge
     story.submission_date = datetime.utcnow()
+    
+    # Check if user earns an achievement for submitting to a challenge, after this commit
+    award_achievements_job.delay(session['user_id'], 'challenge_count')
     db.session.commit()
     
     logger.info(f"Story {story_id} submitted to challenge {challenge_id} by user {session['user_id']}")
     
-    # Check if user earns an achievement for submitting to a challenge
-    check_challenge_achievements(session['user_id'])
-    
     flash('Story submitted to challenge successfully!', 'success')
     return redirect(url_for('viral_bp.view_challenge', challenge_id=challenge_id))
 
 @viral_bp.route('/leaderboard')
 def leaderboard():
     """Display user leaderboard"""
-    # Get users with the most points from achievements
-    top_users = db.session.query(
-        User, db.func.sum(Achievement.points).label('total_points')
-    ).join(User.achievements).group_by(User.id).order_by(db.desc('total_points')).limit(10).all()
-    
-    # Get users with the most stories
-    most_stories = db.session.query(
-        User, db.func.count(Story.id).label('story_count')
-    ).join(Story).group_by(User.id).order_by(db.desc('story_count')).limit(10).all()
-    
-    # Get users with the most challenge wins
-    challenge_winners = db.session.query(
-        User, db.func.count(Story.id).label('win_count')
-    ).join(Story).filter(Story.is_challenge_winner == True).group_by(User.id).order_by(db.desc('win_count')).limit(10).all()
+    # Precomputed totals (user_stats), read top-down from an index
+    top_users = get_leaderboard('points')
+    most_stories = get_leaderboard('stories')
+    challenge_winners = get_leaderboard('wins')
     
     return render_template('viral/leaderboard.html', 
                           top_users=top_users,
@@ -198,42 +208,81 @@ def featured_stories():
 
 @viral_bp.route('/story/<int:story_id>/like', methods=['POST'])
 def like_story(story_id):
-    """Like a story"""
+    """Like a story; liking it again is a no-op"""
     if 'user_id' not in session:
         return jsonify({'success': False, 'error': 'Not logged in'})
     
     user_id = session['user_id']
-    story = Story.get_by_id(story_id)
+    # Columns only: the stored count must be read from the database, not
+    # from a Story already in the session
+    story = db.session.execute(
+        db.select(Story.id, Story.user_id, Story.like_count).where(Story.id == story_id)
+    ).first()
     if not story:
         return jsonify({'success': False, 'error': 'Story not found'})
     
-    # Check if user has already liked this story
-    # In a real app, we would have a likes table to track this
-    # For now, we'll just increment the like count
+    # The (user, story) primary key keeps one like per user
+    if not StoryLike.add(user_id, story_id):
+        return jsonify({'success': True, 'liked': True,
+                        'likes': (story.like_count or 0) + counters.pending(story_id, 'like_count')})
     
-    story.like_count = story.like_count + 1 if story.like_count else 1
+    # Check if story author earns an achievement for likes, counting this
+    # one before its increment, so the award job commits with the like
+    expected = (story.like_count or 0) + counters.pending(story_id, 'like_count') + 1
+    if reached_rules(STORY_LIKES, expected):
+        award_like_achievements_job.delay(story_id, expected)
     db.session.commit()
     
+    # Atomic buffered increment; the live total is the stored count plus
+    # whatever this process has not flushed yet
+    pending = counters.increment(story_id, 'like_count')
+    like_count = (story.like_count or 0) + pending
+    
     logger.info(f"Story {story_id} liked by user {user_id}")
     
-    # Check if story author earns an achievement for likes
-    if story.like_count in [10, 50, 100]:
-        check_like_achievements(story.user_id, story.like_count)
+    return jsonify({'success': True, 'liked': True, 'likes': like_count})
+
+@viral_bp.route('/story/<int:story_id>/unlike', methods=['POST'])
+def unlike_story(story_id):
+    """Remove the user's like from a story; unliking twice is a no-op"""
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'error': 'Not logged in'})
     
-    return jsonify({'success': True, 'likes': story.like_count})
+    user_id = session['user_id']
+    story = db.session.execute(
+        db.select(Story.id, Story.like_count).where(Story.id == story_id)
+    ).first()
+    if not story:
+        return jsonify({'success': False, 'error': 'Story not found'})
+    
+    if StoryLike.remove(user_id, story_id):
+        db.session.commit()
+        pending = counters.increment(story_id, 'like_count', -1)
+        logger.info(f"Story {story_id} unliked by user {user_id}")
+    else:
+        pending = counters.pending(story_id, 'like_count')
+    
+    return jsonify({'success': True, 'liked': False, 'likes': max(0, (story.like_count or 0) + pending)})
 
 @viral_bp.route('/shared')
 def shared_stories():
     """Display shared stories"""
-    # Get shared stories
-    shared_stories = Story.query.filter_by(is_public=True, is_shared=True).order_by(Story.share_date.desc() if Story.share_date else Story.updated_at.desc()).all()
+    # Get a page of shared stories, newest share first
+    page = paginate(StoryCard.select().where(Story.is_public == True, Story.is_shared == True),
+                    Story.share_date, Story.id, request.args.get('cursor'), get_per_page(), StoryCard)
+    shared_stories = StoryLike.annotate(page.items, session.get('user_id'))
     
     # Debug logging
-    logger.debug(f"Shared stories count: {len(shared_stories)}")
-    for story in shared_stories:
-        logger.debug(f"Shared story: {story.id} - {story.title} - Public: {story.is_public} - Shared: {story.is_shared}")
+    logger.debug("Shared stories count: %s", len(shared_stories))
+    if feed_logger.isEnabledFor(logging.DEBUG):
+        for story in shared_stories:
+            feed_logger.debug("Shared story: %s - %s - Public: %s - Shared: %s",
+                              story.id, story.title, story.is_public, story.is_shared)
+    
+    if wants_json():
+        return jsonify(page.to_dict('stories'))
     
-    return render_template('viral/shared.html', shared_stories=shared_stories)
+    return render_template('viral/shared.html', shared_stories=shared_stories, page=page)
 
 @viral_bp.route('/achievements')
 def achievements():
@@ -247,32 +296,23 @@ def achievements():
         flash('User not found', 'danger')
         return redirect(url_for('auth_bp.login'))
     
-    # Get available achievements that user hasn't earned yet
-    available_achievements = Achievement.get_available_achievements(user)
+    # Earned and available achievements come from the cached catalog; only
+    # the user's earned ids are read from the database
+    earned_ids = achievement_catalog.earned_ids(user.id)
+    earned_achievements = achievement_catalog.earned(earned_ids)
+    available_achievements = achievement_catalog.available(earned_ids)
     
-    # Get user's progress toward achievements
-    progress = {}
-    
-    # Story count achievements
-    story_count = Story.query.filter_by(user_id=user.id).count()
-    progress['story_count'] = story_count
-    
-    # Challenge participation
-    challenge_count = Story.query.filter(
-        Story.user_id == user.id,
-        Story.challenge_id != None
-    ).count()
-    progress['challenge_count'] = challenge_count
-    
-    # Sharing count
-    sharing_count = Story.query.filter_by(
-        user_id=user.id,
-        is_shared=True
-    ).count()
-    progress['sharing_count'] = sharing_count
+    # Get user's progress toward achievements from the denormalized counters
+    stats = UserStats.get_for_user(user.id)
+    progress = {
+        'story_count': stats.story_count,
+        'challenge_count': stats.challenge_count,
+        'sharing_count': stats.shared_count
+    }
     
     return render_template('viral/achievements.html', 
                           user=user,
+                          earned_achievements=earned_achievements,
                           available_achievements=available_achievements,
                           progress=progress)
 
@@ -291,7 +331,7 @@ def award_achievement():
         flash('You do not have permission to award achievements', 'danger')
         return redirect(url_for('dashboard_bp.index'))
     
-    user = User.get_by_id(user_id)
+    user = User.get_by_id(user_id, options=[db.selectinload(User.achievements)])
     if not user:
         flash('User not found', 'danger')
         return redirect(url_for('dashboard_bp.index'))
@@ -312,78 +352,25 @@ def award_achievement():
     
     return redirect(url_for('viral_bp.achievements'))
 
-# Helper functions for achievement checks
+# Background jobs
 
-def check_sharing_achievements(user_id):
-    """Check and award achievements related to story sharing"""
-    user = User.get_by_id(user_id)
-    if not user:
-        logger.error(f"User {user_id} not found when checking sharing achievements")
-        return
-    
-    # Count how many stories the user has shared
-    sharing_count = Story.query.filter_by(
-        user_id=user_id,
-        is_shared=True
-    ).count()
-    
-    # Award achievements based on sharing count
-    if sharing_count == 1:
-        award_achievement_by_name(user, "First Share")
-    elif sharing_count == 5:
-        award_achievement_by_name(user, "Sharing Enthusiast")
-    elif sharing_count == 10:
-        award_achievement_by_name(user, "Social Storyteller")
+@job_queue.task('award_achievements', dedupe_key=lambda user_id, counter: f'achievements:{user_id}:{counter}')
+def award_achievements_job(user_id, counter):
+    """Award achievements a user has reached on one of their counters"""
+    award_achievements(user_id, counter)
 
-def check_challenge_achievements(user_id):
-    """Check and award achievements related to challenge participation"""
-    user = User.get_by_id(user_id)
-    if not user:
-        logger.error(f"User {user_id} not found when checking challenge achievements")
-        return
-    
-    # Count how many challenges the user has participated in
-    challenge_count = Story.query.filter(
-        Story.user_id == user_id,
-        Story.challenge_id != None
-    ).count()
-    
-    # Award achievements based on challenge count
-    if challenge_count == 1:
-        award_achievement_by_name(user, "Challenge Accepted")
-    elif challenge_count == 5:
-        award_achievement_by_name(user, "Challenge Seeker")
-    elif challenge_count == 10:
-        award_achievement_by_name(user, "Challenge Master")
+@job_queue.task('award_like_achievements',
+                dedupe_key=lambda story_id, seen=0: f'achievements:{STORY_LIKES}:{story_id}')
+def award_like_achievements_job(story_id, seen=0):
+    """
+    Award like achievements to a story's author, using the like count as of now
 
-def check_like_achievements(user_id, like_count):
-    """Check and award achievements related to story likes"""
-    user = User.get_by_id(user_id)
-    if not user:
-        logger.error(f"User {user_id} not found when checking like achievements")
-        return
-    
-    # Award achievements based on like count
-    if like_count == 10:
-        award_achievement_by_name(user, "Popular Story")
-    elif like_count == 50:
-        award_achievement_by_name(user, "Trending Story")
-    elif like_count == 100:
-        award_achievement_by_name(user, "Viral Story")
-
-def award_achievement_by_name(user, achievement_name):
-    """Award an achievement to a user by achievement name"""
-    achievement = Achievement.get_by_name(achievement_name)
-    
-    if not achievement:
-        logger.warning(f"Attempted to award non-existent achievement: {achievement_name}")
-        return False
-    
-    # Check if user already has this achievement
-    if achievement in user.achievements:
-        return False
-    
-    user.achievements.append(achievement)
-    db.session.commit()
-    logger.info(f"Achievement '{achievement_name}' awarded to user {user.id}")
-    return True
+    seen is the count the enqueueing request expected; the job can run
+    before that request's own increment lands.
+    """
+    story = db.session.execute(
+        db.select(Story.user_id, Story.like_count).where(Story.id == story_id)
+    ).first()
+    if story:
+        like_count = (story.like_count or 0) + counters.pending(story_id, 'like_count')
+        award_achievements(story.user_id, STORY_LIKES, max(like_count, seen))
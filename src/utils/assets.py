@@ -0,0 +1,398 @@
+import os
+import re
+import gzip
+import json
+import shutil
+import hashlib
+import logging
+import mimetypes
+import brotli
+from flask import current_app, request, send_file, url_for
+from werkzeug.exceptions import NotFound
+from werkzeug.security import safe_join
+from PIL import Image
+
+try:
+    from zopfli import gzip as zopfli_gzip
+except ImportError:  # optional; plain gzip -9 is a few percent larger
+    zopfli_gzip = None
+
+# Get logger
+logger = logging.getLogger('storyquest')
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STATIC_DIR = os.path.join(SRC_DIR, 'static')
+TEMPLATES_DIR = os.path.join(SRC_DIR, 'templates')
+
+# Static-relative output of the build step; generated, not committed
+BUILD_DIR = 'build'
+IMAGE_MANIFEST = f'{BUILD_DIR}/images.json'
+
+# Directories of bundled images that are built, each without its
+# subdirectories. User images (images/characters, images/settings and
+# images/uploads) have their own pipeline and stay out of the build.
+BUNDLED_IMAGE_DIRS = ('images', 'images/age-groups', 'images/badges', 'images/featured',
+                      'images/icons', 'images/testimonials')
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+# Candidate widths for srcset; images are never upscaled, and the original
+# width is added when it is below the largest
+IMAGE_WIDTHS = (64, 128, 256, 384, 512, 768, 1024, 1536)
+
+IMAGE_SAVE_OPTIONS = {
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 6},
+    'png': {'format': 'PNG', 'optimize': True},
+    'jpg': {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True},
+}
+MIME_TYPES = {'webp': 'image/webp', 'png': 'image/png', 'jpg': 'image/jpeg'}
+
+# Fingerprinted copies of every static file, and the manifest mapping
+# logical names (css/main.css) to them
+ASSET_DIR = f'{BUILD_DIR}/assets'
+ASSET_MANIFEST = f'{BUILD_DIR}/assets.json'
+# Fingerprinted: files directly in the static root and the bundled image
+# directories, and everything under the bundled trees, which include the
+# build's image variants. User images are served as they are.
+ASSET_TREES = ('css', 'js', BUILD_DIR)
+# Not fingerprinted: the build's own output and manifests
+ASSET_EXCLUDE = (f'{BUILD_DIR}/assets/',)
+
+# Text types worth precompressing; images and fonts are compressed already
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.json', '.svg', '.html', '.txt', '.xml', '.map')
+# Kept only when at least this much smaller than the original
+MIN_COMPRESSION_RATIO = 0.9
+# Content-Encoding -> sibling file suffix, in server preference order
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+# Fingerprinted URLs never change meaning, so browsers may keep them forever
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+# Viewport assumed when reporting on sizes given in vw
+REPORT_VIEWPORT = 1280
+
+
+def _sha256(path):
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def _encode(image, fmt, target):
+    if fmt == 'png' and image.mode == 'RGB':
+        # Palette PNGs are a fraction of the size; WebP carries the full colour
+        image = image.quantize(colors=256, method=Image.Quantize.MEDIANCUT, dither=Image.Dither.FLOYDSTEINBERG)
+    image.save(target, **IMAGE_SAVE_OPTIONS[fmt])
+    return os.path.getsize(target)
+
+
+def build_image(static_dir, filename):
+    """Write every width and format of one bundled image; returns its manifest entry"""
+    source = os.path.join(static_dir, filename)
+    stem, ext = os.path.splitext(filename)
+    fallback = 'jpg' if ext.lower() in ('.jpg', '.jpeg') else 'png'
+    with Image.open(source) as original:
+        has_alpha = original.mode in ('RGBA', 'LA', 'PA') or 'transparency' in original.info
+        image = original.convert('RGBA' if has_alpha and fallback == 'png' else 'RGB')
+
+    widths = [width for width in IMAGE_WIDTHS if width < image.width]
+    if image.width <= IMAGE_WIDTHS[-1]:
+        widths.append(image.width)
+    variants = {'webp': [], fallback: []}
+    for width in widths:
+        height = round(image.height * width / image.width)
+        resized = image.resize((width, height), Image.LANCZOS)
+        for fmt in variants:
+            output = f'{BUILD_DIR}/{stem}.{width}.{fmt}'
+            target = os.path.join(static_dir, output)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            variants[fmt].append([width, output, _encode(resized, fmt, target)])
+
+    return {
+        'sha256': _sha256(source),
+        'bytes': os.path.getsize(source),
+        'width': image.width,
+        'height': image.height,
+        'fallback': fallback,
+        'variants': variants,
+    }
+
+
+def find_images(static_dir=STATIC_DIR):
+    """Static-relative paths of the bundled images the build step covers"""
+    found = []
+    for directory in BUNDLED_IMAGE_DIRS:
+        path = os.path.join(static_dir, directory)
+        if not os.path.isdir(path):
+            continue
+        for name in os.listdir(path):
+            if name.lower().endswith(IMAGE_EXTENSIONS) and os.path.isfile(os.path.join(path, name)):
+                found.append(f'{directory}/{name}')
+    return sorted(found)
+
+
+def build_images(static_dir=STATIC_DIR, force=False):
+    """
+    Build resized, recompressed variants of the bundled images
+
+    Each image gets WebP and PNG (JPEG for photos) files at every width in
+    IMAGE_WIDTHS below its own, listed in build/images.json. Images whose
+    bytes are unchanged since the last build are skipped unless force is
+    set. Returns the manifest.
+    """
+    manifest_path = os.path.join(static_dir, IMAGE_MANIFEST)
+    previous = {} if force else _read_manifest(manifest_path)
+    manifest = {}
+    for filename in find_images(static_dir):
+        entry = previous.get(filename)
+        if entry and entry['sha256'] == _sha256(os.path.join(static_dir, filename)) and all(
+                os.path.exists(os.path.join(static_dir, output))
+                for outputs in entry['variants'].values() for _, output, _ in outputs):
+            manifest[filename] = entry
+            continue
+        manifest[filename] = build_image(static_dir, filename)
+        logger.info(f"Built {filename}")
+
+    os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    _loaded.clear()
+    return manifest
+
+
+def _read_manifest(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+# Manifest per static directory, read once per process
+_loaded = {}
+
+
+def load_image_manifest(static_dir=STATIC_DIR):
+    if static_dir not in _loaded:
+        _loaded[static_dir] = _read_manifest(os.path.join(static_dir, IMAGE_MANIFEST))
+    return _loaded[static_dir]
+
+
+def _srcset(outputs):
+    return ', '.join(f"{url_for('static', filename=output)} {width}w" for width, output, _ in outputs)
+
+
+def static_image(filename):
+    """
+    Template helper: srcset data for a bundled image
+
+    Returns a dict with the fallback src and srcset and a list of
+    (mime type, srcset) sources for a <picture>. Before the build step has
+    run, src is the original file and there are no alternatives.
+    """
+    entry = load_image_manifest(current_app.static_folder).get(filename)
+    if entry is None:
+        return {'src': url_for('static', filename=filename), 'srcset': '', 'sources': []}
+    fallback = entry['variants'][entry['fallback']]
+    return {
+        'src': url_for('static', filename=fallback[-1][1]),
+        'srcset': _srcset(fallback),
+        'sources': [(MIME_TYPES[fmt], _srcset(outputs))
+                    for fmt, outputs in entry['variants'].items() if fmt != entry['fallback']],
+    }
+
+
+# responsive_static_image('images/logo.png', '60px', ...) calls in templates
+STATIC_IMAGE_CALL = re.compile(r"responsive_static_image\(\s*'([^']+)'\s*,\s*'([^']+)'")
+SIZES_ENTRY = re.compile(r'^(?:\((min|max)-width:\s*(\d+)px\)\s*)?(\d+(?:\.\d+)?)(px|vw)$')
+
+
+def display_width(sizes, viewport=REPORT_VIEWPORT):
+    """CSS pixel width a sizes attribute selects at the given viewport width"""
+    for entry in sizes.split(','):
+        match = SIZES_ENTRY.match(entry.strip())
+        if match is None:
+            continue
+        condition, limit, value, unit = match.groups()
+        if condition == 'min' and viewport < int(limit) or condition == 'max' and viewport > int(limit):
+            continue
+        return float(value) * (viewport / 100 if unit == 'vw' else 1)
+    return viewport
+
+
+def chosen_variant(outputs, width):
+    """The srcset candidate a browser at 1x density picks for a slot width"""
+    for candidate in outputs:
+        if candidate[0] >= width:
+            return candidate
+    return outputs[-1]
+
+
+def image_savings_report(manifest, templates_dir=TEMPLATES_DIR, viewport=REPORT_VIEWPORT):
+    """
+    Bytes each template's bundled images cost before and after the build
+
+    Before is the original file; after is the WebP a 1x browser at the
+    given viewport picks from the srcset. Returns (template, images,
+    before, after) rows, largest saving first.
+    """
+    rows = []
+    for root, dirs, files in os.walk(templates_dir):
+        for name in files:
+            path = os.path.join(root, name)
+            with open(path) as f:
+                calls = STATIC_IMAGE_CALL.findall(f.read())
+            before = after = count = 0
+            for filename, sizes in calls:
+                entry = manifest.get(filename)
+                if entry is None:
+                    continue
+                count += 1
+                before += entry['bytes']
+                after += chosen_variant(entry['variants']['webp'], display_width(sizes, viewport))[2]
+            if count:
+                rows.append((os.path.relpath(path, templates_dir), count, before, after))
+    return sorted(rows, key=lambda row: row[3] - row[2])
+
+
+def _compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=11)
+    if zopfli_gzip is not None:
+        return zopfli_gzip.compress(data)
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def fingerprint_asset(static_dir, filename, sha256):
+    """Write the content-hashed copy of one static file and its .br/.gz siblings; returns its manifest entry"""
+    stem, ext = os.path.splitext(filename)
+    output = f'{ASSET_DIR}/{stem}.{sha256[:12]}{ext}'
+    source = os.path.join(static_dir, filename)
+    target = os.path.join(static_dir, output)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    shutil.copyfile(source, target)
+
+    encodings = []
+    if ext.lower() in COMPRESSIBLE_EXTENSIONS:
+        with open(source, 'rb') as f:
+            data = f.read()
+        for encoding, suffix in ENCODINGS:
+            compressed = _compress(data, encoding)
+            if len(compressed) <= len(data) * MIN_COMPRESSION_RATIO:
+                with open(target + suffix, 'wb') as f:
+                    f.write(compressed)
+                encodings.append(encoding)
+    return {'path': output, 'sha256': sha256, 'encodings': encodings}
+
+
+def _is_bundled_asset(filename):
+    directory = os.path.dirname(filename)
+    return directory in ('',) + BUNDLED_IMAGE_DIRS or \
+        any(directory == tree or directory.startswith(tree + '/') for tree in ASSET_TREES)
+
+
+def find_assets(static_dir=STATIC_DIR):
+    """Static-relative paths of every file the fingerprinting step covers"""
+    found = []
+    for root, dirs, files in os.walk(static_dir):
+        for name in files:
+            filename = os.path.relpath(os.path.join(root, name), static_dir).replace(os.sep, '/')
+            if _is_bundled_asset(filename) and not filename.startswith(ASSET_EXCLUDE) and filename != ASSET_MANIFEST:
+                found.append(filename)
+    return sorted(found)
+
+
+def build_static_assets(static_dir=STATIC_DIR):
+    """
+    Fingerprint every static file and precompress the text ones
+
+    Each file is copied to build/assets with the first 12 hex digits of
+    its SHA-256 in the name, text files get brotli and gzip siblings, and
+    build/assets.json maps the logical names to them. Files whose hash is
+    unchanged are not rewritten; outputs no longer in the manifest are
+    deleted. Run after build_images so the image variants are included.
+    Returns the manifest.
+    """
+    manifest_path = os.path.join(static_dir, ASSET_MANIFEST)
+    previous = _read_manifest(manifest_path)
+    manifest = {}
+    for filename in find_assets(static_dir):
+        sha256 = _sha256(os.path.join(static_dir, filename))
+        entry = previous.get(filename)
+        if entry and entry['sha256'] == sha256 and os.path.exists(os.path.join(static_dir, entry['path'])):
+            manifest[filename] = entry
+        else:
+            manifest[filename] = fingerprint_asset(static_dir, filename, sha256)
+
+    current = {entry['path'] + suffix for entry in manifest.values() for suffix in ('', '.br', '.gz')}
+    for root, dirs, files in os.walk(os.path.join(static_dir, ASSET_DIR)):
+        for name in files:
+            path = os.path.join(root, name)
+            if os.path.relpath(path, static_dir).replace(os.sep, '/') not in current:
+                os.remove(path)
+
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    _assets.clear()
+    return manifest
+
+
+# (logical name -> entry, fingerprinted path -> entry) per static directory
+_assets = {}
+
+
+def load_asset_manifest(static_dir=STATIC_DIR):
+    if static_dir not in _assets:
+        manifest = _read_manifest(os.path.join(static_dir, ASSET_MANIFEST))
+        _assets[static_dir] = (manifest, {entry['path']: entry for entry in manifest.values()})
+    return _assets[static_dir]
+
+
+def _fingerprinted_url_defaults(endpoint, values):
+    # url_for('static', filename='css/main.css') -> build/assets/css/main.<hash>.css
+    if endpoint == 'static' and current_app.config['ASSET_FINGERPRINTS']:
+        entry = load_asset_manifest(current_app.static_folder)[0].get(values.get('filename'))
+        if entry is not None:
+            values['filename'] = entry['path']
+
+
+def send_static_asset(filename):
+    """
+    Static view: fingerprinted files with negotiated encoding and immutable caching
+
+    Files without a fingerprint are served as Flask would serve them.
+    """
+    static_folder = current_app.static_folder
+    entry = load_asset_manifest(static_folder)[1].get(filename)
+    if entry is None:
+        return current_app.send_static_file(filename)
+
+    path = safe_join(static_folder, filename)
+    if path is None or not os.path.isfile(path):
+        raise NotFound()
+    content_encoding = None
+    for encoding, suffix in ENCODINGS:
+        if encoding in entry['encodings'] and request.accept_encodings[encoding]:
+            content_encoding, path = encoding, path + suffix
+            break
+
+    response = send_file(path, mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream',
+                         conditional=True, max_age=IMMUTABLE_MAX_AGE)
+    if content_encoding:
+        response.headers['Content-Encoding'] = content_encoding
+    if entry['encodings']:
+        response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+def init_assets(app):
+    """Expose static_image to templates and serve static files through the asset manifest"""
+    # Resolve url_for('static', ...) to fingerprinted files once build-assets has run
+    app.config.setdefault('ASSET_FINGERPRINTS', True)
+    app.jinja_env.globals['static_image'] = static_image
+    app.url_defaults(_fingerprinted_url_defaults)
+    if app.has_static_folder:
+        app.view_functions['static'] = send_static_asset
@@ -0,0 +1,181 @@
+import zlib
+import logging
+import brotli
+from werkzeug.datastructures import Headers
+from werkzeug.http import parse_accept_header, parse_options_header
+
+# Get logger
+logger = logging.getLogger('storyquest')
+
+# Bodies smaller than this are sent as-is; framing overhead eats the saving
+DEFAULT_MIN_SIZE = 500
+# Dynamic responses worth compressing; static files are precompressed at build time
+DEFAULT_MIMETYPES = ('text/html', 'application/json')
+# Brotli 4 and gzip 6 cost about the same CPU; brotli 4 saves more bytes.
+# Higher levels multiply the CPU per request for a few percent.
+DEFAULT_BROTLI_QUALITY = 4
+DEFAULT_GZIP_LEVEL = 6
+
+# Server preference when the client accepts both equally
+ENCODINGS = ('br', 'gzip')
+
+
+class StreamCompressor:
+    """Incremental brotli or gzip encoder with the same interface for both"""
+
+    def __init__(self, encoding, brotli_quality=DEFAULT_BROTLI_QUALITY, gzip_level=DEFAULT_GZIP_LEVEL):
+        self.encoding = encoding
+        if encoding == 'br':
+            self._compressor = brotli.Compressor(quality=brotli_quality)
+        else:
+            # wbits 31: zlib stream with a gzip header and trailer
+            self._compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+
+    def compress(self, data, flush=False):
+        """Encode a chunk; flush makes everything so far decodable by the client"""
+        if self.encoding == 'br':
+            out = self._compressor.process(data)
+            return out + self._compressor.flush() if flush else out
+        out = self._compressor.compress(data)
+        return out + self._compressor.flush(zlib.Z_SYNC_FLUSH) if flush else out
+
+    def finish(self):
+        if self.encoding == 'br':
+            return self._compressor.finish()
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+def compress(data, encoding, brotli_quality=DEFAULT_BROTLI_QUALITY, gzip_level=DEFAULT_GZIP_LEVEL):
+    """Encode a whole body in one go"""
+    compressor = StreamCompressor(encoding, brotli_quality, gzip_level)
+    return compressor.compress(data) + compressor.finish()
+
+
+def choose_encoding(accept_encoding):
+    """The supported encoding the client ranks highest, or None"""
+    accepted = parse_accept_header(accept_encoding)
+    best = max(ENCODINGS, key=lambda encoding: accepted[encoding])
+    return best if accepted[best] > 0 else None
+
+
+class CompressionMiddleware:
+    """
+    WSGI middleware that brotli- or gzip-encodes HTML and JSON responses
+
+    The encoding is negotiated from Accept-Encoding. Responses are skipped
+    when they are already encoded, partial, marked no-transform, of a type
+    outside COMPRESS_MIMETYPES or, with a known length, smaller than
+    COMPRESS_MIN_SIZE. A body with a Content-Length is compressed whole and
+    gets a new length; a streamed body is compressed chunk by chunk, each
+    flushed so the client can render it as it arrives.
+    """
+
+    def __init__(self, wsgi_app, config):
+        self.wsgi_app = wsgi_app
+        self.config = config
+
+    def __call__(self, environ, start_response):
+        encoding = None
+        if self.config['COMPRESS_ENABLED']:
+            encoding = choose_encoding(environ.get('HTTP_ACCEPT_ENCODING', ''))
+
+        captured = {}
+
+        def capture_start_response(status, headers, exc_info=None):
+            if exc_info is not None or captured.get('started'):
+                # An error after the headers were sent, or a late start; pass through
+                captured['passthrough'] = True
+                return start_response(status, headers, exc_info)
+            captured.update(status=status, headers=headers, exc_info=exc_info)
+            return self._buffered_write(captured)
+
+        app_iter = self.wsgi_app(environ, capture_start_response)
+        if 'status' not in captured or captured.get('passthrough'):
+            # The app starts the response lazily; nothing can be decided up front
+            captured['started'] = True
+            return app_iter
+
+        status, headers = captured['status'], Headers(captured['headers'])
+        self._add_vary(headers)
+        if encoding is None or environ.get('REQUEST_METHOD') == 'HEAD' or not self._should_compress(status, headers):
+            captured['started'] = True
+            write = start_response(status, headers.to_wsgi_list())
+            for chunk in captured.get('written', ()):
+                write(chunk)
+            return app_iter
+
+        headers['Content-Encoding'] = encoding
+        etag = headers.get('ETag')
+        if etag and not etag.startswith('W/'):
+            # The encoded bytes differ, so the validator can only be weak
+            headers['ETag'] = 'W/' + etag
+        options = {'brotli_quality': self.config['COMPRESS_BROTLI_QUALITY'],
+                   'gzip_level': self.config['COMPRESS_GZIP_LEVEL']}
+
+        if 'Content-Length' in headers:
+            try:
+                body = b''.join(captured.get('written', [])) + b''.join(app_iter)
+            finally:
+                if hasattr(app_iter, 'close'):
+                    app_iter.close()
+            body = compress(body, encoding, **options)
+            headers['Content-Length'] = str(len(body))
+            captured['started'] = True
+            start_response(status, headers.to_wsgi_list())
+            return [body]
+
+        captured['started'] = True
+        start_response(status, headers.to_wsgi_list())
+        return self._stream(app_iter, StreamCompressor(encoding, **options), captured.get('written', []))
+
+    def _should_compress(self, status, headers):
+        code = int(status.split(None, 1)[0])
+        if code < 200 or code in (204, 206, 304):
+            return False
+        if 'Content-Encoding' in headers or 'Content-Range' in headers:
+            return False
+        if 'no-transform' in headers.get('Cache-Control', ''):
+            return False
+        mimetype = parse_options_header(headers.get('Content-Type', ''))[0]
+        if mimetype not in self.config['COMPRESS_MIMETYPES']:
+            return False
+        length = headers.get('Content-Length')
+        return length is None or int(length) >= self.config['COMPRESS_MIN_SIZE']
+
+    def _add_vary(self, headers):
+        # Any response that could be compressed varies by Accept-Encoding
+        mimetype = parse_options_header(headers.get('Content-Type', ''))[0]
+        if mimetype in self.config['COMPRESS_MIMETYPES']:
+            vary = [value.strip() for value in headers.get('Vary', '').split(',') if value.strip()]
+            if 'accept-encoding' not in {value.lower() for value in vary}:
+                headers['Vary'] = ', '.join(vary + ['Accept-Encoding'])
+
+    @staticmethod
+    def _buffered_write(captured):
+        # Legacy write() calls made before the body is returned are held back
+        def write(data):
+            captured.setdefault('written', []).append(data)
+        return write
+
+    @staticmethod
+    def _stream(app_iter, compressor, written):
+        try:
+            for chunk in written:
+                yield compressor.compress(chunk, flush=True)
+            for chunk in app_iter:
+                if chunk:
+                    yield compressor.compress(chunk, flush=True)
+            yield compressor.finish()
+        finally:
+            if hasattr(app_iter, 'close'):
+                app_iter.close()
+
+
+def init_compression(app):
+    """Compress the app's HTML and JSON responses; settings are read per request"""
+    app.config.setdefault('COMPRESS_ENABLED', True)
+    app.config.setdefault('COMPRESS_MIN_SIZE', DEFAULT_MIN_SIZE)
+    app.config.setdefault('COMPRESS_MIMETYPES', DEFAULT_MIMETYPES)
+    app.config.setdefault('COMPRESS_BROTLI_QUALITY', DEFAULT_BROTLI_QUALITY)
+    app.config.setdefault('COMPRESS_GZIP_LEVEL', DEFAULT_GZIP_LEVEL)
+    app.wsgi_app = CompressionMiddleware(app.wsgi_app, app.config)
@@ -0,0 +1,140 @@
+import atexit
+import logging
+import threading
+from collections import defaultdict
+from sqlalchemy import text
+from src.models import db
+
+# Get logger
+logger = logging.getLogger('storyquest')
+
+# Story columns that may be incremented through the buffer
+COUNTER_FIELDS = ('view_count', 'like_count')
+
+# Seconds between background flushes; 0 writes every increment through at once
+DEFAULT_FLUSH_INTERVAL = 5.0
+# Pending (story, field) entries that trigger an early flush
+DEFAULT_MAX_PENDING = 1000
+
+
+class CounterBuffer:
+    """
+    Write-behind buffer for story view and like counters
+
+    Increments are summed in memory per process and written periodically as
+    one batched ``UPDATE stories SET <field> = <field> + :delta`` per field,
+    so a page view costs a dict update instead of a transaction and
+    concurrent likes never lose updates. Pending deltas are flushed on
+    shutdown and can be read back with pending()/current().
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._lock = threading.Lock()
+        self._pending = defaultdict(int)
+        self._wakeup = threading.Event()
+        self._stopping = False
+        self._thread = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Read flush settings from the app config and flush again at exit"""
+        app.config.setdefault('COUNTER_FLUSH_INTERVAL', DEFAULT_FLUSH_INTERVAL)
+        app.config.setdefault('COUNTER_MAX_PENDING', DEFAULT_MAX_PENDING)
+        app.extensions['counters'] = self
+        app.jinja_env.globals['live_count'] = self.current
+        if self.app is None:
+            atexit.register(self.stop)
+        self.app = app
+
+    @property
+    def interval(self):
+        return self.app.config['COUNTER_FLUSH_INTERVAL'] if self.app else 0
+
+    def increment(self, story_id, field, amount=1):
+        """Add to a story counter; returns the delta now pending for it, including this one"""
+        if field not in COUNTER_FIELDS:
+            raise ValueError(f"Unknown story counter '{field}'")
+        with self._lock:
+            self._pending[(story_id, field)] += amount
+            delta = self._pending[(story_id, field)]
+            size = len(self._pending)
+        if not self.interval:
+            self.flush()
+        else:
+            self._ensure_flusher()
+            if size >= self.app.config['COUNTER_MAX_PENDING']:
+                self._wakeup.set()
+        return delta
+
+    def pending(self, story_id, field):
+        """Increment not yet written to the database for one story counter"""
+        with self._lock:
+            return self._pending.get((story_id, field), 0)
+
+    def current(self, story, field):
+        """Stored value plus pending increments for a Story or StoryCard"""
+        return (getattr(story, field) or 0) + self.pending(story.id, field)
+
+    def flush(self):
+        """Write all pending increments; returns the number of rows updated"""
+        with self._lock:
+            batch, self._pending = self._pending, defaultdict(int)
+        if not batch:
+            return 0
+
+        by_field = defaultdict(list)
+        for (story_id, field), delta in batch.items():
+            if delta:
+                by_field[field].append({'story_id': story_id, 'delta': delta})
+        try:
+            # Own connection and transaction, so a request's unfinished work is
+            # never committed here; updated_at is left alone on purpose
+            with db.engine.begin() as connection:
+                for field, params in by_field.items():
+                    connection.execute(text(
+                        f"UPDATE stories SET {field} = coalesce({field}, 0) + :delta WHERE id = :story_id"
+                    ), params)
+        except Exception as e:
+            logger.error(f"Failed to flush story counters, will retry: {e}")
+            with self._lock:
+                for key, delta in batch.items():
+                    self._pending[key] += delta
+            return 0
+        logger.debug(f"Flushed {len(batch)} story counter increments")
+        return len(batch)
+
+    def stop(self):
+        """Stop the background flusher and write whatever is still pending"""
+        self._stopping = True
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+            self._thread = None
+        self._wakeup.clear()
+        if self.app is not None:
+            with self.app.app_context():
+                self.flush()
+        self._stopping = False
+
+    def _ensure_flusher(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='counter-flusher', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._stopping:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            if self._stopping:
+                break
+            with self.app.app_context():
+                self.flush()
+
+
+# Shared instance, bound to the app in create_app
+counters = CounterBuffer()
@@ -0,0 +1,174 @@
+import os
+import logging
+from sqlalchemy import event, inspect
+
+# Get logger
+logger = logging.getLogger('storyquest')
+
+# Default on-disk database location, shared with reinit_db.py. This is the
+# instance-folder file Flask-SQLAlchemy resolved 'sqlite:///storyquest.db' to.
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                               'instance', 'storyquest.db')
+
+# Named storage-engine profiles.
+#
+# Each profile sets where the database lives and which connection-level
+# pragmas are applied to every new SQLite connection. A database_path of
+# None means an in-memory database.
+PROFILES = {
+    'dev': {
+        'database_path': DEFAULT_DB_PATH,
+        'engine_options': {},
+        'pragmas': {
+            'journal_mode': 'WAL',
+            'synchronous': 'NORMAL',
+            'mmap_size': 64 * 1024 * 1024,  # 64MB
+            'cache_size': -16000,  # ~16MB (negative values are KiB)
+            'temp_store': 'MEMORY',
+            'busy_timeout': 5000,  # milliseconds
+        },
+    },
+    'test': {
+        'database_path': None,
+        'engine_options': {},
+        'pragmas': {
+            'journal_mode': 'MEMORY',
+            'synchronous': 'OFF',
+            'cache_size': -8000,
+            'temp_store': 'MEMORY',
+            'busy_timeout': 1000,
+        },
+    },
+    'production-high-concurrency': {
+        'database_path': DEFAULT_DB_PATH,
+        'engine_options': {
+            'pool_size': 20,
+            'max_overflow': 10,
+            'pool_pre_ping': True,
+        },
+        'pragmas': {
+            'journal_mode': 'WAL',
+            'synchronous': 'NORMAL',
+            'mmap_size': 256 * 1024 * 1024,  # 256MB
+            'cache_size': -64000,  # ~64MB
+            'temp_store': 'MEMORY',
+            'busy_timeout': 15000,
+            'wal_autocheckpoint': 1000,
+        },
+    },
+}
+
+# Order matters: busy_timeout must be in place before journal_mode, which
+# needs a write lock when switching to WAL.
+PRAGMA_ORDER = ['busy_timeout', 'journal_mode', 'synchronous', 'mmap_size',
+                'cache_size', 'temp_store', 'wal_autocheckpoint']
+
+
+def get_profile_name(name=None):
+    """
+    Resolve the database profile name to use
+
+    Explicit names win, then STORYQUEST_DB_PROFILE, then FLASK_ENV.
+    """
+    if name:
+        profile_name = name
+    elif os.environ.get('STORYQUEST_DB_PROFILE'):
+        profile_name = os.environ['STORYQUEST_DB_PROFILE']
+    elif os.environ.get('FLASK_ENV') == 'production':
+        profile_name = 'production-high-concurrency'
+    else:
+        profile_name = 'dev'
+
+    if profile_name not in PROFILES:
+        raise ValueError(f"Unknown database profile: {profile_name}")
+    return profile_name
+
+
+def get_database_uri(profile_name, database_path=None):
+    """Build an absolute SQLite URI for a profile"""
+    profile = PROFILES[profile_name]
+    path = database_path or os.environ.get('STORYQUEST_DB_PATH') or profile['database_path']
+    if path is None:
+        return 'sqlite://'
+    return f"sqlite:///{os.path.abspath(path)}"
+
+
+def set_sqlite_pragmas(dbapi_connection, pragmas):
+    """Apply pragmas to a raw sqlite3 connection"""
+    cursor = dbapi_connection.cursor()
+    try:
+        for pragma in PRAGMA_ORDER:
+            if pragma in pragmas:
+                cursor.execute(f"PRAGMA {pragma}={pragmas[pragma]}")
+    finally:
+        cursor.close()
+
+
+def register_pragma_listener(engine, pragmas):
+    """Apply pragmas to every new connection made by an engine"""
+    if engine.dialect.name != 'sqlite':
+        return
+
+    @event.listens_for(engine, 'connect')
+    def on_connect(dbapi_connection, connection_record):
+        set_sqlite_pragmas(dbapi_connection, pragmas)
+
+
+def configure_database(app, profile=None, database_path=None):
+    """
+    Set database config on the app for a named profile
+
+    Call before db.init_app(app). Returns the resolved profile name.
+    """
+    profile_name = get_profile_name(profile)
+    settings = PROFILES[profile_name]
+
+    app.config['STORYQUEST_DB_PROFILE'] = profile_name
+    app.config['SQLALCHEMY_DATABASE_URI'] = get_database_uri(profile_name, database_path)
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = dict(settings['engine_options'])
+    if app.config['SQLALCHEMY_DATABASE_URI'] == 'sqlite://':
+        # In-memory databases use a StaticPool, which takes no pool sizing
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {}
+    return profile_name
+
+
+def init_engine_events(app, db):
+    """Register connect events for the app's engines; call after db.init_app(app)"""
+    pragmas = PROFILES[app.config['STORYQUEST_DB_PROFILE']]['pragmas']
+    with app.app_context():
+        register_pragma_listener(db.engine, pragmas)
+    logger.info(f"Database profile '{app.config['STORYQUEST_DB_PROFILE']}' using {app.config['SQLALCHEMY_DATABASE_URI']}")
+
+
+def create_missing_indexes(db):
+    """
+    Create model indexes that an existing database does not have yet
+
+    db.create_all() only adds indexes when it creates the table, so databases
+    created before an index was declared need this. Call inside an app context.
+    """
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=db.engine, checkfirst=True)
+
+
+def create_missing_columns(db):
+    """
+    Add nullable model columns that an existing table does not have yet
+
+    db.create_all() never alters existing tables. Only nullable columns
+    without server defaults are added; anything else needs a migration.
+    Call inside an app context.
+    """
+    inspector = inspect(db.engine)
+    with db.engine.begin() as connection:
+        for table in db.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing or not column.nullable or column.server_default is not None:
+                    continue
+                column_type = column.type.compile(dialect=connection.dialect)
+                connection.exec_driver_sql(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}')
+                logger.info(f"Added column {table.name}.{column.name}")
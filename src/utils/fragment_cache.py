@@ -0,0 +1,108 @@
+import logging
+import threading
+from collections import OrderedDict
+from jinja2 import nodes
+from jinja2.ext import Extension
+
+# Get logger
+logger = logging.getLogger('storyquest')
+
+# Rendered fragments kept per process; the least recently used go first
+DEFAULT_MAX_ENTRIES = 10000
+
+
+class FragmentCacheExtension(Extension):
+    """
+    Jinja tag caching the HTML of a template block under a key
+
+        {% cache 'story-element', element.id, element.render_version %}
+            ...
+        {% endcache %}
+
+    The key is every expression after the tag and must be hashable. Put
+    whatever the block's output depends on into it; a changed value is a
+    new key, so nothing is ever invalidated by hand.
+    """
+
+    tags = {'cache'}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=None)
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        key = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            key.append(parser.parse_expression())
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+        call = self.call_method('_render_cached', [nodes.Tuple(key, 'load')])
+        return nodes.CallBlock(call, [], [], body).set_lineno(lineno)
+
+    def _render_cached(self, key, caller):
+        cache = self.environment.fragment_cache
+        if cache is None or not cache.enabled:
+            return caller()
+        return cache.get_or_render(key, caller)
+
+
+class FragmentCache:
+    """
+    In-process LRU store behind the {% cache %} template tag
+
+    Fragments are shared by every viewer, so only cache blocks whose output
+    is fully determined by their key. Entries for old versions are never
+    looked up again and age out once FRAGMENT_CACHE_MAX_ENTRIES is reached.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._lock = threading.Lock()
+        self._fragments = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Add the {% cache %} tag to the app's templates"""
+        app.config.setdefault('FRAGMENT_CACHE_ENABLED', True)
+        app.config.setdefault('FRAGMENT_CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES)
+        app.extensions['fragment_cache'] = self
+        app.jinja_env.add_extension(FragmentCacheExtension)
+        app.jinja_env.fragment_cache = self
+        self.app = app
+
+    @property
+    def enabled(self):
+        return self.app is not None and self.app.config['FRAGMENT_CACHE_ENABLED']
+
+    def get_or_render(self, key, render):
+        """The fragment stored under key, rendering and storing it on a miss"""
+        with self._lock:
+            fragment = self._fragments.get(key)
+            if fragment is not None:
+                self._fragments.move_to_end(key)
+                self.hits += 1
+                return fragment
+            self.misses += 1
+        # Rendered outside the lock; two concurrent misses both render
+        fragment = render()
+        with self._lock:
+            self._fragments[key] = fragment
+            while len(self._fragments) > self.app.config['FRAGMENT_CACHE_MAX_ENTRIES']:
+                self._fragments.popitem(last=False)
+        return fragment
+
+    def clear(self):
+        """Drop every stored fragment"""
+        with self._lock:
+            self._fragments.clear()
+            self.hits = self.misses = 0
+
+    def __len__(self):
+        return len(self._fragments)
+
+
+# Shared cache; bound to the app in create_app
+fragment_cache = FragmentCache()
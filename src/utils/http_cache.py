@@ -0,0 +1,58 @@
+import hashlib
+from datetime import timezone
+from flask import Response, request, session
+
+# Viewer classes a page may render differently for
+ANONYMOUS = 'anonymous'
+OWNER = 'owner'
+READER = 'reader'
+
+
+def identity_class(owner_id):
+    """How the current viewer relates to a page's owner: anonymous, owner or reader"""
+    user_id = session.get('user_id')
+    if user_id is None:
+        return ANONYMOUS
+    return OWNER if user_id == owner_id else READER
+
+
+def make_etag(*parts):
+    """Opaque entity tag for the values a rendered page depends on"""
+    return hashlib.sha1('|'.join(str(part) for part in parts).encode()).hexdigest()[:20]
+
+
+def not_modified(etag, last_modified=None):
+    """
+    A 304 response if the request's validators match, else None
+
+    If-None-Match is compared weakly, since compressed responses carry a
+    weak tag, and If-Modified-Since is only consulted without it. A
+    pending flash message means the page must be rendered to show it.
+    """
+    if session.get('_flashes'):
+        return None
+    if request.if_none_match:
+        matched = request.if_none_match.contains_weak(etag)
+    elif request.if_modified_since and last_modified is not None:
+        matched = _http_time(last_modified) <= request.if_modified_since
+    else:
+        matched = False
+    if not matched:
+        return None
+    return add_validators(Response(status=304), etag, last_modified)
+
+
+def add_validators(response, etag, last_modified=None):
+    """Set ETag and Last-Modified; caches must revalidate before reusing the page"""
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = _http_time(last_modified)
+    response.cache_control.no_cache = True
+    if session.get('user_id') is not None:
+        response.cache_control.private = True
+    return response
+
+
+def _http_time(value):
+    # Stored timestamps are naive UTC; HTTP dates have whole seconds
+    return value.replace(tzinfo=timezone.utc, microsecond=0)
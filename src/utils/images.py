@@ -0,0 +1,313 @@
+import os
+import re
+import json
+import time
+import shutil
+import hashlib
+import logging
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from flask import current_app, request, url_for
+from PIL import Image, ImageOps, UnidentifiedImageError, features
+from src.models import db
+from src.models.upload import Upload, REFERENCING_TABLES
+
+# Get logger
+logger = logging.getLogger('storyquest')
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static')
+
+# Variant name -> longest edge in pixels; images are never upscaled
+VARIANTS = {
+    'thumb': 160,
+    'card': 480,
+    'full': 1280,
+}
+
+# Modern encodings, best first; AVIF only where this Pillow build has it
+MODERN_FORMATS = [fmt for fmt, available in (('avif', features.check('avif')), ('webp', features.check('webp')))
+                  if available]
+
+MIME_TYPES = {'avif': 'image/avif', 'webp': 'image/webp', 'jpg': 'image/jpeg', 'png': 'image/png'}
+
+SAVE_OPTIONS = {
+    'avif': {'format': 'AVIF', 'quality': 55},
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 6},
+    'jpg': {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True},
+    'png': {'format': 'PNG', 'optimize': True},
+}
+
+ACCEPTED_FORMATS = {'JPEG', 'PNG', 'GIF', 'WEBP', 'BMP', 'TIFF', 'AVIF'}
+
+MANIFEST = 'manifest.json'
+
+# Static-relative root of the content-addressed upload store
+UPLOADS_DIR = 'images/uploads'
+
+# Content-addressed variant directories; any other image path predates the
+# upload store and has no Upload row
+CONTENT_PATH_RE = re.compile(rf'{UPLOADS_DIR}/[0-9a-f]{{2}}/[0-9a-f]{{2}}/[0-9a-f]{{64}}')
+# Prefix of the src-relative file paths images were first saved under
+LEGACY_STATIC_PREFIX = 'static/'
+
+# Seconds an unreferenced upload is kept before garbage collection, so a
+# form that is still being submitted can claim it again
+DEFAULT_UPLOAD_GRACE_PERIOD = 24 * 3600
+# Uploads deleted per garbage-collection transaction
+DEFAULT_GC_BATCH_SIZE = 100
+
+# Content addresses never change meaning, so their variants can be cached forever
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+
+def static_root():
+    """Filesystem directory that static-relative image paths resolve against"""
+    return current_app.config.get('IMAGE_STATIC_ROOT') or STATIC_DIR
+
+
+def content_path(digest):
+    """Static-relative directory of an upload's variants, sharded by the leading hash bytes"""
+    return f'{UPLOADS_DIR}/{digest[:2]}/{digest[2:4]}/{digest}'
+
+
+def incoming_dir():
+    """Staging area for raw uploads awaiting processing; not web-served"""
+    return os.path.join(current_app.instance_path, 'uploads', 'incoming')
+
+
+def stage_upload(stream):
+    """
+    Copy an upload stream into the staging area while hashing it
+
+    Returns (digest, temporary path); the caller either moves the file to
+    incoming_path(digest) or deletes it.
+    """
+    os.makedirs(incoming_dir(), exist_ok=True)
+    sha256 = hashlib.sha256()
+    with tempfile.NamedTemporaryFile(dir=incoming_dir(), prefix='.staging-', delete=False) as f:
+        for chunk in iter(lambda: stream.read(64 * 1024), b''):
+            sha256.update(chunk)
+            f.write(chunk)
+    return sha256.hexdigest(), f.name
+
+
+def incoming_path(digest):
+    return os.path.join(incoming_dir(), digest)
+
+
+def check_image(stream):
+    """Return the image format of an upload stream, or None if it is not an accepted image"""
+    position = stream.tell()
+    try:
+        with Image.open(stream) as image:
+            image_format = image.format
+    except (UnidentifiedImageError, OSError):
+        return None
+    finally:
+        stream.seek(position)
+    return image_format if image_format in ACCEPTED_FORMATS else None
+
+
+def process_image(source_path, dest_dir, formats=None):
+    """
+    Write every variant of an image into dest_dir and return its manifest
+
+    Orientation from EXIF is applied first, then all metadata (EXIF, XMP,
+    ICC, comments) is dropped by re-encoding only the pixels. Each variant
+    is saved in the modern formats plus a JPEG fallback (PNG when the
+    image has transparency). Runs in a worker process.
+    """
+    formats = MODERN_FORMATS if formats is None else formats
+    os.makedirs(dest_dir, exist_ok=True)
+    with Image.open(source_path) as original:
+        original.seek(0)
+        image = ImageOps.exif_transpose(original)
+        has_alpha = image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+    fallback = 'png' if has_alpha else 'jpg'
+
+    manifest = {'formats': list(formats) + [fallback], 'fallback': fallback, 'variants': {}}
+    for variant, size in VARIANTS.items():
+        resized = image.copy()
+        resized.thumbnail((size, size), Image.LANCZOS)
+        for fmt in manifest['formats']:
+            target = os.path.join(dest_dir, f'{variant}.{fmt}')
+            resized.save(target, **SAVE_OPTIONS[fmt])
+        manifest['variants'][variant] = {'width': resized.width, 'height': resized.height}
+
+    with open(os.path.join(dest_dir, MANIFEST), 'w') as f:
+        json.dump(manifest, f)
+    return manifest
+
+
+_pool = None
+
+
+def _get_pool(workers):
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=workers)
+    return _pool
+
+
+def run_image_processing(source_path, dest_dir):
+    """Process an image in the shared process pool, or inline when IMAGE_PROCESS_WORKERS is 0"""
+    workers = current_app.config.get('IMAGE_PROCESS_WORKERS', 2)
+    if not workers:
+        return process_image(source_path, dest_dir)
+    return _get_pool(workers).submit(process_image, source_path, dest_dir).result()
+
+
+def remove_image(image_path):
+    """Delete the processed variants stored under a static-relative image path"""
+    if image_path:
+        shutil.rmtree(os.path.join(static_root(), image_path), ignore_errors=True)
+        _manifests.pop(image_path, None)
+
+
+def remove_legacy_image(image_path):
+    """
+    Delete a replaced image that was stored before uploads were content-addressed
+
+    Those images have no Upload row, so reference counting never frees them:
+    the first uploads were single files under static/images/<kind>/ and the
+    first processed ones variant directories under images/uploads/<kind>/.
+    Call after committing the change that stopped using the path. Paths
+    still used by a character or setting, and content-addressed paths, are
+    left alone. Returns whether anything was removed.
+    """
+    if not image_path or CONTENT_PATH_RE.fullmatch(image_path):
+        return False
+    in_use = ' UNION ALL '.join(f'SELECT 1 FROM {table} WHERE image_path = :path' for table in REFERENCING_TABLES)
+    if db.session.execute(db.text(f'{in_use} LIMIT 1'), {'path': image_path}).first() is not None:
+        return False
+    relative = image_path[len(LEGACY_STATIC_PREFIX):] if image_path.startswith(LEGACY_STATIC_PREFIX) else image_path
+    root = os.path.realpath(static_root())
+    path = os.path.realpath(os.path.join(root, relative))
+    if not path.startswith(root + os.sep):
+        return False
+    if os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+        _manifests.pop(image_path, None)
+    elif os.path.isfile(path):
+        os.remove(path)
+    else:
+        return False
+    logger.info(f"Removed legacy image {image_path}")
+    return True
+
+
+# Manifests of finished images; missing ones are not cached so they are
+# picked up as soon as processing completes
+_manifests = {}
+MAX_CACHED_MANIFESTS = 4096
+
+
+def load_manifest(image_path):
+    """Manifest of a processed image, or None while it is still being processed"""
+    manifest = _manifests.get(image_path)
+    if manifest is None:
+        try:
+            with open(os.path.join(static_root(), image_path, MANIFEST)) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if len(_manifests) >= MAX_CACHED_MANIFESTS:
+            _manifests.clear()
+        _manifests[image_path] = manifest
+    return manifest
+
+
+def image_ready(image_path):
+    """Template helper: whether an upload's variants can be shown yet"""
+    return bool(image_path) and load_manifest(image_path) is not None
+
+
+def image_sources(image_path, variant='card'):
+    """
+    Template helper: sources for one variant of a processed upload
+
+    Returns None until processing has finished, otherwise a dict with the
+    fallback src, width/height and a list of (mime type, url) sources in
+    preference order for a <picture> element.
+    """
+    if not image_path:
+        return None
+    manifest = load_manifest(image_path)
+    if manifest is None:
+        return None
+    size = manifest['variants'][variant]
+    url = lambda fmt: url_for('static', filename=f'{image_path}/{variant}.{fmt}')
+    return {
+        'src': url(manifest['fallback']),
+        'width': size['width'],
+        'height': size['height'],
+        'sources': [(MIME_TYPES[fmt], url(fmt)) for fmt in manifest['formats'] if fmt != manifest['fallback']],
+    }
+
+
+def collect_unreferenced_uploads(grace_period=None, batch_size=None):
+    """
+    Delete uploads nothing has referenced for the grace period, with their files
+
+    Works in batches: each transaction deletes up to batch_size rows and
+    removes their directories before committing, so a concurrent upload of
+    the same bytes waits for the batch and then stores the image afresh.
+    Staged files whose upload was rolled back are removed too. Returns the
+    number of uploads deleted.
+    """
+    config = current_app.config
+    grace_period = config['UPLOAD_GRACE_PERIOD'] if grace_period is None else grace_period
+    batch_size = batch_size or config['UPLOAD_GC_BATCH_SIZE']
+    expired = db.func.datetime('now', f'-{int(grace_period)} seconds')
+
+    removed = 0
+    while True:
+        batch = db.select(Upload.digest).where(Upload.ref_count <= 0, Upload.released_at <= expired) \
+            .order_by(Upload.released_at).limit(batch_size)
+        paths = db.session.execute(
+            db.delete(Upload).where(Upload.digest.in_(batch), Upload.ref_count <= 0).returning(Upload.path)
+        ).scalars().all()
+        for path in paths:
+            remove_image(path)
+        db.session.commit()
+        removed += len(paths)
+        if len(paths) < batch_size:
+            break
+
+    _remove_orphaned_staging_files(grace_period)
+    if removed:
+        logger.info(f"Removed {removed} unreferenced uploads")
+    return removed
+
+
+def _remove_orphaned_staging_files(grace_period):
+    directory = incoming_dir()
+    if not os.path.isdir(directory):
+        return
+    cutoff = time.time() - grace_period
+    names = [name for name in os.listdir(directory) if os.path.getmtime(os.path.join(directory, name)) <= cutoff]
+    known = set(db.session.execute(db.select(Upload.digest).where(Upload.digest.in_(names))).scalars()) if names else set()
+    for name in names:
+        if name not in known:
+            os.remove(os.path.join(directory, name))
+
+
+def _cache_uploads_forever(response):
+    filename = (request.view_args or {}).get('filename', '') if request.endpoint == 'static' else ''
+    if filename.startswith(UPLOADS_DIR + '/') and response.status_code in (200, 304):
+        response.cache_control.public = True
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+    return response
+
+
+def init_images(app):
+    """Expose image_sources and image_ready to templates and mark upload URLs immutable"""
+    app.config.setdefault('IMAGE_PROCESS_WORKERS', 2)
+    app.config.setdefault('IMAGE_STATIC_ROOT', None)
+    app.config.setdefault('UPLOAD_GRACE_PERIOD', DEFAULT_UPLOAD_GRACE_PERIOD)
+    app.config.setdefault('UPLOAD_GC_BATCH_SIZE', DEFAULT_GC_BATCH_SIZE)
+    app.jinja_env.globals['image_sources'] = image_sources
+    app.jinja_env.globals['image_ready'] = image_ready
+    app.after_request(_cache_uploads_forever)
@@ -0,0 +1,274 @@
+import os
+import json
+import atexit
+import socket
+import logging
+import threading
+import traceback
+from datetime import datetime, timedelta
+from flask import g, has_request_context
+from sqlalchemy import event
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+from src.models import db
+from src.models.job import Job
+
+# Get logger
+logger = logging.getLogger('storyquest')
+
+# In-process worker threads; 0 leaves jobs to `flask run-jobs` or run_pending()
+DEFAULT_WORKERS = 2
+# Seconds an idle worker sleeps before polling for due jobs
+DEFAULT_POLL_INTERVAL = 2.0
+# Seconds after which a running job is presumed orphaned by a dead worker
+DEFAULT_JOB_TIMEOUT = 600
+
+_ENQUEUED_KEY = 'jobs_enqueued'
+
+
+class Task:
+    """A registered job function; call it directly or enqueue it with delay()"""
+
+    def __init__(self, queue, func, name, priority, max_attempts, dedupe_key):
+        self.queue = queue
+        self.func = func
+        self.name = name
+        self.priority = priority
+        self.max_attempts = max_attempts
+        self.dedupe_key = dedupe_key
+        self.__doc__ = func.__doc__
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def delay(self, *args, **kwargs):
+        """Enqueue with the task's defaults; the job runs once the current transaction commits"""
+        dedupe_key = self.dedupe_key(*args, **kwargs) if self.dedupe_key else None
+        return self.queue.enqueue(self.name, args, kwargs, priority=self.priority,
+                                  max_attempts=self.max_attempts, dedupe_key=dedupe_key)
+
+
+class JobQueue:
+    """
+    Durable local job queue stored in the application's SQLite database
+
+    Jobs are inserted into the caller's transaction (an outbox), so they
+    become visible to workers only when that transaction commits and
+    vanish with it on rollback. Workers claim the highest-priority due job
+    with one atomic UPDATE ... RETURNING, retry failures with exponential
+    backoff up to max_attempts, and recover jobs orphaned by a dead worker.
+    A dedupe key keeps at most one queued job per key. No broker is needed.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.tasks = {}
+        self._wakeup = threading.Event()
+        self._stopping = False
+        self._threads = []
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('JOB_WORKERS', DEFAULT_WORKERS)
+        app.config.setdefault('JOB_POLL_INTERVAL', DEFAULT_POLL_INTERVAL)
+        app.config.setdefault('JOB_TIMEOUT', DEFAULT_JOB_TIMEOUT)
+        # Run enqueued jobs at the end of the request that enqueued them (tests)
+        app.config.setdefault('JOB_QUEUE_EAGER', False)
+        app.extensions['jobs'] = self
+        app.after_request(self._run_eager)
+        if self.app is None:
+            atexit.register(self.stop)
+        self.app = app
+
+    def task(self, name=None, priority=0, max_attempts=3, dedupe_key=None):
+        """
+        Register a function as a job
+
+        dedupe_key, if given, is called with the job's arguments and returns
+        the key under which at most one job may be queued.
+        """
+        def decorator(func):
+            task_name = name or f'{func.__module__}.{func.__name__}'
+            task = Task(self, func, task_name, priority, max_attempts, dedupe_key)
+            self.tasks[task_name] = task
+            return task
+        return decorator
+
+    def enqueue(self, name, args=(), kwargs=None, priority=0, max_attempts=3, dedupe_key=None, delay=0):
+        """Add a job to the current transaction; returns False if a queued duplicate exists"""
+        stmt = insert(Job).values(
+            name=name,
+            payload=json.dumps({'args': list(args), 'kwargs': kwargs or {}}),
+            status=Job.QUEUED,
+            priority=priority,
+            max_attempts=max_attempts,
+            dedupe_key=dedupe_key,
+            attempts=0,
+            run_at=datetime.utcnow() + timedelta(seconds=delay),
+        )
+        if dedupe_key is not None:
+            stmt = stmt.on_conflict_do_nothing(index_elements=['dedupe_key'],
+                                               index_where=Job.status == Job.QUEUED)
+        added = db.session.execute(stmt).rowcount == 1
+        if added:
+            db.session.info[_ENQUEUED_KEY] = True
+            if has_request_context():
+                g.jobs_enqueued = True
+        return added
+
+    def notify(self):
+        """Wake idle workers, starting them if needed"""
+        if self.app is None or not self.app.config['JOB_WORKERS']:
+            return
+        self._ensure_workers()
+        self._wakeup.set()
+
+    def claim(self, worker_id):
+        """Atomically take the next due job; returns (id, name, payload, attempts, max_attempts) or None"""
+        now = datetime.utcnow()
+        # Aliased so the subquery is not correlated with the updated table
+        candidate = db.aliased(Job)
+        next_id = db.select(candidate.id).where(candidate.status == Job.QUEUED, candidate.run_at <= now) \
+            .order_by(candidate.priority.desc(), candidate.run_at, candidate.id).limit(1).scalar_subquery()
+        row = db.session.execute(
+            db.update(Job).where(Job.id == next_id, Job.status == Job.QUEUED)
+            .values(status=Job.RUNNING, attempts=Job.attempts + 1, locked_by=worker_id, locked_at=now)
+            .returning(Job.id, Job.name, Job.payload, Job.attempts, Job.max_attempts, Job.dedupe_key)
+        ).first()
+        db.session.commit()
+        return row
+
+    def run_job(self, row):
+        """Run one claimed job and record the outcome; returns True on success"""
+        task = self.tasks.get(row.name)
+        try:
+            if task is None:
+                raise LookupError(f"No task registered as '{row.name}'")
+            data = json.loads(row.payload)
+            task.func(*data.get('args', []), **data.get('kwargs', {}))
+        except Exception as e:
+            db.session.rollback()
+            self._record_failure(row, e)
+            return False
+        db.session.execute(db.delete(Job).where(Job.id == row.id))
+        db.session.commit()
+        return True
+
+    def _record_failure(self, row, error):
+        message = ''.join(traceback.format_exception(type(error), error, error.__traceback__))
+        if row.attempts >= row.max_attempts:
+            logger.error(f"Job {row.id} ({row.name}) failed permanently after {row.attempts} attempts: {error}")
+            db.session.execute(db.update(Job).where(Job.id == row.id)
+                               .values(status=Job.FAILED, last_error=message, locked_by=None))
+            db.session.commit()
+            return
+        backoff = 2 ** row.attempts
+        logger.warning(f"Job {row.id} ({row.name}) failed, retrying in {backoff}s: {error}")
+        requeue = db.update(Job).where(Job.id == row.id).values(
+            status=Job.QUEUED, last_error=message, locked_by=None,
+            run_at=datetime.utcnow() + timedelta(seconds=backoff)
+        )
+        if row.dedupe_key is not None:
+            # A newer queued duplicate already covers this work
+            other = db.aliased(Job)
+            duplicate = db.select(other.id).where(other.dedupe_key == row.dedupe_key, other.status == Job.QUEUED)
+            requeue = requeue.where(~duplicate.exists())
+        if db.session.execute(requeue).rowcount == 0:
+            db.session.execute(db.delete(Job).where(Job.id == row.id))
+        db.session.commit()
+
+    def run_pending(self, worker_id=None, limit=None):
+        """Run due jobs in the calling thread until none are left; returns the number run"""
+        worker_id = worker_id or self._worker_id()
+        count = 0
+        while limit is None or count < limit:
+            row = self.claim(worker_id)
+            if row is None:
+                break
+            self.run_job(row)
+            count += 1
+        return count
+
+    def requeue_stale(self):
+        """Return jobs left running by a dead worker to the queue"""
+        cutoff = datetime.utcnow() - timedelta(seconds=self.app.config['JOB_TIMEOUT'])
+        count = db.session.execute(
+            db.update(Job).where(Job.status == Job.RUNNING, Job.locked_at < cutoff)
+            .values(status=Job.QUEUED, locked_by=None)
+        ).rowcount
+        db.session.commit()
+        if count:
+            logger.warning(f"Requeued {count} stale jobs")
+        return count
+
+    def work(self, worker_id=None):
+        """Worker loop: run due jobs, sleep until woken or the poll interval passes"""
+        worker_id = worker_id or self._worker_id()
+        with self.app.app_context():
+            self.requeue_stale()
+            while not self._stopping:
+                try:
+                    self.run_pending(worker_id)
+                except Exception as e:
+                    logger.error(f"Job worker {worker_id} error: {e}", exc_info=True)
+                    db.session.rollback()
+                finally:
+                    db.session.remove()
+                self._wakeup.wait(self.app.config['JOB_POLL_INTERVAL'])
+                self._wakeup.clear()
+
+    def run_workers(self, workers=1):
+        """Run worker threads in the foreground until interrupted (flask run-jobs)"""
+        self.app.config['JOB_WORKERS'] = workers
+        self._ensure_workers()
+        try:
+            for thread in list(self._threads):
+                thread.join()
+        except KeyboardInterrupt:
+            self.stop()
+
+    def stop(self):
+        """Stop in-process workers after their current job"""
+        self._stopping = True
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout=10)
+        self._threads = []
+        self._wakeup.clear()
+        self._stopping = False
+
+    def _ensure_workers(self):
+        with self._lock:
+            self._threads = [thread for thread in self._threads if thread.is_alive()]
+            for i in range(len(self._threads), self.app.config['JOB_WORKERS']):
+                thread = threading.Thread(target=self.work, args=(self._worker_id(f'thread-{i}'),),
+                                          name=f'job-worker-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _run_eager(self, response):
+        if self.app.config['JOB_QUEUE_EAGER'] and g.pop('jobs_enqueued', False):
+            self.run_pending()
+        return response
+
+    @staticmethod
+    def _worker_id(suffix=None):
+        worker = f'{socket.gethostname()}:{os.getpid()}'
+        return f'{worker}:{suffix}' if suffix else worker
+
+
+# Shared instance, bound to the app in create_app
+job_queue = JobQueue()
+
+
+@event.listens_for(Session, 'after_commit')
+def _notify_after_commit(session):
+    if session.info.pop(_ENQUEUED_KEY, False):
+        job_queue.notify()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_enqueued_on_rollback(session):
+    session.info.pop(_ENQUEUED_KEY, None)
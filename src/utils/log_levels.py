@@ -0,0 +1,138 @@
+import os
+import json
+import time
+import logging
+import tempfile
+import threading
+from src.utils.logging_config import BASE_LEVELS
+
+# Get logger
+logger = logging.getLogger('storyquest')
+
+# Seconds between checks of the overrides file for changes made by other workers
+DEFAULT_POLL_INTERVAL = 1.0
+# Seconds an override lasts when the caller does not say
+DEFAULT_OVERRIDE_DURATION = 300
+
+
+class LogLevels:
+    """
+    Temporary logger level overrides shared by every worker on the host
+
+    Overrides live in a small JSON file (LOG_LEVELS_FILE, or
+    STORYQUEST_LOG_LEVELS_FILE from the environment; the instance folder
+    by default) written atomically. Each process checks its mtime
+    at most every LOG_LEVELS_POLL_INTERVAL seconds, from a before_request
+    hook, and applies what it finds. An override expires on its own and
+    the logger returns to its level from STORYQUEST_LOG_LEVELS, so debug
+    logging switched on during an incident does not stay on.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._lock = threading.Lock()
+        self._overrides = {}
+        self._applied = set()
+        self._mtime = None
+        self._next_check = 0
+        self._next_expiry = float('inf')
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Pick up overrides before each request"""
+        app.config.setdefault('LOG_LEVELS_FILE', os.environ.get('STORYQUEST_LOG_LEVELS_FILE')
+                              or os.path.join(app.instance_path, 'log_levels.json'))
+        app.config.setdefault('LOG_LEVELS_POLL_INTERVAL', DEFAULT_POLL_INTERVAL)
+        app.extensions['log_levels'] = self
+        app.before_request(self.refresh)
+        self.app = app
+
+    @property
+    def path(self):
+        return self.app.config['LOG_LEVELS_FILE']
+
+    def refresh(self, force=False):
+        """Apply changed or expired overrides; cheap enough to call on every request"""
+        now = time.time()
+        if not force and now < self._next_check and now < self._next_expiry:
+            return
+        with self._lock:
+            self._next_check = now + self.app.config['LOG_LEVELS_POLL_INTERVAL']
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except FileNotFoundError:
+                mtime = None
+            if force or mtime != self._mtime:
+                self._mtime = mtime
+                self._overrides = self._read()
+            elif now < self._next_expiry:
+                return
+            self._apply(now)
+
+    def set(self, name, level, duration=DEFAULT_OVERRIDE_DURATION):
+        """
+        Override a logger's level for duration seconds, or until cleared when None
+
+        Returns the override as stored.
+        """
+        levelno = logging.getLevelName(str(level).upper())
+        if not isinstance(levelno, int):
+            raise ValueError(f"Unknown log level '{level}'")
+        override = {'level': logging.getLevelName(levelno),
+                    'expires_at': time.time() + duration if duration is not None else None}
+        self._update(lambda overrides: overrides.__setitem__(name, override))
+        logger.info(f"Log level of {name} set to {override['level']}"
+                    + (f" for {duration}s" if duration is not None else ''))
+        return override
+
+    def clear(self, name):
+        """Drop a logger's override; returns whether there was one"""
+        cleared = []
+        self._update(lambda overrides: cleared.append(overrides.pop(name, None) is not None))
+        if cleared[0]:
+            logger.info(f"Log level override of {name} cleared")
+        return cleared[0]
+
+    def levels(self):
+        """Effective level of every configured or overridden logger, with its override"""
+        self.refresh()
+        names = sorted(set(BASE_LEVELS) | set(self._overrides))
+        return {name: {'level': logging.getLevelName(logging.getLogger(name).getEffectiveLevel()),
+                       'override': self._overrides.get(name)} for name in names}
+
+    def _update(self, change):
+        with self._lock:
+            now = time.time()
+            overrides = {name: override for name, override in self._read().items()
+                         if override['expires_at'] is None or override['expires_at'] > now}
+            change(overrides)
+            directory = os.path.dirname(self.path)
+            os.makedirs(directory, exist_ok=True)
+            with tempfile.NamedTemporaryFile('w', dir=directory, suffix='.tmp', delete=False) as f:
+                json.dump(overrides, f)
+            os.replace(f.name, self.path)
+        self.refresh(force=True)
+
+    def _read(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _apply(self, now):
+        # Expired overrides stay in the file until the next change; they just
+        # stop applying. Loggers overridden before get their base level back.
+        active = {name: override for name, override in self._overrides.items()
+                  if override['expires_at'] is None or override['expires_at'] > now}
+        for name in self._applied | set(active) | set(BASE_LEVELS):
+            level = active[name]['level'] if name in active else BASE_LEVELS.get(name, logging.NOTSET)
+            logging.getLogger(name).setLevel(level)
+        self._applied = set(active)
+        expiries = [override['expires_at'] for override in active.values() if override['expires_at'] is not None]
+        self._next_expiry = min(expiries, default=float('inf'))
+
+
+# Shared control; bound to the app in create_app
+log_levels = LogLevels()
@@ -1,8 +1,16 @@
+import atexit
 import logging
 import os
+import pickle
+import queue
+import random
+import socketserver
+import struct
 import sys
+import threading
+import time
 import traceback
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, SocketHandler
 from flask import request, session
 
 # Create logs directory if it doesn't exist
@@ -10,9 +18,107 @@ logs_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__
 if not os.path.exists(logs_dir):
     os.makedirs(logs_dir)
 
+# Unix socket of the host's log writer (flask --app src.main run-log-writer).
+# When set, every process forwards records to it and only the writer opens
+# and rotates the log files; unset, a single process writes them itself.
+LOG_SOCKET = os.environ.get('STORYQUEST_LOG_SOCKET')
+
+# STORYQUEST_LOG_LEVELS sets logger levels as NAME=LEVEL pairs, e.g.
+# "storyquest=INFO,storyquest.auth=DEBUG"; loggers not listed inherit. Production defaults to INFO, anything else to DEBUG.
+DEFAULT_LEVEL = 'INFO' if os.environ.get('FLASK_ENV') == 'production' else 'DEBUG'
+# STORYQUEST_LOG_SAMPLING samples high-volume loggers as NAME=RATE pairs: a
+# fraction such as 0.1 keeps that share of records, "10/s" keeps at most ten
+# per second per message. Added to these defaults.
+DEFAULT_SAMPLING = 'storyquest.viral.feed=10/s'
+# Message templates a rate limit tracks at once
+DEFAULT_MAX_BUCKETS = 1000
+
+
+def parse_levels(spec):
+    """{logger name: level number} from a NAME=LEVEL,... string"""
+    levels = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        name, _, level = item.partition('=')
+        levelno = logging.getLevelName(level.strip().upper())
+        if not isinstance(levelno, int):
+            raise ValueError(f"Unknown log level '{level}' for logger '{name}'")
+        levels[name.strip()] = levelno
+    return levels
+
+
+def apply_levels(levels):
+    for name, level in levels.items():
+        logging.getLogger(name).setLevel(level)
+
+
+class SampleFilter(logging.Filter):
+    """Lets a random fraction of records through"""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return random.random() < self.rate
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Lets at most `rate` records per second through for each message template
+
+    A token bucket per template (the unformatted message), so one flood of
+    a single debug line does not starve other messages on the logger.
+    Messages formatted before logging are all different templates, so only
+    the `max_buckets` most recently seen are kept; a dropped bucket would
+    usually have refilled anyway, and at worst lets one more burst through.
+    """
+
+    def __init__(self, rate, burst=None, max_buckets=DEFAULT_MAX_BUCKETS):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst or max(rate, 1)
+        self.max_buckets = max_buckets
+        self._lock = threading.Lock()
+        # Least recently used first
+        self._buckets = {}
+
+    def filter(self, record):
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.pop(record.msg, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            allowed = tokens >= 1
+            self._buckets[record.msg] = (tokens - 1 if allowed else tokens, now)
+            if len(self._buckets) > self.max_buckets:
+                del self._buckets[next(iter(self._buckets))]
+        return allowed
+
+
+def create_sampling_filter(rate):
+    """A RateLimitFilter for "N/s", otherwise a SampleFilter for a fraction"""
+    if rate.endswith('/s'):
+        return RateLimitFilter(float(rate[:-2]))
+    return SampleFilter(float(rate))
+
+
+def apply_sampling(spec):
+    """Replace the sampling filters of the loggers named in a NAME=RATE,... string"""
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        name, _, rate = item.partition('=')
+        target = logging.getLogger(name.strip())
+        for existing in [f for f in target.filters if isinstance(f, (SampleFilter, RateLimitFilter))]:
+            target.removeFilter(existing)
+        target.addFilter(create_sampling_filter(rate.strip()))
+
+
+# Levels loggers have when no runtime override is in force (see log_levels.py)
+BASE_LEVELS = {'storyquest': logging.getLevelName(DEFAULT_LEVEL)}
+BASE_LEVELS.update(parse_levels(os.environ.get('STORYQUEST_LOG_LEVELS', '')))
+
 # Configure logger
 logger = logging.getLogger('storyquest')
-logger.setLevel(logging.DEBUG)
+apply_levels(BASE_LEVELS)
+apply_sampling(DEFAULT_SAMPLING + ',' + os.environ.get('STORYQUEST_LOG_SAMPLING', ''))
 
 # Console handler
 console_handler = logging.StreamHandler(sys.stdout)
@@ -20,34 +126,133 @@ console_handler.setLevel(logging.DEBUG)
 console_format = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 console_handler.setFormatter(console_format)
 
-# File handler for general logs
-file_handler = RotatingFileHandler(
-    os.path.join(logs_dir, 'storyquest.log'),
-    maxBytes=10485760,  # 10MB
-    backupCount=10
-)
-file_handler.setLevel(logging.INFO)
-file_format = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-file_handler.setFormatter(file_format)
-
-# File handler specifically for authentication logs with detailed information
-auth_file_handler = RotatingFileHandler(
-    os.path.join(logs_dir, 'auth.log'),
-    maxBytes=10485760,  # 10MB
-    backupCount=10
-)
-auth_file_handler.setLevel(logging.DEBUG)
-auth_format = logging.Formatter('%(asctime)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(message)s')
-auth_file_handler.setFormatter(auth_format)
-
-# Add handlers to logger
-logger.addHandler(console_handler)
-logger.addHandler(file_handler)
-logger.addHandler(auth_file_handler)
+
+def create_file_handlers(directory=logs_dir):
+    """
+    Rotating handlers for storyquest.log and auth.log
+
+    Rotation renames files under the writer, so exactly one process per
+    host may own these. Files are opened on the first record.
+    """
+    # File handler for general logs
+    file_handler = RotatingFileHandler(
+        os.path.join(directory, 'storyquest.log'),
+        maxBytes=10485760,  # 10MB
+        backupCount=10,
+        delay=True
+    )
+    file_handler.setLevel(logging.INFO)
+    file_format = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    file_handler.setFormatter(file_format)
+
+    # File handler specifically for authentication logs with detailed information
+    auth_file_handler = RotatingFileHandler(
+        os.path.join(directory, 'auth.log'),
+        maxBytes=10485760,  # 10MB
+        backupCount=10,
+        delay=True
+    )
+    auth_file_handler.setLevel(logging.DEBUG)
+    auth_format = logging.Formatter('%(asctime)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(message)s')
+    auth_file_handler.setFormatter(auth_format)
+    return [file_handler, auth_file_handler]
+
+
+def create_output_handlers(socket_path=LOG_SOCKET):
+    """The handlers records end up in: the console, plus the files or the host's writer"""
+    if socket_path:
+        return [console_handler, SocketHandler(socket_path, None)]
+    return [console_handler] + create_file_handlers()
+
+
+class LogPipeline:
+    """
+    Hands records from request threads to a background listener
+
+    The logger's only handler is a QueueHandler: a request thread merely
+    interpolates the message and enqueues it. Formatting and all console,
+    file and socket I/O happen on the listener thread. Threads do not
+    survive fork(), so a forked worker starts its own queue and listener.
+    """
+
+    def __init__(self, handlers):
+        self.handlers = handlers
+        self.queue_handler = QueueHandler(queue.SimpleQueue())
+        self.listener = None
+
+    def start(self):
+        self.listener = QueueListener(self.queue_handler.queue, *self.handlers, respect_handler_level=True)
+        self.listener.start()
+
+    def stop(self):
+        """Write out everything queued so far and stop the listener"""
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+
+    def restart_after_fork(self):
+        # The parent's listener thread does not exist in the child; its
+        # queue may hold records the parent will write itself
+        self.listener = None
+        self.queue_handler.queue = queue.SimpleQueue()
+        self.start()
+
+
+pipeline = LogPipeline(create_output_handlers())
+logger.addHandler(pipeline.queue_handler)
+pipeline.start()
+atexit.register(pipeline.stop)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=pipeline.restart_after_fork)
 
 # Create authentication logger that inherits from main logger
 auth_logger = logging.getLogger('storyquest.auth')
-auth_logger.setLevel(logging.DEBUG)
+
+# Every request and response, from the app's global hooks
+request_logger = logging.getLogger('storyquest.requests')
+
+
+class _RecordStreamHandler(socketserver.StreamRequestHandler):
+    # SocketHandler sends each record as a 4-byte length and a pickled dict
+    def handle(self):
+        while True:
+            header = self.rfile.read(4)
+            if len(header) < 4:
+                return
+            length = struct.unpack('>L', header)[0]
+            record = logging.makeLogRecord(pickle.loads(self.rfile.read(length)))
+            for handler in self.server.handlers:
+                if record.levelno >= handler.level:
+                    handler.handle(record)
+
+
+class LogWriterServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    The host's single log writer: receives records from every worker over
+    a Unix socket and writes them with the rotating file handlers
+
+    Records arrive pickled, so the socket is created readable and writable
+    by its owner only.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, socket_path, handlers=None):
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        self.handlers = handlers if handlers is not None else create_file_handlers()
+        previous_umask = os.umask(0o177)
+        try:
+            super().__init__(socket_path, _RecordStreamHandler)
+        finally:
+            os.umask(previous_umask)
+
+    def server_close(self):
+        super().server_close()
+        for handler in self.handlers:
+            handler.close()
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
 
 def log_authentication_attempt(success, username, error=None):
     """
@@ -93,7 +298,7 @@ def log_session_state():
     """Log the current session state for debugging"""
     try:
         session_data = {k: v for k, v in session.items()} if session else {}
-        auth_logger.debug(f"Current session state: {session_data}")
+        auth_logger.debug("Current session state: %s", session_data)
         return session_data
     except Exception as e:
         error_traceback = traceback.format_exc()
@@ -0,0 +1,385 @@
+import os
+import re
+import glob
+import json
+import time
+import fcntl
+import atexit
+import logging
+import tempfile
+import threading
+from contextlib import contextmanager
+from bisect import bisect_left
+from flask import before_render_template, template_rendered, has_request_context, request
+from sqlalchemy import event
+from src.models import db
+
+# Get logger
+logger = logging.getLogger('storyquest')
+
+# Seconds between writes of this process's totals for /metrics in other workers
+DEFAULT_FLUSH_INTERVAL = 5.0
+
+# Upper bounds of the histogram buckets; +Inf is implied
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# WSGI environ key of the current request's RequestSample
+ENVIRON_KEY = 'storyquest.metrics'
+
+# Files in METRICS_DIR: one per process, the folded totals of exited
+# processes, and the lock serialising folding against readers
+PROCESS_FILE_RE = re.compile(r'metrics-(\d+)-\d+\.json$')
+TOTALS_FILENAME = 'metrics-totals.json'
+LOCK_FILENAME = 'metrics.lock'
+
+# Endpoint label for requests Flask never routed
+PAGE_CACHE_ENDPOINT = 'page_cache'
+UNMATCHED_ENDPOINT = 'unmatched'
+
+
+class Histogram:
+    """Bucket counts and sum per endpoint; the caller holds the registry lock"""
+
+    def __init__(self, name, description, buckets):
+        self.name = name
+        self.description = description
+        self.buckets = buckets
+        self.series = {}
+
+    def observe(self, endpoint, value):
+        series = self.series.get(endpoint)
+        if series is None:
+            series = self.series[endpoint] = {'counts': [0] * (len(self.buckets) + 1), 'sum': 0.0}
+        series['counts'][bisect_left(self.buckets, value)] += 1
+        series['sum'] += value
+
+
+class RequestSample:
+    """What one request cost, accumulated while it runs"""
+
+    __slots__ = ('endpoint', 'sql_count', 'sql_time', 'template_time', 'template_starts', 'query_starts')
+
+    def __init__(self):
+        self.endpoint = None
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.template_starts = []
+        self.query_starts = []
+
+
+def current_sample():
+    """The RequestSample of the request being handled, or None outside one"""
+    if not has_request_context():
+        return None
+    return request.environ.get(ENVIRON_KEY)
+
+
+class Metrics:
+    """
+    Per-endpoint request histograms exposed in Prometheus text format
+
+    For every request it records wall time (until the last byte of the
+    body is handed to the server), the number and total time of SQL
+    statements, Jinja render time and bytes sent. Recording is a few
+    bisects and additions under a lock.
+
+    Each process writes its totals to METRICS_DIR (or STORYQUEST_METRICS_DIR
+    from the environment; the instance folder by default) every METRICS_FLUSH_INTERVAL seconds and at exit. /metrics
+    sums every process's file, using live values for its own process.
+    Files of processes that exited are folded into one totals file, so
+    totals never go down and the directory does not grow with restarts.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._reset()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Wrap the app to time requests and hook SQL and template events"""
+        app.config.setdefault('METRICS_ENABLED', True)
+        app.config.setdefault('METRICS_DIR', os.environ.get('STORYQUEST_METRICS_DIR')
+                              or os.path.join(app.instance_path, 'metrics'))
+        app.config.setdefault('METRICS_FLUSH_INTERVAL', DEFAULT_FLUSH_INTERVAL)
+        app.extensions['metrics'] = self
+        app.wsgi_app = MetricsMiddleware(app.wsgi_app, self)
+        app.before_request(_record_endpoint)
+        before_render_template.connect(_template_started, app)
+        template_rendered.connect(_template_finished, app)
+        with app.app_context():
+            if not event.contains(db.engine, 'before_cursor_execute', _query_started):
+                event.listen(db.engine, 'before_cursor_execute', _query_started)
+                event.listen(db.engine, 'after_cursor_execute', _query_finished)
+        if self.app is None:
+            atexit.register(self.flush)
+            if hasattr(os, 'register_at_fork'):
+                os.register_at_fork(after_in_child=self._reset)
+        self.app = app
+
+    @property
+    def enabled(self):
+        return self.app is not None and self.app.config['METRICS_ENABLED']
+
+    def _reset(self):
+        # A forked worker starts from zero under its own file
+        self._lock = threading.Lock()
+        self._thread = None
+        self._started = time.time()
+        self._dirty = False
+        self.histograms = [
+            Histogram('storyquest_request_duration_seconds', 'Wall time per request', DURATION_BUCKETS),
+            Histogram('storyquest_request_sql_queries', 'SQL statements per request', QUERY_COUNT_BUCKETS),
+            Histogram('storyquest_request_sql_duration_seconds', 'Time in SQL statements per request',
+                      DURATION_BUCKETS),
+            Histogram('storyquest_request_template_duration_seconds', 'Jinja render time per request',
+                      DURATION_BUCKETS),
+            Histogram('storyquest_response_size_bytes', 'Bytes sent per response', SIZE_BUCKETS),
+        ]
+
+    def record(self, sample, duration, size):
+        """Add a finished request to the histograms"""
+        endpoint = sample.endpoint or UNMATCHED_ENDPOINT
+        values = (duration, sample.sql_count, sample.sql_time, sample.template_time, size)
+        with self._lock:
+            for histogram, value in zip(self.histograms, values):
+                histogram.observe(endpoint, value)
+            self._dirty = True
+        self._ensure_flusher()
+
+    def snapshot(self):
+        with self._lock:
+            return {h.name: {endpoint: {'counts': list(series['counts']), 'sum': series['sum']}
+                             for endpoint, series in h.series.items()}
+                    for h in self.histograms}
+
+    @property
+    def path(self):
+        return os.path.join(self.app.config['METRICS_DIR'], f'metrics-{os.getpid()}-{int(self._started)}.json')
+
+    def flush(self):
+        """Write this process's totals for the other workers' /metrics"""
+        if self.app is None or not self._dirty:
+            return
+        self._dirty = False
+        directory = self.app.config['METRICS_DIR']
+        os.makedirs(directory, exist_ok=True)
+        with tempfile.NamedTemporaryFile('w', dir=directory, suffix='.tmp', delete=False) as f:
+            json.dump(self.snapshot(), f)
+        os.replace(f.name, self.path)
+
+    def collect(self):
+        """Totals of every process that has served requests, this one live"""
+        self.fold_exited()
+        totals = self.snapshot()
+        own = self.path
+        with self._dir_lock(fcntl.LOCK_SH):
+            for path in glob.glob(os.path.join(self.app.config['METRICS_DIR'], 'metrics-*.json')):
+                if path != own:
+                    _merge(totals, _read(path))
+        return totals
+
+    def fold_exited(self):
+        """
+        Add the files of processes that have exited to the totals file
+
+        Skipped while another process holds the directory lock; the next
+        call picks the files up. Returns how many files were folded.
+        """
+        directory = self.app.config['METRICS_DIR']
+        try:
+            with self._dir_lock(fcntl.LOCK_EX | fcntl.LOCK_NB):
+                exited = []
+                for path in glob.glob(os.path.join(directory, 'metrics-*.json')):
+                    match = PROCESS_FILE_RE.search(path)
+                    if match and not _process_alive(int(match.group(1))):
+                        exited.append(path)
+                if not exited:
+                    return 0
+                totals_path = os.path.join(directory, TOTALS_FILENAME)
+                totals = _read(totals_path)
+                for path in exited:
+                    _merge(totals, _read(path))
+                with tempfile.NamedTemporaryFile('w', dir=directory, suffix='.tmp', delete=False) as f:
+                    json.dump(totals, f)
+                os.replace(f.name, totals_path)
+                for path in exited:
+                    os.remove(path)
+        except BlockingIOError:
+            return 0
+        logger.info(f"Folded request metrics of {len(exited)} exited processes")
+        return len(exited)
+
+    @contextmanager
+    def _dir_lock(self, operation):
+        directory = self.app.config['METRICS_DIR']
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, LOCK_FILENAME), 'a') as f:
+            fcntl.flock(f, operation)
+            yield
+
+    def exposition(self):
+        """All histograms in the Prometheus text format, version 0.0.4"""
+        totals = self.collect()
+        lines = []
+        for histogram in self.histograms:
+            lines.append(f'# HELP {histogram.name} {histogram.description}')
+            lines.append(f'# TYPE {histogram.name} histogram')
+            bounds = [_format_bound(bound) for bound in histogram.buckets] + ['+Inf']
+            for endpoint, series in sorted(totals.get(histogram.name, {}).items()):
+                label = f'endpoint="{_escape(endpoint)}"'
+                cumulative = 0
+                for bound, count in zip(bounds, series['counts']):
+                    cumulative += count
+                    lines.append(f'{histogram.name}_bucket{{{label},le="{bound}"}} {cumulative}')
+                lines.append(f'{histogram.name}_sum{{{label}}} {series["sum"]!r}')
+                lines.append(f'{histogram.name}_count{{{label}}} {cumulative}')
+        return '\n'.join(lines) + '\n'
+
+    def _ensure_flusher(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name='metrics-flusher', daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.app.config['METRICS_FLUSH_INTERVAL'])
+            try:
+                self.flush()
+            except OSError:
+                logger.exception("Writing request metrics failed")
+
+
+class MetricsMiddleware:
+    """WSGI middleware timing each request until its body has been sent"""
+
+    def __init__(self, wsgi_app, metrics):
+        self.wsgi_app = wsgi_app
+        self.metrics = metrics
+
+    def __call__(self, environ, start_response):
+        if not self.metrics.enabled:
+            return self.wsgi_app(environ, start_response)
+        start = time.perf_counter()
+        sample = environ[ENVIRON_KEY] = RequestSample()
+
+        def capture_start_response(status, headers, exc_info=None):
+            if sample.endpoint is None and any(name == 'X-Page-Cache' for name, _ in headers):
+                sample.endpoint = PAGE_CACHE_ENDPOINT
+            return start_response(status, headers, exc_info)
+
+        body = self.wsgi_app(environ, capture_start_response)
+        return _MeasuredBody(body, self.metrics, sample, start)
+
+
+class _MeasuredBody:
+    # Records the request once the last byte is handed to the server, or
+    # when the server closes a body it did not read to the end
+    def __init__(self, body, metrics, sample, start):
+        self.body = body
+        self.metrics = metrics
+        self.sample = sample
+        self.start = start
+        self.size = 0
+        self.recorded = False
+
+    def __iter__(self):
+        for chunk in self.body:
+            self.size += len(chunk)
+            yield chunk
+        self._record()
+
+    def close(self):
+        try:
+            if hasattr(self.body, 'close'):
+                self.body.close()
+        finally:
+            self._record()
+
+    def _record(self):
+        if not self.recorded:
+            self.recorded = True
+            self.metrics.record(self.sample, time.perf_counter() - self.start, self.size)
+
+
+def _record_endpoint():
+    sample = request.environ.get(ENVIRON_KEY)
+    if sample is not None:
+        sample.endpoint = request.endpoint
+
+
+def _template_started(sender, template, context, **extra):
+    sample = current_sample()
+    if sample is not None:
+        sample.template_starts.append(time.perf_counter())
+
+
+def _template_finished(sender, template, context, **extra):
+    sample = current_sample()
+    if sample is not None and sample.template_starts:
+        start = sample.template_starts.pop()
+        # A template rendered inside another is already in the outer one's time
+        if not sample.template_starts:
+            sample.template_time += time.perf_counter() - start
+
+
+def _query_started(conn, cursor, statement, parameters, context, executemany):
+    sample = current_sample()
+    if sample is not None:
+        sample.query_starts.append(time.perf_counter())
+
+
+def _query_finished(conn, cursor, statement, parameters, context, executemany):
+    sample = current_sample()
+    if sample is not None and sample.query_starts:
+        sample.sql_time += time.perf_counter() - sample.query_starts.pop()
+        sample.sql_count += 1
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _merge(totals, other):
+    """Add one snapshot's counts and sums into another"""
+    for name, series in other.items():
+        merged = totals.setdefault(name, {})
+        for endpoint, values in series.items():
+            if endpoint not in merged:
+                merged[endpoint] = values
+                continue
+            merged[endpoint]['counts'] = [a + b for a, b in zip(merged[endpoint]['counts'], values['counts'])]
+            merged[endpoint]['sum'] += values['sum']
+
+
+def _format_bound(bound):
+    return repr(float(bound))
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+# Shared registry; bound to the app in create_app
+metrics = Metrics()
@@ -0,0 +1,182 @@
+import time
+import logging
+import threading
+from functools import wraps
+from flask import Response, make_response, request, session
+from werkzeug.http import parse_cookie
+from werkzeug.wsgi import get_host
+from src.utils.compression import compress, choose_encoding
+
+# Get logger
+logger = logging.getLogger('storyquest')
+
+# Seconds a rendered page is served before it is rendered again
+DEFAULT_TTL = 300
+# Seconds other requests keep getting the expired page while one re-renders it
+DEFAULT_REFRESH_TIMEOUT = 30
+# Stored pages are compressed once, so a slower, tighter level pays off
+DEFAULT_BROTLI_QUALITY = 9
+DEFAULT_GZIP_LEVEL = 9
+
+# Viewer classes a cached page is rendered for
+ANONYMOUS = 'anonymous'
+AUTHENTICATED = 'authenticated'
+
+# Cached pages differ by session and are negotiated by encoding
+VARY = 'Accept-Encoding, Cookie'
+
+
+class CachedPage:
+    """A rendered page with its precompressed variants"""
+
+    def __init__(self, body, content_type, encoded, expires):
+        self.body = body
+        self.content_type = content_type
+        self.encoded = encoded
+        self.expires = expires
+        self.refresh_deadline = 0
+
+    def negotiate(self, accept_encoding):
+        """The encoding and bytes to send for an Accept-Encoding header"""
+        encoding = choose_encoding(accept_encoding) if self.encoded else None
+        if encoding in self.encoded:
+            return encoding, self.encoded[encoding]
+        return None, self.body
+
+    def headers(self, encoding, body):
+        headers = [('Content-Type', self.content_type), ('Content-Length', str(len(body))),
+                   ('Vary', VARY), ('X-Page-Cache', 'HIT')]
+        if encoding:
+            headers.append(('Content-Encoding', encoding))
+        return headers
+
+
+class PageCache:
+    """
+    In-process cache of fully rendered pages that vary only by login state
+
+    Pages are keyed on host, path and whether the viewer is logged in, and
+    stored with brotli and gzip variants for PAGE_CACHE_TTL seconds. A
+    request without a session cookie is answered by WSGI middleware before
+    Flask opens a session or dispatches; one with a cookie is answered by
+    the view decorator without rendering. When a page expires, one request
+    renders it again while the rest are served the old copy. Requests with
+    pending flash messages always render, and responses that set a cookie
+    are never stored. purge() drops pages explicitly; each process holds
+    its own copy, so other workers catch up within the TTL.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._lock = threading.Lock()
+        self._pages = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Read cache settings and answer anonymous hits ahead of the app"""
+        app.config.setdefault('PAGE_CACHE_ENABLED', True)
+        app.config.setdefault('PAGE_CACHE_TTL', DEFAULT_TTL)
+        app.config.setdefault('PAGE_CACHE_REFRESH_TIMEOUT', DEFAULT_REFRESH_TIMEOUT)
+        app.config.setdefault('PAGE_CACHE_BROTLI_QUALITY', DEFAULT_BROTLI_QUALITY)
+        app.config.setdefault('PAGE_CACHE_GZIP_LEVEL', DEFAULT_GZIP_LEVEL)
+        app.extensions['page_cache'] = self
+        app.wsgi_app = PageCacheMiddleware(app.wsgi_app, self)
+        self.app = app
+
+    @property
+    def enabled(self):
+        return self.app is not None and self.app.config['PAGE_CACHE_ENABLED']
+
+    def cached(self, view):
+        """Serve a view's page from the cache, rendering and storing it on a miss"""
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not self.enabled or request.method not in ('GET', 'HEAD') or session.get('_flashes'):
+                return view(*args, **kwargs)
+            viewer = AUTHENTICATED if session.get('user_id') is not None else ANONYMOUS
+            key = (request.host, request.path, viewer)
+            page = self.lookup(key)
+            if page is not None:
+                encoding, body = page.negotiate(request.headers.get('Accept-Encoding', ''))
+                return Response(body, headers=page.headers(encoding, body))
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200 and not session.modified and 'Set-Cookie' not in response.headers:
+                self.store(key, response)
+            response.vary.add('Cookie')
+            return response
+        return wrapper
+
+    def lookup(self, key, claim=True):
+        """
+        The stored page for a key, or None when the caller should render it
+
+        An expired page is still returned while another request is
+        refreshing it, for up to PAGE_CACHE_REFRESH_TIMEOUT seconds. With
+        claim, the caller that gets None for an expired page becomes the
+        one refreshing it.
+        """
+        now = time.monotonic()
+        with self._lock:
+            page = self._pages.get(key)
+            if page is None:
+                return None
+            if now < page.expires or now < page.refresh_deadline:
+                return page
+            if claim:
+                page.refresh_deadline = now + self.app.config['PAGE_CACHE_REFRESH_TIMEOUT']
+            return None
+
+    def store(self, key, response):
+        """Keep a rendered response's body and its compressed variants"""
+        body = response.get_data()
+        encoded = {}
+        if response.content_encoding is None and response.mimetype in self.app.config['COMPRESS_MIMETYPES']:
+            options = {'brotli_quality': self.app.config['PAGE_CACHE_BROTLI_QUALITY'],
+                       'gzip_level': self.app.config['PAGE_CACHE_GZIP_LEVEL']}
+            encoded = {encoding: compress(body, encoding, **options) for encoding in ('br', 'gzip')}
+        page = CachedPage(body, response.content_type, encoded,
+                          time.monotonic() + self.app.config['PAGE_CACHE_TTL'])
+        with self._lock:
+            self._pages[key] = page
+
+    def purge(self, path=None):
+        """Drop cached pages for one path, or all of them; returns how many were dropped"""
+        with self._lock:
+            keys = [key for key in self._pages if path is None or key[1] == path]
+            for key in keys:
+                del self._pages[key]
+        if keys:
+            logger.info(f"Purged {len(keys)} cached pages{f' for {path}' if path else ''}")
+        return len(keys)
+
+
+class PageCacheMiddleware:
+    """WSGI middleware answering cookie-less GET and HEAD requests from the page cache"""
+
+    def __init__(self, wsgi_app, cache):
+        self.wsgi_app = wsgi_app
+        self.cache = cache
+
+    def __call__(self, environ, start_response):
+        page = self._anonymous_page(environ)
+        if page is None:
+            return self.wsgi_app(environ, start_response)
+        encoding, body = page.negotiate(environ.get('HTTP_ACCEPT_ENCODING', ''))
+        start_response('200 OK', page.headers(encoding, body))
+        return [] if environ['REQUEST_METHOD'] == 'HEAD' else [body]
+
+    def _anonymous_page(self, environ):
+        if not self.cache.enabled or environ.get('REQUEST_METHOD') not in ('GET', 'HEAD'):
+            return None
+        # Without a session cookie there is no login and no pending flash
+        cookie_name = self.cache.app.config['SESSION_COOKIE_NAME']
+        if 'HTTP_COOKIE' in environ and cookie_name in parse_cookie(environ):
+            return None
+        # An expired page is left for the view to claim and refresh
+        path = '/' + environ.get('PATH_INFO', '').lstrip('/')
+        return self.cache.lookup((get_host(environ), path, ANONYMOUS), claim=False)
+
+
+# Shared cache; bound to the app in create_app
+page_cache = PageCache()
@@ -0,0 +1,138 @@
+import json
+import base64
+import binascii
+from flask import request
+from sqlalchemy import DateTime, String, and_, tuple_, type_coerce
+from src.models import db
+
+DEFAULT_PER_PAGE = 20
+MAX_PER_PAGE = 100
+
+
+class KeysetPage:
+    """One page of keyset-paginated results with opaque next/prev cursors"""
+
+    def __init__(self, items, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+    def to_dict(self, item_key='items'):
+        """JSON-ready representation; items must provide to_dict()"""
+        return {
+            item_key: [item.to_dict() for item in self.items],
+            'next_cursor': self.next_cursor,
+            'prev_cursor': self.prev_cursor
+        }
+
+
+def encode_cursor(direction, key, last_id):
+    """Pack a direction and the boundary row's key into an opaque URL-safe token"""
+    raw = json.dumps({'d': direction, 'k': key, 'i': last_id}, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Unpack a cursor token; returns (direction, key, last_id) or None if it is not valid"""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        data = json.loads(raw)
+        direction, key, last_id = data['d'], data['k'], data['i']
+    except (ValueError, TypeError, KeyError, binascii.Error):
+        return None
+    if direction not in ('next', 'prev') or not isinstance(last_id, int) or \
+            not (key is None or isinstance(key, (str, int, float))):
+        return None
+    return direction, key, last_id
+
+
+def get_per_page():
+    """Read per_page from the query string, clamped to a sane range"""
+    per_page = request.args.get('per_page', DEFAULT_PER_PAGE, type=int)
+    return max(1, min(per_page or DEFAULT_PER_PAGE, MAX_PER_PAGE))
+
+
+def wants_json():
+    """True when the client asked for a JSON listing instead of HTML"""
+    return request.args.get('format') == 'json' or \
+        request.accept_mimetypes.best == 'application/json'
+
+
+def _key_expression(column):
+    # DateTime columns are compared as their stored text: rows written by
+    # func.current_timestamp() and by Python datetimes use different string
+    # formats, and SQLite compares the stored strings.
+    if isinstance(column.type, DateTime):
+        return type_coerce(column, String)
+    return column
+
+
+def paginate(stmt, sort_column, id_column, cursor=None, per_page=DEFAULT_PER_PAGE, row_factory=None):
+    """
+    Keyset-paginate a select by (sort_column DESC, id_column DESC)
+
+    Rows with a NULL sort_column come last. Every page is one or two index
+    range seeks from the cursor position (the non-NULL keys, then the NULL
+    tail), so page N costs the same as page one. Returns a KeysetPage whose
+    items are row_factory(row).
+    """
+    key = _key_expression(sort_column)
+    stmt = stmt.add_columns(key.label('_cursor_key'), id_column.label('_cursor_id'))
+    limit = per_page + 1
+
+    def fetch(query, count):
+        return db.session.execute(query.limit(count)).all()
+
+    decoded = decode_cursor(cursor)
+    if decoded is None:
+        direction, value, last_id = 'next', None, None
+    else:
+        direction, value, last_id = decoded
+
+    if direction == 'next':
+        rows = []
+        if last_id is None or value is not None:
+            # Still inside the non-NULL keys
+            if last_id is None:
+                condition = key.isnot(None)
+            else:
+                condition = tuple_(key, id_column) < tuple_(value, last_id)
+            rows = fetch(stmt.where(condition).order_by(key.desc(), id_column.desc()), limit)
+        if len(rows) < limit:
+            condition = key.is_(None)
+            if last_id is not None and value is None:
+                condition = and_(condition, id_column < last_id)
+            rows += fetch(stmt.where(condition).order_by(id_column.desc()), limit - len(rows))
+    else:
+        if value is None:
+            rows = fetch(stmt.where(key.is_(None), id_column > last_id).order_by(id_column.asc()), limit)
+            if len(rows) < limit:
+                rows += fetch(stmt.where(key.isnot(None)).order_by(key.asc(), id_column.asc()),
+                              limit - len(rows))
+        else:
+            rows = fetch(stmt.where(tuple_(key, id_column) > tuple_(value, last_id))
+                         .order_by(key.asc(), id_column.asc()), limit)
+
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if direction == 'prev':
+        rows.reverse()
+
+    has_next = has_more if direction == 'next' else True
+    has_prev = (last_id is not None) if direction == 'next' else has_more
+
+    next_cursor = encode_cursor('next', rows[-1]._cursor_key, rows[-1]._cursor_id) if rows and has_next else None
+    prev_cursor = encode_cursor('prev', rows[0]._cursor_key, rows[0]._cursor_id) if rows and has_prev else None
+
+    items = [row_factory(row) for row in rows] if row_factory else rows
+    return KeysetPage(items, next_cursor, prev_cursor)
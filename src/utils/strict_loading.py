@@ -0,0 +1,29 @@
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session, raiseload
+
+# Config key that turns strict loading on. Off by default; tests switch it on
+# with the strict_loading fixture to catch relationship loads a route has not
+# declared.
+STRICT_LOADING_CONFIG = 'STRICT_LOADING'
+
+
+def _apply_strict_loading(orm_execute_state):
+    """
+    Add raiseload('*') to top-level ORM selects while strict loading is on
+
+    Loader options a route passes explicitly (selectinload, lazyload, ...)
+    take precedence over the wildcard, so only undeclared lazy loads raise.
+    """
+    if not has_app_context() or not current_app.config.get(STRICT_LOADING_CONFIG):
+        return
+    if not orm_execute_state.is_select or orm_execute_state.is_relationship_load:
+        return
+    orm_execute_state.statement = orm_execute_state.statement.options(raiseload('*'))
+
+
+def init_strict_loading(app):
+    """Register the strict loading hook; enable it with app.config['STRICT_LOADING']"""
+    app.config.setdefault(STRICT_LOADING_CONFIG, False)
+    if not event.contains(Session, 'do_orm_execute', _apply_strict_loading):
+        event.listen(Session, 'do_orm_execute', _apply_strict_loading)
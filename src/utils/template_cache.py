@@ -0,0 +1,53 @@
+import os
+import time
+import logging
+from jinja2 import FileSystemBytecodeCache, TemplateSyntaxError
+
+# Get logger
+logger = logging.getLogger('storyquest')
+
+# Below the instance folder unless TEMPLATE_BYTECODE_CACHE_DIR (or the
+# STORYQUEST_TEMPLATE_CACHE_DIR environment variable) says otherwise
+CACHE_DIRNAME = 'jinja_cache'
+
+
+def template_cache_dir(app):
+    return app.config['TEMPLATE_BYTECODE_CACHE_DIR'] or os.path.join(app.instance_path, CACHE_DIRNAME)
+
+
+def init_template_cache(app):
+    """
+    Keep compiled templates on disk, shared by every worker
+
+    Jinja checks each entry against the template source, so a deploy that
+    changes a template recompiles just that one. Compile everything up
+    front with warm_templates().
+    """
+    app.config.setdefault('TEMPLATE_BYTECODE_CACHE_DIR', os.environ.get('STORYQUEST_TEMPLATE_CACHE_DIR'))
+    app.config.setdefault('TEMPLATE_WARMUP', True)
+    directory = template_cache_dir(app)
+    os.makedirs(directory, exist_ok=True)
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(directory)
+
+
+def warm_templates(app):
+    """
+    Load every template into the environment before serving requests
+
+    Templates come from the bytecode cache when it has them and are
+    compiled (and stored there) otherwise. A template that fails to
+    compile is logged and skipped; requests for it fail as before.
+    Returns {template name: seconds taken}.
+    """
+    timings = {}
+    started = time.perf_counter()
+    for name in app.jinja_env.list_templates(extensions=['html']):
+        start = time.perf_counter()
+        try:
+            app.jinja_env.get_template(name)
+        except TemplateSyntaxError as e:
+            logger.error(f"Template {name} does not compile: {e}")
+            continue
+        timings[name] = time.perf_counter() - start
+    logger.info(f"Loaded {len(timings)} templates in {time.perf_counter() - started:.3f}s")
+    return timings
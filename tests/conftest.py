@@ -1,13 +1,28 @@
 import os
 import sys
+import atexit
+import shutil
 import pytest
+import tempfile
 from flask import Flask
 from flask.testing import FlaskClient
+from sqlalchemy import event
 from datetime import datetime, timedelta
 
 # Add parent directory to path for imports
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
+# Use the in-memory test database profile for the app created at import time
+os.environ.setdefault('STORYQUEST_DB_PROFILE', 'test')
+
+# Keep compiled templates, log level overrides and metrics files out of the
+# real instance folder
+STATE_DIR = tempfile.mkdtemp(prefix='storyquest-tests-')
+atexit.register(shutil.rmtree, STATE_DIR, True)
+os.environ['STORYQUEST_TEMPLATE_CACHE_DIR'] = os.path.join(STATE_DIR, 'jinja_cache')
+os.environ['STORYQUEST_LOG_LEVELS_FILE'] = os.path.join(STATE_DIR, 'log_levels.json')
+os.environ['STORYQUEST_METRICS_DIR'] = os.path.join(STATE_DIR, 'metrics')
+
 from src.main import app as flask_app
 from src.models.user import db as _db
 from src.models.user import User
@@ -26,7 +41,14 @@ def app():
         'TESTING': True,
         'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
         'WTF_CSRF_ENABLED': False,
-        'SERVER_NAME': 'localhost.localdomain'
+        'SERVER_NAME': 'localhost.localdomain',
+        # Write counter increments through immediately
+        'COUNTER_FLUSH_INTERVAL': 0,
+        # Run background jobs at the end of the request that enqueued them
+        'JOB_WORKERS': 0,
+        'JOB_QUEUE_EAGER': True,
+        # Process uploaded images in the test process
+        'IMAGE_PROCESS_WORKERS': 0
     })
 
     # Create app context
@@ -46,6 +68,25 @@ def runner(app):
     """A test CLI runner for the app."""
     return app.test_cli_runner()
 
+@pytest.fixture
+def query_counter(app):
+    """Record every SQL statement executed on the app's engine."""
+    statements = []
+    
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    
+    event.listen(_db.engine, 'before_cursor_execute', record)
+    yield statements
+    event.remove(_db.engine, 'before_cursor_execute', record)
+
+@pytest.fixture
+def strict_loading(app):
+    """Raise on any relationship load a route has not declared a loader option for."""
+    app.config['STRICT_LOADING'] = True
+    yield
+    app.config['STRICT_LOADING'] = False
+
 @pytest.fixture
 def db(app):
     """Database for testing."""
@@ -71,8 +112,11 @@ def test_user(app, db):
         # Detach the user from the session to avoid cross-session issues
         db.session.expunge_all()
         
-        # Retrieve a fresh instance
-        user = User.query.filter_by(username='testuser').first()
+        # Retrieve a fresh instance, with achievements loaded so tests can use
+        # them after the request teardown detaches the user
+        user = User.query.filter_by(username='testuser').options(
+            _db.selectinload(User.achievements)
+        ).first()
         return user
 
 @pytest.fixture
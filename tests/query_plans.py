@@ -0,0 +1,22 @@
+"""Query plan helpers shared by the test modules"""
+from src.models import db
+
+def explain(query):
+    """Return the EXPLAIN QUERY PLAN detail lines for a query"""
+    stmt = query.statement if hasattr(query, 'statement') else query
+    compiled = stmt.compile(dialect=db.engine.dialect)
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    rows = db.session.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", params).fetchall()
+    return [row[-1] for row in rows]
+
+def assert_no_full_scan(query):
+    """Fail if any table or index in the plan is read from end to end"""
+    plan = explain(query)
+    scans = [line for line in plan if line.startswith('SCAN')]
+    assert not scans, f"Full scan in query plan: {plan}"
+
+def assert_index_order(query):
+    """Fail if rows are sorted after they are read instead of read in index order"""
+    plan = explain(query)
+    sorts = [line for line in plan if 'TEMP B-TREE' in line]
+    assert not sorts, f"Sort in query plan: {plan}"
@@ -0,0 +1,96 @@
+import pytest
+from src.models import db, User, Achievement, award_achievements, achievement_catalog
+from src.models.user_stats import UserStats
+
+def catalog_queries(statements):
+    """Statements that read the achievements table"""
+    return [s for s in statements if 'FROM achievements' in s]
+
+@pytest.fixture
+def catalog(app, db):
+    """A small achievement catalog"""
+    db.session.add_all([
+        Achievement(name='First Share', description='Share a story', points=10),
+        Achievement(name='Gold', description='Gold badge', points=50),
+    ])
+    db.session.commit()
+    return achievement_catalog
+
+class TestAchievementCatalog:
+    """Process-local achievement catalog cache"""
+
+    def test_lookups(self, app, db, catalog):
+        """Test the id and name indexes and points ordering"""
+        assert [a.name for a in catalog.all()] == ['Gold', 'First Share']
+        gold = catalog.get_by_name('Gold')
+        assert catalog.get(gold.id) == gold
+        assert catalog.get_by_name('Missing') is None
+
+    def test_available_is_set_difference(self, app, db, catalog, test_user):
+        """Test that available achievements exclude the earned ones"""
+        user = db.session.get(User, test_user.id)
+        user.achievements.append(db.session.get(Achievement, catalog.get_by_name('Gold').id))
+        db.session.commit()
+
+        earned_ids = catalog.earned_ids(test_user.id)
+        assert [a.name for a in catalog.earned(earned_ids)] == ['Gold']
+        assert [a.name for a in catalog.available(earned_ids)] == ['First Share']
+        assert [a.name for a in Achievement.get_available_achievements(user)] == ['First Share']
+
+    def test_steady_state_makes_no_catalog_queries(self, app, db, catalog, test_user, query_counter):
+        """Test that a warm catalog serves reads and awards without querying achievements"""
+        catalog.all()
+        query_counter.clear()
+
+        catalog.get_by_name('Gold')
+        Achievement.get_all_achievements()
+        db.session.execute(db.update(UserStats).where(UserStats.user_id == test_user.id).values(shared_count=1))
+        assert award_achievements(test_user.id, 'shared_count') == ['First Share']
+
+        assert catalog_queries(query_counter) == []
+
+    def test_commit_invalidates(self, app, db, catalog):
+        """Test that inserting, updating and deleting an achievement refreshes the catalog"""
+        version = catalog.version
+        db.session.add(Achievement(name='Silver', description='Silver badge', points=20))
+        db.session.commit()
+        assert catalog.version > version
+        assert [a.name for a in catalog.all()] == ['Gold', 'Silver', 'First Share']
+
+        db.session.get(Achievement, catalog.get_by_name('Silver').id).points = 99
+        db.session.commit()
+        assert catalog.get_by_name('Silver').points == 99
+
+        db.session.delete(db.session.get(Achievement, catalog.get_by_name('Silver').id))
+        db.session.commit()
+        assert catalog.get_by_name('Silver') is None
+
+    def test_rollback_drops_flushed_rows(self, app, db, catalog):
+        """Test that a snapshot loaded after a flush does not outlive the rollback"""
+        catalog.invalidate()
+        db.session.add(Achievement(name='Bronze', description='Bronze badge', points=5))
+        db.session.flush()
+        assert catalog.get_by_name('Bronze') is not None
+        db.session.rollback()
+        assert catalog.get_by_name('Bronze') is None
+
+    def test_rollback_keeps_snapshot(self, app, db, catalog, test_user):
+        """Test that a rollback without achievement changes does not invalidate"""
+        catalog.all()
+        version = catalog.version
+        db.session.get(User, test_user.id).username = 'renamed'
+        db.session.flush()
+        db.session.rollback()
+        assert catalog.version == version
+
+    def test_achievements_page(self, client, app, db, catalog, test_user, query_counter):
+        """Test that the achievements page reads the catalog from cache"""
+        client.post('/auth/login', data={'username': test_user.username, 'password': 'password123'})
+        catalog.all()
+        query_counter.clear()
+
+        response = client.get('/viral/achievements')
+
+        assert response.status_code == 200
+        assert b'First Share' in response.data
+        assert catalog_queries(query_counter) == []
@@ -0,0 +1,175 @@
+import os
+import gzip
+import pytest
+from PIL import Image
+from flask import render_template_string, url_for
+from src.utils.assets import (build_images, build_static_assets, static_image, display_width,
+                              image_savings_report, IMAGE_WIDTHS)
+
+@pytest.fixture
+def static_dir(app, tmp_path):
+    """A static folder holding two bundled images and some user images"""
+    static = tmp_path / 'static'
+    (static / 'images' / 'badges').mkdir(parents=True)
+    Image.new('RGB', (1536, 1024), (30, 120, 200)).save(static / 'images' / 'logo.png')
+    Image.new('RGB', (300, 300), (200, 60, 60)).save(static / 'images' / 'badges' / 'award.jpg')
+    (static / 'images' / 'uploads').mkdir()
+    Image.new('RGB', (50, 50)).save(static / 'images' / 'uploads' / 'skip.png')
+    (static / 'images' / 'characters').mkdir()
+    Image.new('RGB', (50, 50)).save(static / 'images' / 'characters' / '1_Hero_photo.png')
+    original = app.static_folder
+    app.static_folder = str(static)
+    yield static
+    app.static_folder = original
+
+class TestImageBuild:
+    """Build-time variants of the bundled images"""
+
+    def test_builds_widths_and_formats(self, static_dir):
+        """Test that each image gets WebP and fallback files at every smaller width"""
+        manifest = build_images(str(static_dir))
+
+        assert sorted(manifest) == ['images/badges/award.jpg', 'images/logo.png']
+        logo = manifest['images/logo.png']
+        assert logo['fallback'] == 'png'
+        assert [width for width, _, _ in logo['variants']['webp']] == list(IMAGE_WIDTHS)
+        award = manifest['images/badges/award.jpg']
+        assert award['fallback'] == 'jpg'
+        assert [width for width, _, _ in award['variants']['jpg']] == [64, 128, 256, 300]
+        for width, output, size in award['variants']['webp']:
+            with Image.open(static_dir / output) as image:
+                assert image.format == 'WEBP' and image.width == width
+            assert os.path.getsize(static_dir / output) == size
+
+    def test_unchanged_images_are_skipped(self, static_dir):
+        """Test that a rebuild only re-encodes images whose bytes changed"""
+        build_images(str(static_dir))
+        logo_output = static_dir / 'build' / 'images' / 'logo.64.webp'
+        award_output = static_dir / 'build' / 'images' / 'badges' / 'award.64.webp'
+        os.utime(logo_output, (0, 0))
+        os.utime(award_output, (0, 0))
+        Image.new('RGB', (300, 300), (0, 0, 0)).save(static_dir / 'images' / 'badges' / 'award.jpg')
+
+        build_images(str(static_dir))
+        assert os.path.getmtime(logo_output) == 0
+        assert os.path.getmtime(award_output) > 0
+
+    def test_helper_emits_srcset(self, app, static_dir):
+        """Test that the macro renders a <picture> with srcset and sizes once built"""
+        template = ("{% from 'macros/images.html' import responsive_static_image %}"
+                    "{{ responsive_static_image('images/logo.png', '60px', 'Logo') }}")
+        with app.test_request_context():
+            html = render_template_string(template)
+            assert 'srcset' not in html
+            assert 'src="/static/images/logo.png"' in html
+
+            build_images(str(static_dir))
+            html = render_template_string(template)
+            image = static_image('images/logo.png')
+        assert '<source type="image/webp"' in html and 'sizes="60px"' in html
+        assert image['srcset'].startswith('/static/build/images/logo.64.png 64w, ')
+        assert image['sources'][0][1].endswith('/static/build/images/logo.1536.webp 1536w')
+
+    def test_display_width(self):
+        """Test that the first matching sizes entry is used"""
+        sizes = '(min-width: 1200px) 350px, (min-width: 768px) 30vw, 100vw'
+        assert display_width(sizes, 1280) == 350
+        assert display_width(sizes, 1000) == 300
+        assert display_width(sizes, 400) == 400
+        assert display_width('60px') == 60
+
+    def test_savings_report(self, static_dir, tmp_path):
+        """Test that the report prices each template at the variant its sizes select"""
+        manifest = build_images(str(static_dir))
+        templates = tmp_path / 'templates'
+        templates.mkdir()
+        (templates / 'page.html').write_text(
+            "{{ responsive_static_image('images/logo.png', '60px', 'Logo') }}\n"
+            "{{ responsive_static_image('images/badges/award.jpg', '100vw', 'Award') }}")
+        (templates / 'plain.html').write_text('<p>No images</p>')
+
+        [(template, count, before, after)] = image_savings_report(manifest, str(templates))
+        logo = manifest['images/logo.png']
+        award = manifest['images/badges/award.jpg']
+        assert (template, count) == ('page.html', 2)
+        assert before == logo['bytes'] + award['bytes']
+        assert after == logo['variants']['webp'][0][2] + award['variants']['webp'][-1][2]
+
+
+@pytest.fixture
+def asset_dir(static_dir):
+    """The image static folder plus a stylesheet and a script"""
+    (static_dir / 'css').mkdir()
+    (static_dir / 'css' / 'site.css').write_text('body { color: #333; }\n' * 200)
+    (static_dir / 'js').mkdir()
+    (static_dir / 'js' / 'app.js').write_text('x')
+    return static_dir
+
+
+class TestStaticAssets:
+    """Fingerprinted, precompressed static files"""
+
+    def test_builds_fingerprinted_copies(self, asset_dir):
+        """Test that files are copied under their content hash with compressed siblings"""
+        manifest = build_static_assets(str(asset_dir))
+
+        css = manifest['css/site.css']
+        assert css['path'] == f"build/assets/css/site.{css['sha256'][:12]}.css"
+        assert css['encodings'] == ['br', 'gzip']
+        assert gzip.decompress((asset_dir / (css['path'] + '.gz')).read_bytes()) == \
+            (asset_dir / 'css' / 'site.css').read_bytes()
+        # Too small to gain from compression, and images are compressed already
+        assert manifest['js/app.js']['encodings'] == []
+        assert manifest['images/logo.png']['encodings'] == []
+        assert 'images/uploads/skip.png' not in manifest
+        assert 'images/characters/1_Hero_photo.png' not in manifest
+
+    def test_stale_outputs_are_removed(self, asset_dir):
+        """Test that a changed file replaces its old fingerprinted copy"""
+        old = build_static_assets(str(asset_dir))['css/site.css']['path']
+        (asset_dir / 'css' / 'site.css').write_text('body { color: red; }\n' * 200)
+        new = build_static_assets(str(asset_dir))['css/site.css']['path']
+
+        assert new != old
+        assert not (asset_dir / old).exists()
+        assert not (asset_dir / (old + '.br')).exists()
+        assert (asset_dir / new).exists()
+
+    def test_url_for_resolves_through_manifest(self, app, asset_dir):
+        """Test that url_for('static') points at the fingerprinted file once built"""
+        with app.test_request_context():
+            assert url_for('static', filename='css/site.css') == '/static/css/site.css'
+            manifest = build_static_assets(str(asset_dir))
+            assert url_for('static', filename='css/site.css') == '/static/' + manifest['css/site.css']['path']
+            assert url_for('static', filename='css/missing.css') == '/static/css/missing.css'
+
+    @pytest.mark.parametrize('accept, encoding', [
+        ('gzip, deflate, br', 'br'),
+        ('gzip', 'gzip'),
+        ('br;q=0, gzip', 'gzip'),
+        ('', None),
+    ])
+    def test_negotiates_encoding(self, app, client, asset_dir, accept, encoding):
+        """Test that the best precompressed sibling the client accepts is sent"""
+        entry = build_static_assets(str(asset_dir))['css/site.css']
+        response = client.get('/static/' + entry['path'], headers={'Accept-Encoding': accept})
+
+        assert response.status_code == 200
+        assert response.headers.get('Content-Encoding') == encoding
+        assert response.mimetype == 'text/css'
+        assert 'Accept-Encoding' in response.headers['Vary']
+        cache_control = response.headers['Cache-Control']
+        assert 'immutable' in cache_control and 'max-age=31536000' in cache_control
+        if encoding is None:
+            assert response.data == (asset_dir / 'css' / 'site.css').read_bytes()
+
+    def test_revalidation_and_plain_files(self, app, client, asset_dir):
+        """Test conditional requests on fingerprinted files and unchanged serving of the rest"""
+        entry = build_static_assets(str(asset_dir))['js/app.js']
+        first = client.get('/static/' + entry['path'])
+        again = client.get('/static/' + entry['path'], headers={'If-None-Match': first.headers['ETag']})
+        assert again.status_code == 304
+
+        plain = client.get('/static/js/app.js')
+        assert plain.status_code == 200 and 'immutable' not in plain.headers.get('Cache-Control', '')
+        assert client.get('/static/build/assets/js/nothing.js').status_code == 404
@@ -0,0 +1,133 @@
+import json
+import gzip
+import brotli
+import pytest
+from flask import Flask, Response, jsonify, stream_with_context
+from src.utils.compression import init_compression, choose_encoding, compress
+
+@pytest.fixture
+def compressed_app():
+    """A bare app with compression and a handful of responses"""
+    app = Flask(__name__)
+    init_compression(app)
+    page = '<p>' + 'Once upon a time. ' * 200 + '</p>'
+
+    @app.route('/page')
+    def page_view():
+        return page
+
+    @app.route('/json')
+    def json_view():
+        return jsonify({'stories': [{'title': f'Story {i}', 'likes': i} for i in range(100)]})
+
+    @app.route('/small')
+    def small_view():
+        return '<p>Hi</p>'
+
+    @app.route('/text')
+    def text_view():
+        return Response('x' * 5000, mimetype='text/plain')
+
+    @app.route('/stream')
+    def stream_view():
+        def generate():
+            for i in range(50):
+                yield f'<li>Chapter {i}</li>' * 20
+        return Response(stream_with_context(generate()), mimetype='text/html')
+
+    @app.route('/tagged')
+    def tagged_view():
+        response = Response(page)
+        response.set_etag('v1')
+        return response
+
+    @app.route('/no-transform')
+    def no_transform_view():
+        response = Response(page)
+        response.cache_control.no_transform = True
+        return response
+
+    app.config['page'] = page
+    return app
+
+class TestCompressionMiddleware:
+    """Negotiated brotli/gzip encoding of dynamic responses"""
+
+    @pytest.mark.parametrize('accept, expected', [
+        ('gzip, deflate, br', 'br'),
+        ('gzip', 'gzip'),
+        ('br;q=0.5, gzip', 'gzip'),
+        ('*', 'br'),
+        ('identity', None),
+        ('', None),
+    ])
+    def test_choose_encoding(self, accept, expected):
+        """Test that the client's ranking wins and brotli breaks ties"""
+        assert choose_encoding(accept) == expected
+
+    def test_brotli_html(self, compressed_app):
+        """Test that HTML is brotli-encoded with a corrected length and Vary"""
+        response = compressed_app.test_client().get('/page', headers={'Accept-Encoding': 'gzip, br'})
+        assert response.headers['Content-Encoding'] == 'br'
+        assert response.headers['Vary'] == 'Accept-Encoding'
+        assert int(response.headers['Content-Length']) == len(response.data)
+        assert brotli.decompress(response.data).decode() == compressed_app.config['page']
+
+    def test_gzip_json(self, compressed_app):
+        """Test that JSON is gzip-encoded for gzip-only clients"""
+        response = compressed_app.test_client().get('/json', headers={'Accept-Encoding': 'gzip'})
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert json.loads(gzip.decompress(response.data))['stories'][99] == {'title': 'Story 99', 'likes': 99}
+
+    @pytest.mark.parametrize('path', ['/small', '/text', '/no-transform'])
+    def test_skipped_responses(self, compressed_app, path):
+        """Test that small, non-allowlisted and no-transform responses are left alone"""
+        response = compressed_app.test_client().get(path, headers={'Accept-Encoding': 'br, gzip'})
+        assert 'Content-Encoding' not in response.headers
+
+    def test_identity_still_varies(self, compressed_app):
+        """Test that an uncompressed HTML response still declares Vary for caches"""
+        response = compressed_app.test_client().get('/page')
+        assert 'Content-Encoding' not in response.headers
+        assert response.headers['Vary'] == 'Accept-Encoding'
+        assert response.text == compressed_app.config['page']
+
+    @pytest.mark.parametrize('encoding, decompress', [('br', brotli.decompress), ('gzip', gzip.decompress)])
+    def test_streaming(self, compressed_app, encoding, decompress):
+        """Test that streamed bodies are compressed chunk by chunk without a length"""
+        response = compressed_app.test_client().get('/stream', headers={'Accept-Encoding': encoding},
+                                                     buffered=False)
+        chunks = list(response.response)
+        response.close()
+        assert 'Content-Length' not in response.headers
+        assert len(chunks) > 2
+        body = decompress(b''.join(chunks)).decode()
+        assert body == ''.join(f'<li>Chapter {i}</li>' * 20 for i in range(50))
+
+    def test_etag_becomes_weak(self, compressed_app):
+        """Test that a strong validator is weakened on the encoded representation"""
+        response = compressed_app.test_client().get('/tagged', headers={'Accept-Encoding': 'gzip'})
+        assert response.headers['ETag'] == 'W/"v1"'
+
+    def test_settings_are_read_per_request(self, compressed_app):
+        """Test that the minimum size, allowlist and switch come from config"""
+        client = compressed_app.test_client()
+        compressed_app.config['COMPRESS_MIN_SIZE'] = 1
+        assert client.get('/small', headers={'Accept-Encoding': 'br'}).headers['Content-Encoding'] == 'br'
+        compressed_app.config['COMPRESS_MIMETYPES'] = ('text/plain',)
+        assert client.get('/text', headers={'Accept-Encoding': 'br'}).headers['Content-Encoding'] == 'br'
+        compressed_app.config['COMPRESS_ENABLED'] = False
+        assert 'Content-Encoding' not in client.get('/text', headers={'Accept-Encoding': 'br'}).headers
+
+    def test_compress_levels(self):
+        """Test that the one-shot helper honours the configured level"""
+        data = b'The dragon slept. ' * 1000
+        assert gzip.decompress(compress(data, 'gzip', gzip_level=1)) == data
+        assert len(compress(data, 'br', brotli_quality=11)) <= len(compress(data, 'br', brotli_quality=1))
+
+    def test_storyquest_pages(self, client):
+        """Test that the application's own pages are compressed"""
+        response = client.get('/', headers={'Accept-Encoding': 'br'})
+        assert response.status_code == 200
+        assert response.headers['Content-Encoding'] == 'br'
+        assert b'StoryQuest' in brotli.decompress(response.data)
@@ -0,0 +1,114 @@
+import pytest
+from sqlalchemy import event
+from src.models import db, User, Story, Achievement
+from src.utils.counters import counters
+from src.utils.jobs import job_queue
+
+@pytest.fixture
+def buffered_counters(app):
+    """Buffer counter increments until flushed explicitly"""
+    app.config['COUNTER_FLUSH_INTERVAL'] = 3600
+    yield counters
+    counters.stop()
+    app.config['COUNTER_FLUSH_INTERVAL'] = 0
+
+def stored(story_id, field):
+    """Counter value as stored in the database"""
+    return db.session.execute(db.select(getattr(Story, field)).where(Story.id == story_id)).scalar()
+
+def login(client, user):
+    """Log in as a fixture user"""
+    return client.post('/auth/login', data={
+        'username': user.username,
+        'password': 'password123'
+    })
+
+class TestCounterBuffer:
+    """Write-behind view and like counters"""
+
+    def test_increments_are_buffered(self, app, db, test_story, buffered_counters):
+        """Test that increments stay in memory until flushed"""
+        for _ in range(3):
+            buffered_counters.increment(test_story.id, 'view_count')
+
+        assert buffered_counters.pending(test_story.id, 'view_count') == 3
+        assert stored(test_story.id, 'view_count') == 0
+        assert buffered_counters.current(test_story, 'view_count') == 3
+
+    def test_flush_applies_deltas_atomically(self, app, db, test_story, buffered_counters):
+        """Test that a flush adds the deltas without touching updated_at"""
+        updated_at = test_story.updated_at
+        buffered_counters.increment(test_story.id, 'view_count', 5)
+        buffered_counters.increment(test_story.id, 'like_count')
+
+        assert buffered_counters.flush() == 2
+        assert stored(test_story.id, 'view_count') == 5
+        assert stored(test_story.id, 'like_count') == 1
+        assert buffered_counters.pending(test_story.id, 'view_count') == 0
+
+        db.session.expire_all()
+        assert db.session.get(Story, test_story.id).updated_at == updated_at
+
+    def test_flush_adds_to_concurrent_writes(self, app, db, test_story, buffered_counters):
+        """Test that a flush adds to the stored value rather than overwriting it"""
+        buffered_counters.increment(test_story.id, 'like_count', 2)
+        db.session.execute(db.update(Story).where(Story.id == test_story.id).values(like_count=40))
+        db.session.commit()
+
+        buffered_counters.flush()
+        assert stored(test_story.id, 'like_count') == 42
+
+    def test_stop_flushes_pending(self, app, db, test_story, buffered_counters):
+        """Test that shutting down writes pending increments"""
+        buffered_counters.increment(test_story.id, 'view_count')
+        buffered_counters.stop()
+        assert stored(test_story.id, 'view_count') == 1
+
+    def test_unknown_field_rejected(self, app, db, test_story):
+        """Test that only known story counters can be incremented"""
+        with pytest.raises(ValueError):
+            counters.increment(test_story.id, 'title')
+
+    def test_like_threshold_counts_pending(self, client, app, db, test_user, test_story, buffered_counters):
+        """Test that like achievements fire on the stored plus pending count"""
+        db.session.add(Achievement(name='Popular Story', description='10 likes', points=10))
+        db.session.execute(db.update(Story).where(Story.id == test_story.id).values(like_count=8))
+        db.session.commit()
+        buffered_counters.increment(test_story.id, 'like_count')
+        login(client, test_user)
+
+        assert client.post(f'/viral/story/{test_story.id}/like').get_json()['likes'] == 10
+        assert stored(test_story.id, 'like_count') == 8
+
+        db.session.expunge_all()
+        user = User.get_by_id(test_user.id, options=[db.selectinload(User.achievements)])
+        assert [a.name for a in user.achievements] == ['Popular Story']
+    
+    def test_like_and_award_job_commit_together(self, client, app, db, test_user, test_story,
+                                                buffered_counters, monkeypatch):
+        """Test that a like reaching a threshold writes the like and its award job in one commit"""
+        monkeypatch.setitem(app.config, 'JOB_QUEUE_EAGER', False)
+        db.session.add(Achievement(name='Popular Story', description='10 likes', points=10))
+        db.session.execute(db.update(Story).where(Story.id == test_story.id).values(like_count=9))
+        db.session.commit()
+        login(client, test_user)
+        commits = []
+        
+        def record(conn):
+            commits.append(conn)
+        
+        event.listen(db.engine, 'commit', record)
+        try:
+            assert client.post(f'/viral/story/{test_story.id}/like').get_json()['likes'] == 10
+        finally:
+            event.remove(db.engine, 'commit', record)
+        assert len(commits) == 1
+        
+        # The job counts the like even before the buffered increment is written
+        buffered_counters.stop()
+        db.session.execute(db.update(Story).where(Story.id == test_story.id).values(like_count=9))
+        db.session.commit()
+        assert job_queue.run_pending() == 1
+        db.session.expunge_all()
+        user = User.get_by_id(test_user.id, options=[db.selectinload(User.achievements)])
+        assert [a.name for a in user.achievements] == ['Popular Story']
@@ -0,0 +1,61 @@
+import os
+import pytest
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import text
+from src.utils.db_config import (PROFILES, DEFAULT_DB_PATH, configure_database,
+                                 init_engine_events, get_profile_name)
+
+def make_app(profile, database_path=None):
+    """Build a bare app with its own SQLAlchemy instance for a profile"""
+    app = Flask(__name__)
+    configure_database(app, profile, database_path)
+    db = SQLAlchemy()
+    db.init_app(app)
+    init_engine_events(app, db)
+    return app, db
+
+class TestDatabaseProfiles:
+    """Test cases for SQLite storage-engine profiles"""
+    
+    def test_default_path_is_absolute(self):
+        """Test that file-backed profiles use an absolute path shared with reinit_db"""
+        assert os.path.isabs(DEFAULT_DB_PATH)
+        assert DEFAULT_DB_PATH.endswith(os.path.join('instance', 'storyquest.db'))
+    
+    def test_unknown_profile(self):
+        """Test that unknown profile names are rejected"""
+        with pytest.raises(ValueError):
+            get_profile_name('does-not-exist')
+    
+    def test_profile_from_environment(self, monkeypatch):
+        """Test profile selection from the environment"""
+        monkeypatch.setenv('STORYQUEST_DB_PROFILE', 'production-high-concurrency')
+        assert get_profile_name() == 'production-high-concurrency'
+        monkeypatch.delenv('STORYQUEST_DB_PROFILE')
+        monkeypatch.setenv('FLASK_ENV', 'production')
+        assert get_profile_name() == 'production-high-concurrency'
+    
+    @pytest.mark.parametrize('profile', ['dev', 'production-high-concurrency'])
+    def test_file_profile_pragmas(self, tmp_path, profile):
+        """Test that connect events apply each profile's pragmas"""
+        app, db = make_app(profile, str(tmp_path / 'profile.db'))
+        pragmas = PROFILES[profile]['pragmas']
+        
+        with app.app_context():
+            with db.engine.connect() as conn:
+                assert conn.execute(text('PRAGMA journal_mode')).scalar() == 'wal'
+                assert conn.execute(text('PRAGMA synchronous')).scalar() == 1  # NORMAL
+                assert conn.execute(text('PRAGMA busy_timeout')).scalar() == pragmas['busy_timeout']
+                assert conn.execute(text('PRAGMA cache_size')).scalar() == pragmas['cache_size']
+                assert conn.execute(text('PRAGMA temp_store')).scalar() == 2  # MEMORY
+                assert conn.execute(text('PRAGMA mmap_size')).scalar() == pragmas['mmap_size']
+    
+    def test_test_profile_is_in_memory(self):
+        """Test that the test profile uses an in-memory database"""
+        app, db = make_app('test')
+        assert app.config['SQLALCHEMY_DATABASE_URI'] == 'sqlite://'
+        
+        with app.app_context():
+            with db.engine.connect() as conn:
+                assert conn.execute(text('PRAGMA synchronous')).scalar() == 0  # OFF
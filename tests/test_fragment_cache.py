@@ -0,0 +1,116 @@
+import pytest
+from flask import Flask, render_template_string
+from src.models import Character, StoryElement
+from src.utils.fragment_cache import FragmentCache, fragment_cache
+
+@pytest.fixture
+def cache_app():
+    """A bare app with the {% cache %} tag"""
+    app = Flask(__name__)
+    return app, FragmentCache(app)
+
+TEMPLATE = ("{% for item in items %}{% cache 'item', item.id, item.version %}"
+            "<li>{{ render(item) }}</li>{% endcache %}{% endfor %}")
+
+class TestFragmentCacheTag:
+    def test_block_rendered_once_per_key(self, cache_app):
+        """Test that unchanged keys reuse the stored HTML"""
+        app, cache = cache_app
+        calls = []
+        def render(item):
+            calls.append(item['id'])
+            return item['text']
+        items = [{'id': i, 'version': 0, 'text': f'Chapter {i}'} for i in range(3)]
+        with app.app_context():
+            first = render_template_string(TEMPLATE, items=items, render=render)
+            second = render_template_string(TEMPLATE, items=items, render=render)
+            assert first == second == '<li>Chapter 0</li><li>Chapter 1</li><li>Chapter 2</li>'
+            assert calls == [0, 1, 2]
+
+            items[1] = {'id': 1, 'version': 1, 'text': 'Chapter One'}
+            assert 'Chapter One' in render_template_string(TEMPLATE, items=items, render=render)
+            assert calls == [0, 1, 2, 1]
+        assert (cache.hits, cache.misses) == (5, 4)
+
+    def test_cached_html_is_not_escaped_again(self, cache_app):
+        """Test that markup from the cache is output as-is"""
+        app, cache = cache_app
+        with app.app_context():
+            for _ in range(2):
+                html = render_template_string("{% cache 'x' %}<b>{{ v }}</b>{% endcache %}", v='<i>')
+                assert html == '<b>&lt;i&gt;</b>'
+
+    def test_least_recently_used_evicted(self, cache_app):
+        """Test that the store stays within FRAGMENT_CACHE_MAX_ENTRIES"""
+        app, cache = cache_app
+        app.config['FRAGMENT_CACHE_MAX_ENTRIES'] = 2
+        for key in ('a', 'b', 'a', 'c'):
+            cache.get_or_render((key,), lambda: key)
+        assert len(cache) == 2
+        assert cache.get_or_render(('b',), lambda: 'new') == 'new'
+
+    def test_disabled(self, cache_app):
+        """Test that blocks render every time with the cache off"""
+        app, cache = cache_app
+        app.config['FRAGMENT_CACHE_ENABLED'] = False
+        with app.app_context():
+            render_template_string("{% cache 'x' %}x{% endcache %}")
+        assert len(cache) == 0
+
+class TestStoryElementFragments:
+    @pytest.fixture
+    def story_with_elements(self, db, shared_story):
+        character = Character(name='Pip the Fox', description='A curious fox', story_id=shared_story.id,
+                              user_id=shared_story.user_id)
+        db.session.add(character)
+        db.session.flush()
+        db.session.add(StoryElement(story_id=shared_story.id, element_type='character', content='{}',
+                                    position=0, character_id=character.id))
+        for position in range(1, 6):
+            db.session.add(StoryElement(story_id=shared_story.id, element_type='plot_point',
+                                        content=f'Part {position}', position=position))
+        db.session.commit()
+        fragment_cache.clear()
+        return shared_story
+
+    def test_only_changed_elements_render(self, client, db, story_with_elements):
+        """Test that a repeat view renders nothing and an edit renders one element"""
+        url = f'/story/{story_with_elements.id}/view'
+        client.get(url)
+        assert fragment_cache.misses == 6
+        client.get(url)
+        assert (fragment_cache.hits, fragment_cache.misses) == (6, 6)
+
+        element = StoryElement.query.filter_by(story_id=story_with_elements.id, position=3).one()
+        element.content = 'A twist in the tale'
+        db.session.commit()
+        response = client.get(url)
+        assert b'A twist in the tale' in response.data
+        assert b'Part 3' not in response.data
+        assert fragment_cache.misses == 7
+
+    def test_character_edit_refreshes_element(self, client, db, story_with_elements):
+        """Test that renaming a character shows in the story and changes its validator"""
+        url = f'/story/{story_with_elements.id}/view'
+        first = client.get(url)
+        assert b'Pip the Fox' in first.data
+        character = Character.query.filter_by(name='Pip the Fox').one()
+        character.name = 'Pip the Brave'
+        db.session.commit()
+        response = client.get(url, headers={'If-None-Match': first.headers['ETag']})
+        assert response.status_code == 200
+        assert b'Pip the Brave' in response.data
+        assert fragment_cache.misses == 7
+
+    def test_reused_element_id_not_served_stale(self, db, story_with_elements):
+        """Test that a row recreated under a deleted row's id gets a new key"""
+        element = StoryElement.query.filter_by(story_id=story_with_elements.id, position=5).one()
+        old_id, old_version = element.id, element.render_version
+        db.session.delete(element)
+        db.session.commit()
+        replacement = StoryElement(story_id=story_with_elements.id, element_type='plot_point',
+                                   content='A new ending', position=5)
+        db.session.add(replacement)
+        db.session.commit()
+        assert replacement.id == old_id
+        assert replacement.render_version != old_version
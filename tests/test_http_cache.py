@@ -0,0 +1,165 @@
+import io
+import pytest
+from datetime import datetime, timedelta
+from PIL import Image
+from flask import template_rendered
+from werkzeug.http import http_date
+from src.models import Story, StoryElement, Progress, Character
+from src.routes.asset import accept_image_upload
+from src.utils.jobs import job_queue
+
+@pytest.fixture
+def rendered(app):
+    """Names of the templates rendered during a test"""
+    names = []
+    def record(sender, template, context, **extra):
+        names.append(template.name)
+    template_rendered.connect(record, app)
+    yield names
+    template_rendered.disconnect(record, app)
+
+@pytest.fixture
+def public_story(app, db, shared_story):
+    return shared_story
+
+def login(client, user_id):
+    with client.session_transaction() as sess:
+        sess['user_id'] = user_id
+
+class TestStoryValidators:
+    """Conditional GET on story pages"""
+
+    def test_revalidation_skips_rendering(self, client, public_story, rendered):
+        """Test that a matching ETag gets a 304 without rendering the template"""
+        first = client.get(f'/story/{public_story.id}/view')
+        assert first.status_code == 200
+        assert first.headers['ETag'] and first.headers['Last-Modified']
+        assert 'no-cache' in first.headers['Cache-Control']
+        rendered.clear()
+
+        again = client.get(f'/story/{public_story.id}/view', headers={'If-None-Match': first.headers['ETag']})
+        assert again.status_code == 304
+        assert again.data == b''
+        assert again.headers['ETag'] == first.headers['ETag']
+        assert rendered == []
+
+    def test_weak_tag_from_compression_matches(self, client, public_story):
+        """Test that the weakened tag a compressed response carries still validates"""
+        first = client.get(f'/story/{public_story.id}/view', headers={'Accept-Encoding': 'gzip'})
+        assert first.headers['ETag'].startswith('W/')
+        again = client.get(f'/story/{public_story.id}/view', headers={'If-None-Match': first.headers['ETag']})
+        assert again.status_code == 304
+
+    def test_element_changes_invalidate(self, client, db, public_story):
+        """Test that adding or editing an element changes the validator"""
+        etag = client.get(f'/story/{public_story.id}/view').headers['ETag']
+        element = StoryElement(story_id=public_story.id, element_type='plot_point', content='A storm', position=1)
+        db.session.add(element)
+        db.session.commit()
+        changed = client.get(f'/story/{public_story.id}/view', headers={'If-None-Match': etag})
+        assert changed.status_code == 200
+
+        element.content = 'A calm sea'
+        db.session.commit()
+        edited = client.get(f'/story/{public_story.id}/view', headers={'If-None-Match': changed.headers['ETag']})
+        assert edited.status_code == 200
+        assert Story.get_validators(public_story.id).elements_version == 2
+
+    def test_processed_image_invalidates(self, app, client, db, public_story, tmp_path, monkeypatch):
+        """Test that a page validated before its image was processed is rendered again after"""
+        monkeypatch.setitem(app.config, 'IMAGE_STATIC_ROOT', str(tmp_path))
+        monkeypatch.setitem(app.config, 'JOB_QUEUE_EAGER', False)
+        data = io.BytesIO()
+        Image.new('RGB', (40, 40), (20, 140, 60)).save(data, 'PNG')
+        data.seek(0)
+        with app.test_request_context('/asset/characters/create', method='POST',
+                                      data={'image': (data, 'fox.png')}, content_type='multipart/form-data'):
+            image_path = accept_image_upload()
+        character = Character(name='Pip', story_id=public_story.id, user_id=public_story.user_id,
+                              image_path=image_path)
+        db.session.add(character)
+        db.session.flush()
+        db.session.add(StoryElement(story_id=public_story.id, element_type='character', content='{}',
+                                    position=0, character_id=character.id))
+        db.session.commit()
+
+        first = client.get(f'/story/{public_story.id}/view')
+        assert b'element-placeholder' in first.data
+        with app.test_request_context():
+            assert job_queue.run_pending() == 1
+        again = client.get(f'/story/{public_story.id}/view', headers={'If-None-Match': first.headers['ETag']})
+        assert again.status_code == 200
+        assert b'<picture>' in again.data
+
+    def test_story_update_invalidates(self, client, db, public_story):
+        """Test that a newer updated_at changes the validator"""
+        etag = client.get(f'/story/{public_story.id}/view').headers['ETag']
+        story = db.session.get(Story, public_story.id)
+        story.title = 'A New Title'
+        story.updated_at = datetime.utcnow() + timedelta(seconds=5)
+        db.session.commit()
+        response = client.get(f'/story/{public_story.id}/view', headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert b'A New Title' in response.data
+
+    def test_identity_class_is_part_of_validator(self, client, public_story, test_user):
+        """Test that owner, reader and anonymous viewers get different validators"""
+        anonymous = client.get(f'/story/{public_story.id}/view').headers['ETag']
+        login(client, test_user.id)
+        owner = client.get(f'/story/{public_story.id}/view')
+        login(client, test_user.id + 1000)
+        reader = client.get(f'/story/{public_story.id}/view').headers['ETag']
+
+        assert len({anonymous, owner.headers['ETag'], reader}) == 3
+        assert 'private' in owner.headers['Cache-Control']
+
+    def test_if_modified_since(self, client, public_story):
+        """Test that Last-Modified validates when no ETag is sent"""
+        last_modified = client.get(f'/story/{public_story.id}/view').headers['Last-Modified']
+        assert client.get(f'/story/{public_story.id}/view',
+                          headers={'If-Modified-Since': last_modified}).status_code == 304
+        earlier = http_date(datetime(2000, 1, 1))
+        assert client.get(f'/story/{public_story.id}/view',
+                          headers={'If-Modified-Since': earlier}).status_code == 200
+
+    def test_pending_flash_is_rendered(self, client, public_story):
+        """Test that a page with a flash message to show is never answered with 304"""
+        etag = client.get(f'/story/{public_story.id}/view').headers['ETag']
+        with client.session_transaction() as sess:
+            sess['_flashes'] = [('success', 'Story saved!')]
+        response = client.get(f'/story/{public_story.id}/view', headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert b'Story saved!' in response.data
+
+    def test_private_story_is_not_validated(self, client, test_story):
+        """Test that a private story redirects strangers even with a matching validator"""
+        response = client.get(f'/story/{test_story.id}/view', headers={'If-None-Match': '*'})
+        assert response.status_code == 302
+
+    def test_shared_view_counts_revalidations(self, app, client, db, public_story):
+        """Test that a 304 on the shared page still counts the view"""
+        future = http_date(datetime.utcnow() + timedelta(days=1))
+        for _ in range(3):
+            response = client.get(f'/viral/shared/story/{public_story.id}', headers={'If-Modified-Since': future})
+            assert response.status_code == 304
+        assert db.session.execute(db.select(Story.view_count).where(Story.id == public_story.id)).scalar() == 3
+
+    def test_resume_depends_on_progress(self, client, db, public_story, test_user):
+        """Test that saving progress changes the resume page's validator"""
+        story = db.session.get(Story, public_story.id)
+        story.content = '{}'
+        db.session.add(Progress(user_id=test_user.id, story_id=public_story.id, current_step='start',
+                                data='{}'))
+        db.session.commit()
+        login(client, test_user.id)
+        first = client.get(f'/story/resume/{public_story.id}')
+        assert first.status_code == 200
+        assert client.get(f'/story/resume/{public_story.id}',
+                          headers={'If-None-Match': first.headers['ETag']}).status_code == 304
+
+        progress = Progress.query.filter_by(user_id=test_user.id).one()
+        progress.current_step = 'middle'
+        progress.updated_at = datetime.utcnow() + timedelta(seconds=5)
+        db.session.commit()
+        assert client.get(f'/story/resume/{public_story.id}',
+                          headers={'If-None-Match': first.headers['ETag']}).status_code == 200
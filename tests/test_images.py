@@ -0,0 +1,224 @@
+import io
+import os
+import hashlib
+import pytest
+from PIL import Image
+from flask import render_template_string
+from src.models import db as _db, Job, Upload, Character, Setting, rebuild_upload_refs
+from src.utils.images import (process_image, check_image, image_sources, incoming_dir,
+                              collect_unreferenced_uploads, remove_legacy_image, VARIANTS, MODERN_FORMATS)
+from src.utils.jobs import job_queue
+from src.routes.asset import accept_image_upload
+
+def make_image(size=(3000, 2000), mode='RGB', fmt='JPEG', exif=True):
+    """Encode a test image, with EXIF orientation and GPS tags"""
+    image = Image.new(mode, size, (200, 80, 40, 255) if mode == 'RGBA' else (200, 80, 40))
+    buffer = io.BytesIO()
+    options = {}
+    if exif:
+        tags = Image.Exif()
+        tags[0x0112] = 6  # Orientation: rotate 90 degrees
+        tags[0x8825] = {1: 'N'}  # GPS info
+        options['exif'] = tags
+    image.save(buffer, fmt, **options)
+    buffer.seek(0)
+    return buffer
+
+@pytest.fixture
+def static_root(app, tmp_path):
+    """Write processed images to a temporary static root"""
+    app.config['IMAGE_STATIC_ROOT'] = str(tmp_path / 'static')
+    yield tmp_path / 'static'
+    app.config['IMAGE_STATIC_ROOT'] = None
+
+class TestImagePipeline:
+    """Resized, metadata-free variants of uploaded images"""
+
+    def test_variants_are_resized_and_stripped(self, tmp_path):
+        """Test that every variant fits its box, is rotated upright and has no EXIF"""
+        source = tmp_path / 'upload'
+        source.write_bytes(make_image().read())
+
+        manifest = process_image(str(source), str(tmp_path / 'out'))
+
+        assert manifest['fallback'] == 'jpg'
+        assert manifest['formats'] == MODERN_FORMATS + ['jpg']
+        for variant, box in VARIANTS.items():
+            size = manifest['variants'][variant]
+            # Orientation 6 turns the 3000x2000 landscape into portrait
+            assert size['height'] == box and size['width'] < box
+            for fmt in manifest['formats']:
+                with Image.open(tmp_path / 'out' / f'{variant}.{fmt}') as image:
+                    assert image.size == (size['width'], size['height'])
+                    assert not image.getexif()
+                    assert 'icc_profile' not in image.info
+
+    def test_small_images_are_not_upscaled(self, tmp_path):
+        """Test that an image smaller than a variant keeps its size"""
+        source = tmp_path / 'upload'
+        source.write_bytes(make_image(size=(100, 50), exif=False).read())
+        manifest = process_image(str(source), str(tmp_path / 'out'))
+        assert manifest['variants']['full'] == {'width': 100, 'height': 50}
+
+    def test_transparency_falls_back_to_png(self, tmp_path):
+        """Test that images with alpha keep it in the fallback format"""
+        source = tmp_path / 'upload'
+        source.write_bytes(make_image(size=(600, 600), mode='RGBA', fmt='PNG', exif=False).read())
+        manifest = process_image(str(source), str(tmp_path / 'out'))
+        assert manifest['fallback'] == 'png'
+        with Image.open(tmp_path / 'out' / 'card.png') as image:
+            assert image.mode == 'RGBA'
+
+    def test_check_image(self):
+        """Test that only decodable images are accepted"""
+        assert check_image(make_image()) == 'JPEG'
+        assert check_image(io.BytesIO(b'not an image')) is None
+
+    def test_upload_is_processed_in_background(self, app, db, static_root):
+        """Test that an upload is staged, processed by a job and then rendered"""
+        with upload_request(app, make_image()):
+            image_path = accept_image_upload()
+            db.session.commit()
+            assert image_sources(image_path, 'card') is None
+            assert Job.query.one().name == 'process_upload_image'
+
+            assert job_queue.run_pending() == 1
+            assert os.listdir(incoming_dir()) == []
+
+            sources = image_sources(image_path, 'card')
+            assert sources['src'].endswith(f'{image_path}/card.jpg')
+            html = render_template_string(
+                "{% from 'macros/images.html' import responsive_image %}"
+                "{{ responsive_image(path, 'thumb', 'Hero') }}", path=image_path)
+            assert 'type="image/webp"' in html
+            assert 'width="107" height="160"' in html
+
+    def test_rejects_non_image(self, app, db):
+        """Test that a non-image upload queues nothing"""
+        with upload_request(app, io.BytesIO(b'hello'), 'notes.txt'):
+            assert accept_image_upload() is None
+            assert Job.query.count() == 0
+            assert Upload.query.count() == 0
+
+
+def upload_request(app, stream, filename='photo.jpg'):
+    """A request context carrying one uploaded image"""
+    return app.test_request_context('/asset/characters/create', method='POST',
+                                    data={'image': (stream, filename)}, content_type='multipart/form-data')
+
+
+def upload(app, data):
+    """Accept an upload of the given bytes and return its image path"""
+    with upload_request(app, io.BytesIO(data)):
+        return accept_image_upload()
+
+
+def add_character(story, image_path, name='Hero'):
+    character = Character(name=name, story_id=story.id, user_id=story.user_id, image_path=image_path)
+    _db.session.add(character)
+    _db.session.commit()
+    return character
+
+
+class TestUploadStore:
+    """Content-addressed, reference-counted upload storage"""
+
+    def test_path_is_content_addressed(self, app, db, static_root):
+        """Test that the path is the sharded SHA-256 of the uploaded bytes"""
+        data = make_image(size=(300, 300)).read()
+        digest = hashlib.sha256(data).hexdigest()
+        image_path = upload(app, data)
+        assert image_path == f'images/uploads/{digest[:2]}/{digest[2:4]}/{digest}'
+
+    def test_duplicate_upload_is_stored_once(self, app, db, static_root):
+        """Test that the same bytes uploaded twice are processed and stored once"""
+        data = make_image(size=(300, 300)).read()
+        first = upload(app, data)
+        db.session.commit()
+        second = upload(app, data)
+        db.session.commit()
+
+        assert first == second
+        assert Upload.query.count() == 1
+        assert Job.query.count() == 1
+        with app.test_request_context():
+            assert job_queue.run_pending() == 1
+            assert os.listdir(incoming_dir()) == []
+        assert (static_root / first / 'manifest.json').exists()
+
+    def test_references_are_counted(self, app, db, test_story, static_root):
+        """Test that triggers count characters and settings sharing an image"""
+        image_path = upload(app, make_image(size=(300, 300)).read())
+        hero = add_character(test_story, image_path, 'Hero')
+        sidekick = add_character(test_story, image_path, 'Sidekick')
+        db.session.add(Setting(name='Castle', story_id=test_story.id, user_id=test_story.user_id,
+                               image_path=image_path))
+        db.session.commit()
+        assert Upload.get_ref_count(image_path) == 3
+
+        sidekick.image_path = None
+        db.session.delete(hero)
+        db.session.commit()
+        assert Upload.get_ref_count(image_path) == 1
+
+        assert rebuild_upload_refs() == 1
+        assert Upload.get_ref_count(image_path) == 1
+
+    def test_replaced_image_is_collected(self, app, db, test_story, static_root):
+        """Test that garbage collection removes released uploads and keeps used ones"""
+        old_path = upload(app, make_image(size=(300, 300)).read())
+        hero = add_character(test_story, old_path)
+        new_path = upload(app, make_image(size=(200, 200)).read())
+        hero.image_path = new_path
+        db.session.commit()
+        with app.test_request_context():
+            job_queue.run_pending()
+
+            # Still inside the grace period
+            assert collect_unreferenced_uploads() == 0
+            assert collect_unreferenced_uploads(grace_period=0, batch_size=1) == 1
+
+        assert not (static_root / old_path).exists()
+        assert (static_root / new_path / 'manifest.json').exists()
+        assert [row.path for row in Upload.query.all()] == [new_path]
+
+    def test_legacy_image_is_removed_on_replace(self, app, db, test_story, static_root):
+        """Test that a replaced image saved before the upload store is deleted"""
+        legacy = static_root / 'images' / 'characters' / '1_Hero_photo.png'
+        legacy.parent.mkdir(parents=True)
+        legacy.write_bytes(b'png')
+        hero = add_character(test_story, 'static/images/characters/1_Hero_photo.png')
+        hero.image_path = 'images/uploads/ab/cd/' + 'abcd' * 16
+        db.session.commit()
+
+        assert remove_legacy_image('static/images/characters/1_Hero_photo.png')
+        assert not legacy.exists()
+
+    def test_legacy_removal_skips_shared_and_content_paths(self, app, db, test_story, static_root):
+        """Test that only unused, non-content-addressed images are deleted"""
+        variants = static_root / 'images' / 'uploads' / 'settings' / 'a1b2c3'
+        variants.mkdir(parents=True)
+        (variants / 'manifest.json').write_text('{}')
+        add_character(test_story, 'images/uploads/settings/a1b2c3')
+        assert not remove_legacy_image('images/uploads/settings/a1b2c3')
+        Character.query.delete()
+        db.session.commit()
+        assert remove_legacy_image('images/uploads/settings/a1b2c3')
+        assert not variants.exists()
+
+        content = static_root / 'images' / 'uploads' / 'ab' / 'cd' / ('abcd' * 16)
+        content.mkdir(parents=True)
+        assert not remove_legacy_image('images/uploads/ab/cd/' + 'abcd' * 16)
+        assert content.exists()
+        assert not remove_legacy_image('static/../../outside.png')
+
+    def test_upload_urls_are_immutable(self, app, client, db, static_root):
+        """Test that processed upload variants are served with a far-future cache header"""
+        app.config['IMAGE_STATIC_ROOT'] = None
+        response = client.get('/static/logo.png')
+        assert 'immutable' not in response.headers.get('Cache-Control', '')
+        with app.test_request_context('/static/images/uploads/ab/cd/abcd/card.webp'):
+            app.preprocess_request()
+            headers = app.process_response(app.make_response(('', 200))).headers
+        assert 'immutable' in headers['Cache-Control']
+        assert 'max-age=31536000' in headers['Cache-Control']
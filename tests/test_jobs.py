@@ -0,0 +1,129 @@
+import pytest
+from datetime import datetime, timedelta
+from src.models import db, Job
+from src.utils.jobs import job_queue
+from tests.query_plans import explain
+
+calls = []
+
+@job_queue.task('test.record', dedupe_key=lambda value: f'record:{value}')
+def record(value):
+    """Test task that records its argument"""
+    calls.append(value)
+
+@job_queue.task('test.flaky', max_attempts=2)
+def flaky(value):
+    """Test task that always fails"""
+    raise RuntimeError(f'failed {value}')
+
+@pytest.fixture(autouse=True)
+def reset_calls():
+    calls.clear()
+
+def queued():
+    """(name, status) of every job row"""
+    return [(job.name, job.status) for job in Job.query.order_by(Job.id)]
+
+class TestJobQueue:
+    """SQLite-backed local job queue"""
+
+    def test_enqueue_is_part_of_the_transaction(self, app, db):
+        """Test that a rolled back enqueue leaves no job behind"""
+        record.delay('a')
+        db.session.rollback()
+        assert queued() == []
+
+        record.delay('b')
+        db.session.commit()
+        assert queued() == [('test.record', 'queued')]
+
+    def test_run_pending_deletes_finished_jobs(self, app, db):
+        """Test that workers run jobs and remove them"""
+        record.delay('a')
+        db.session.commit()
+
+        assert job_queue.run_pending() == 1
+        assert calls == ['a']
+        assert queued() == []
+
+    def test_dedupe_key(self, app, db):
+        """Test that a queued job with the same key absorbs duplicates"""
+        assert record.delay('a')
+        assert not record.delay('a')
+        assert record.delay('b')
+        db.session.commit()
+
+        job_queue.run_pending()
+        assert calls == ['a', 'b']
+        assert record.delay('a')
+
+    def test_priority_order(self, app, db):
+        """Test that higher priority jobs run first"""
+        job_queue.enqueue('test.record', ['low'], priority=0)
+        job_queue.enqueue('test.record', ['high'], priority=10)
+        db.session.commit()
+
+        job_queue.run_pending()
+        assert calls == ['high', 'low']
+
+    def test_delayed_job_waits(self, app, db):
+        """Test that a job is not claimed before its run_at"""
+        job_queue.enqueue('test.record', ['later'], delay=60)
+        db.session.commit()
+        assert job_queue.run_pending() == 0
+        assert calls == []
+
+    def test_retries_then_fails(self, app, db):
+        """Test that a failing job backs off, retries and is kept once it gives up"""
+        flaky.delay(1)
+        db.session.commit()
+
+        job_queue.run_pending()
+        job = Job.query.one()
+        assert (job.status, job.attempts) == ('queued', 1)
+        assert job.run_at > datetime.utcnow()
+        assert 'failed 1' in job.last_error
+
+        job.run_at = datetime.utcnow()
+        db.session.commit()
+        job_queue.run_pending()
+        db.session.expire_all()
+        assert (Job.query.one().status, Job.query.one().attempts) == ('failed', 2)
+
+    def test_unknown_task_fails(self, app, db):
+        """Test that a job naming no registered task is not run"""
+        job_queue.enqueue('test.missing', max_attempts=1)
+        db.session.commit()
+        job_queue.run_pending()
+        assert Job.query.one().status == 'failed'
+
+    def test_requeue_stale(self, app, db):
+        """Test that jobs orphaned by a dead worker go back to the queue"""
+        record.delay('a')
+        db.session.commit()
+        job_queue.claim('dead-worker')
+        job = Job.query.one()
+        job.locked_at = datetime.utcnow() - timedelta(hours=1)
+        db.session.commit()
+
+        assert job_queue.requeue_stale() == 1
+        job_queue.run_pending()
+        assert calls == ['a']
+
+    def test_claim_uses_index(self, app, db):
+        """Test that claiming the next job does not sort the whole queue"""
+        now = datetime.utcnow()
+        plan = explain(db.select(Job.id).where(Job.status == 'queued', Job.run_at <= now)
+                       .order_by(Job.priority.desc(), Job.run_at, Job.id).limit(1))
+        assert [line for line in plan if 'ix_jobs_status_priority_run_at' in line], plan
+
+    def test_share_enqueues_achievement_job(self, client, app, db, test_user, test_story):
+        """Test that sharing commits the story and its achievement job together"""
+        app.config['JOB_QUEUE_EAGER'] = False
+        try:
+            client.post('/auth/login', data={'username': test_user.username, 'password': 'password123'})
+            client.post(f'/viral/share/{test_story.id}', data={'share_type': 'public'})
+            assert queued() == [('award_achievements', 'queued')]
+            assert job_queue.run_pending() == 1
+        finally:
+            app.config['JOB_QUEUE_EAGER'] = True
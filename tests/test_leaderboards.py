@@ -0,0 +1,102 @@
+import pytest
+from src.models import db, User, Story, Achievement, UserStats, get_leaderboard, rebuild_leaderboards
+from tests.query_plans import explain
+
+def stats(user_id):
+    """Current (points, stories, wins) of a user"""
+    db.session.expire_all()
+    row = db.session.get(UserStats, user_id)
+    return row.total_points, row.story_count, row.win_count
+
+@pytest.fixture
+def achievements(app, db):
+    """Two achievements worth different points"""
+    gold = Achievement(name='Gold', description='Gold badge', points=50)
+    silver = Achievement(name='Silver', description='Silver badge', points=20)
+    db.session.add_all([gold, silver])
+    db.session.commit()
+    return gold, silver
+
+class TestLeaderboards:
+    """Leaderboard totals are maintained incrementally in user_stats"""
+
+    def test_new_user_gets_stats_row(self, app, db, test_user):
+        """Test that creating a user creates an empty stats row"""
+        assert stats(test_user.id) == (0, 0, 0)
+
+    def test_achievements_update_points(self, app, db, test_user, achievements):
+        """Test that awarding and revoking achievements adjusts points"""
+        gold, silver = achievements
+        user = db.session.get(User, test_user.id)
+        user.achievements.extend([gold, silver])
+        db.session.commit()
+        assert stats(user.id)[0] == 70
+
+        user.achievements.remove(gold)
+        db.session.commit()
+        assert stats(user.id)[0] == 20
+
+    def test_award_without_achievement_row(self, app, db, test_user):
+        """Test that an award whose achievement row is missing counts as no points"""
+        db.session.execute(db.text("INSERT INTO user_achievements (user_id, achievement_id) VALUES (:user_id, 999)"),
+                           {'user_id': test_user.id})
+        db.session.commit()
+        assert stats(test_user.id)[0] == 0
+
+        db.session.execute(db.text("DELETE FROM user_achievements WHERE achievement_id = 999"))
+        db.session.commit()
+        assert stats(test_user.id)[0] == 0
+
+    def test_stories_and_wins(self, app, db, test_user, test_story):
+        """Test that story counts and challenge wins follow inserts, updates and deletes"""
+        assert stats(test_user.id) == (0, 1, 0)
+
+        story = db.session.get(Story, test_story.id)
+        story.is_challenge_winner = True
+        db.session.commit()
+        assert stats(test_user.id) == (0, 1, 1)
+
+        db.session.delete(story)
+        db.session.commit()
+        assert stats(test_user.id) == (0, 0, 0)
+
+    def test_leaderboard_order(self, app, db, test_user, achievements):
+        """Test that the leaderboard ranks users and leaves out users with nothing"""
+        gold, silver = achievements
+        other = User(username='other', email='other@example.com', age_group='7-9', password='x')
+        db.session.add(other)
+        db.session.commit()
+        user = db.session.get(User, test_user.id)
+        user.achievements.append(silver)
+        other.achievements.append(gold)
+        db.session.commit()
+
+        top = get_leaderboard('points')
+        assert [(user.username, points) for user, points in top] == [('other', 50), ('testuser', 20)]
+        assert get_leaderboard('wins') == []
+
+    def test_rebuild_matches_incremental(self, app, db, test_user, test_story, achievements):
+        """Test that a rebuild reproduces the incrementally kept totals"""
+        user = db.session.get(User, test_user.id)
+        user.achievements.append(achievements[0])
+        db.session.commit()
+        before = stats(test_user.id)
+
+        db.session.execute(db.update(UserStats).values(total_points=0, story_count=0))
+        db.session.commit()
+        rebuild_leaderboards()
+        assert stats(test_user.id) == before == (50, 1, 0)
+
+    def test_rebuild_command(self, app, db, runner, test_user):
+        """Test the rebuild-leaderboards CLI command"""
+        result = runner.invoke(args=['rebuild-leaderboards'])
+        assert 'Leaderboards rebuilt for 1 users' in result.output
+
+    @pytest.mark.parametrize('name', ['points', 'stories', 'wins'])
+    def test_leaderboard_reads_index(self, app, db, name):
+        """Test that a leaderboard is an index walk, not an aggregate or sort"""
+        from src.models.user_stats import LEADERBOARDS
+        column = LEADERBOARDS[name]
+        plan = explain(db.select(User, column).join(UserStats, UserStats.user_id == User.id)
+                       .where(column > 0).order_by(column.desc()).limit(10))
+        assert not [line for line in plan if 'TEMP B-TREE' in line or line.startswith('SCAN users')], plan
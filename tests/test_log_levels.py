@@ -0,0 +1,128 @@
+import time
+import logging
+import pytest
+from flask import Flask
+from src.utils.logging_config import parse_levels, SampleFilter, RateLimitFilter, BASE_LEVELS
+from src.utils.log_levels import LogLevels, log_levels
+
+def make_record(msg):
+    return logging.LogRecord('storyquest.test', logging.DEBUG, __file__, 1, msg, None, None)
+
+@pytest.fixture
+def levels_file(tmp_path):
+    return str(tmp_path / 'log_levels.json')
+
+def make_worker(path):
+    """A bare app standing in for one worker process"""
+    app = Flask(__name__)
+    app.config['LOG_LEVELS_FILE'] = path
+    app.config['LOG_LEVELS_POLL_INTERVAL'] = 0
+    return LogLevels(app)
+
+class TestLevelConfig:
+    def test_parse_levels(self):
+        """Test NAME=LEVEL parsing from the environment"""
+        assert parse_levels('storyquest=INFO, storyquest.auth=debug,') == {
+            'storyquest': logging.INFO, 'storyquest.auth': logging.DEBUG}
+        with pytest.raises(ValueError):
+            parse_levels('storyquest=LOUD')
+
+    def test_sample_filter(self):
+        """Test that a fraction of 0 drops everything and 1 keeps everything"""
+        assert not SampleFilter(0).filter(make_record('x'))
+        assert SampleFilter(1).filter(make_record('x'))
+
+    def test_rate_limit_per_message(self):
+        """Test that a flood of one message is capped without starving others"""
+        limit = RateLimitFilter(rate=5)
+        passed = sum(limit.filter(make_record('Shared story: %s')) for _ in range(100))
+        assert passed == 5
+        assert limit.filter(make_record('Shared stories count: %s'))
+
+    def test_rate_limit_buckets_capped(self):
+        """Test that preformatted messages do not grow the filter without bound"""
+        limit = RateLimitFilter(rate=1, max_buckets=10)
+        for i in range(100):
+            assert limit.filter(make_record(f'Shared story: {i}'))
+        assert len(limit._buckets) == 10
+        assert not limit.filter(make_record('Shared story: 99'))
+
+class TestLogLevelOverrides:
+    @pytest.fixture(autouse=True)
+    def restore_levels(self):
+        yield
+        for name in ('storyquest.auth', 'storyquest.tests.levels'):
+            logging.getLogger(name).setLevel(BASE_LEVELS.get(name, logging.NOTSET))
+
+    def test_override_reaches_other_workers(self, levels_file):
+        """Test that a level set through one worker applies in another"""
+        first, second = make_worker(levels_file), make_worker(levels_file)
+        first.set('storyquest.tests.levels', 'ERROR')
+        logging.getLogger('storyquest.tests.levels').setLevel(logging.NOTSET)
+        second.refresh()
+        assert logging.getLogger('storyquest.tests.levels').level == logging.ERROR
+
+    def test_override_expires(self, levels_file):
+        """Test that a logger returns to its configured level when the override ends"""
+        worker = make_worker(levels_file)
+        worker.set('storyquest.tests.levels', 'WARNING', duration=0.05)
+        assert logging.getLogger('storyquest.tests.levels').level == logging.WARNING
+        time.sleep(0.06)
+        worker.refresh()
+        assert logging.getLogger('storyquest.tests.levels').level == logging.NOTSET
+
+    def test_clear(self, levels_file):
+        """Test that clearing an override restores the level at once"""
+        worker = make_worker(levels_file)
+        worker.set('storyquest.tests.levels', 'CRITICAL', duration=None)
+        assert worker.levels()['storyquest.tests.levels']['override']['expires_at'] is None
+        assert worker.clear('storyquest.tests.levels')
+        assert not worker.clear('storyquest.tests.levels')
+        assert logging.getLogger('storyquest.tests.levels').level == logging.NOTSET
+
+    def test_file_from_environment(self, tmp_path, monkeypatch):
+        """Test that STORYQUEST_LOG_LEVELS_FILE moves the overrides out of the instance folder"""
+        monkeypatch.setenv('STORYQUEST_LOG_LEVELS_FILE', str(tmp_path / 'env-levels.json'))
+        worker = LogLevels(Flask(__name__, instance_path=str(tmp_path / 'instance')))
+        worker.set('storyquest.tests.levels', 'ERROR')
+        assert (tmp_path / 'env-levels.json').exists()
+        assert not (tmp_path / 'instance').exists()
+
+class TestLogLevelEndpoint:
+    @pytest.fixture
+    def admin_api(self, app, levels_file, monkeypatch):
+        monkeypatch.setitem(app.config, 'LOG_LEVELS_FILE', levels_file)
+        monkeypatch.setitem(app.config, 'ADMIN_TOKEN', 'secret-token')
+        yield app
+        log_levels.clear('storyquest.auth')
+
+    def test_requires_admin(self, client, admin_api):
+        """Test that the API refuses anonymous callers and wrong tokens"""
+        assert client.get('/admin/log-levels').status_code == 403
+        response = client.get('/admin/log-levels', headers={'Authorization': 'Bearer wrong'})
+        assert response.status_code == 403
+
+    def test_turn_on_auth_debugging(self, client, admin_api):
+        """Test enabling auth debug logging for a minute with the admin token"""
+        headers = {'Authorization': 'Bearer secret-token'}
+        response = client.post('/admin/log-levels', headers=headers,
+                               json={'logger': 'storyquest.auth', 'level': 'debug', 'duration': 60})
+        assert response.status_code == 200
+        assert response.get_json()['override']['level'] == 'DEBUG'
+        assert logging.getLogger('storyquest.auth').level == logging.DEBUG
+
+        listing = client.get('/admin/log-levels', headers=headers).get_json()['loggers']
+        assert listing['storyquest.auth']['level'] == 'DEBUG'
+
+        assert client.delete('/admin/log-levels/storyquest.auth', headers=headers).get_json()['cleared']
+        assert logging.getLogger('storyquest.auth').level == logging.NOTSET
+
+    def test_admin_session(self, client, admin_api):
+        """Test that an admin session may use the API and bad input is rejected"""
+        with client.session_transaction() as sess:
+            sess['is_admin'] = True
+        response = client.post('/admin/log-levels', json={'logger': 'storyquest.auth', 'level': 'LOUD'})
+        assert response.status_code == 400
+        response = client.post('/admin/log-levels', json={'logger': 'storyquest.auth', 'level': 'INFO',
+                                                          'duration': -1})
+        assert response.status_code == 400
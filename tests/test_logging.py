@@ -0,0 +1,91 @@
+import time
+import logging
+import threading
+from logging.handlers import SocketHandler
+import pytest
+from src.utils.logging_config import LogPipeline, LogWriterServer, create_file_handlers
+
+class RecordingHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append((record.getMessage(), threading.current_thread().name))
+
+def wait_for_text(path, text, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if path.exists() and text in path.read_text():
+            return
+        time.sleep(0.02)
+
+@pytest.fixture
+def test_logger():
+    log = logging.getLogger('storyquest.tests.pipeline')
+    log.propagate = False
+    log.setLevel(logging.DEBUG)
+    yield log
+    log.handlers.clear()
+
+class TestLogPipeline:
+    def test_records_written_off_the_calling_thread(self, test_logger):
+        """Test that handlers run on the listener thread with the interpolated message"""
+        recorder = RecordingHandler()
+        pipeline = LogPipeline([recorder])
+        test_logger.addHandler(pipeline.queue_handler)
+        pipeline.start()
+        session = {'user_id': 1}
+        test_logger.info("Session: %s", session)
+        session['user_id'] = 2
+        pipeline.stop()
+        assert recorder.records[0][0] == "Session: {'user_id': 1}"
+        assert recorder.records[0][1] != threading.current_thread().name
+
+    def test_handler_levels_respected(self, test_logger):
+        """Test that the listener applies each handler's own level"""
+        recorder = RecordingHandler()
+        recorder.setLevel(logging.INFO)
+        pipeline = LogPipeline([recorder])
+        test_logger.addHandler(pipeline.queue_handler)
+        pipeline.start()
+        test_logger.debug("hidden")
+        test_logger.info("shown")
+        pipeline.stop()
+        assert [message for message, _ in recorder.records] == ['shown']
+
+    def test_restart_after_fork(self, test_logger):
+        """Test that a forked worker's fresh listener picks up new records"""
+        recorder = RecordingHandler()
+        pipeline = LogPipeline([recorder])
+        test_logger.addHandler(pipeline.queue_handler)
+        pipeline.start()
+        old_queue = pipeline.queue_handler.queue
+        pipeline.stop()
+        pipeline.restart_after_fork()
+        assert pipeline.queue_handler.queue is not old_queue
+        test_logger.warning("after fork")
+        pipeline.stop()
+        assert recorder.records[-1][0] == 'after fork'
+
+class TestLogWriter:
+    def test_writer_receives_records_from_workers(self, tmp_path, test_logger):
+        """Test that records sent over the socket land in the rotating files"""
+        socket_path = str(tmp_path / 'log.sock')
+        server = LogWriterServer(socket_path, create_file_handlers(str(tmp_path)))
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        sender = SocketHandler(socket_path, None)
+        test_logger.addHandler(sender)
+        try:
+            test_logger.debug("Login attempt - Username: %s", 'pip')
+            test_logger.info("Story %s saved", 7)
+            sender.close()
+            wait_for_text(tmp_path / 'auth.log', 'Story 7 saved')
+        finally:
+            server.shutdown()
+            server.server_close()
+        general = (tmp_path / 'storyquest.log').read_text()
+        detailed = (tmp_path / 'auth.log').read_text()
+        assert 'Story 7 saved' in general and 'Login attempt' not in general
+        assert 'Login attempt - Username: pip' in detailed and 'Story 7 saved' in detailed
@@ -0,0 +1,123 @@
+import os
+import sys
+import json
+import pytest
+import subprocess
+from src.utils.metrics import Histogram, Metrics, metrics
+
+REQUESTS = 'storyquest_request_duration_seconds'
+SQL_QUERIES = 'storyquest_request_sql_queries'
+TEMPLATE_TIME = 'storyquest_request_template_duration_seconds'
+RESPONSE_SIZE = 'storyquest_response_size_bytes'
+
+def exited_pid():
+    process = subprocess.Popen([sys.executable, '-c', ''])
+    process.wait()
+    return process.pid
+
+def count(snapshot, name, endpoint):
+    series = snapshot.get(name, {}).get(endpoint)
+    return sum(series['counts']) if series else 0
+
+def total(snapshot, name, endpoint):
+    series = snapshot.get(name, {}).get(endpoint)
+    return series['sum'] if series else 0
+
+@pytest.fixture
+def metrics_api(app, tmp_path, monkeypatch):
+    monkeypatch.setitem(app.config, 'METRICS_DIR', str(tmp_path / 'metrics'))
+    monkeypatch.setitem(app.config, 'ADMIN_TOKEN', 'scrape-token')
+    return app
+
+class TestHistogram:
+    def test_bucket_boundaries(self):
+        """Test that a value equal to a bound counts in that bucket (le is inclusive)"""
+        histogram = Histogram('h', 'help', (1, 5))
+        for value in (0.5, 1, 3, 5, 9):
+            histogram.observe('e', value)
+        assert histogram.series['e'] == {'counts': [2, 2, 1], 'sum': 18.5}
+
+class TestRequestMetrics:
+    def test_request_recorded_per_endpoint(self, client, metrics_api, shared_story):
+        """Test that a request's time, SQL, template time and size are recorded under its endpoint"""
+        before = metrics.snapshot()
+        response = client.get(f'/story/{shared_story.id}/view')
+        body = response.data
+        after = metrics.snapshot()
+        endpoint = 'story_bp.view'
+        assert count(after, REQUESTS, endpoint) == count(before, REQUESTS, endpoint) + 1
+        assert total(after, SQL_QUERIES, endpoint) - total(before, SQL_QUERIES, endpoint) >= 2
+        assert total(after, TEMPLATE_TIME, endpoint) > total(before, TEMPLATE_TIME, endpoint)
+        assert total(after, RESPONSE_SIZE, endpoint) - total(before, RESPONSE_SIZE, endpoint) == len(body)
+
+    def test_unrouted_requests_labelled(self, client, metrics_api):
+        """Test that 404s and page cache hits get their own endpoint labels"""
+        before = metrics.snapshot()
+        client.get('/no-such-page').data
+        client.get('/').data
+        client.get('/').data
+        after = metrics.snapshot()
+        assert count(after, REQUESTS, 'unmatched') == count(before, REQUESTS, 'unmatched') + 1
+        assert count(after, REQUESTS, 'page_cache') >= count(before, REQUESTS, 'page_cache') + 1
+
+    def test_disabled(self, client, metrics_api, monkeypatch):
+        """Test that nothing is recorded with METRICS_ENABLED off"""
+        monkeypatch.setitem(metrics_api.config, 'METRICS_ENABLED', False)
+        before = metrics.snapshot()
+        client.get('/auth/login').data
+        assert metrics.snapshot() == before
+
+class TestAggregation:
+    def test_other_workers_summed(self, app, tmp_path, monkeypatch):
+        """Test that /metrics totals include every process's flushed file"""
+        monkeypatch.setitem(app.config, 'METRICS_DIR', str(tmp_path))
+        worker = Metrics()
+        worker.app = app
+        worker.histograms[0].observe('main.index', 0.02)
+        other = {REQUESTS: {'main.index': {'counts': [0, 1] + [0] * 10, 'sum': 0.008}}}
+        (tmp_path / 'metrics-99999-1.json').write_text(json.dumps(other))
+        merged = worker.collect()[REQUESTS]['main.index']
+        assert sum(merged['counts']) == 2
+        assert merged['sum'] == pytest.approx(0.028)
+
+    def test_flush_writes_own_file(self, app, tmp_path, monkeypatch):
+        """Test that a worker's totals reach its file in METRICS_DIR"""
+        monkeypatch.setitem(app.config, 'METRICS_DIR', str(tmp_path))
+        worker = Metrics()
+        worker.app = app
+        worker.histograms[0].observe('auth_bp.login', 0.1)
+        worker._dirty = True
+        worker.flush()
+        written = json.loads(open(worker.path).read())
+        assert written[REQUESTS]['auth_bp.login']['sum'] == 0.1
+
+    def test_exited_processes_folded(self, app, tmp_path, monkeypatch):
+        """Test that files of exited processes become one totals file without changing the totals"""
+        monkeypatch.setitem(app.config, 'METRICS_DIR', str(tmp_path))
+        worker = Metrics()
+        worker.app = app
+        series = {REQUESTS: {'main.index': {'counts': [1] + [0] * 11, 'sum': 0.001}}}
+        for started in (1, 2):
+            (tmp_path / f'metrics-{exited_pid()}-{started}.json').write_text(json.dumps(series))
+        live = tmp_path / f'metrics-{os.getppid()}-3.json'
+        live.write_text(json.dumps(series))
+        assert sum(worker.collect()[REQUESTS]['main.index']['counts']) == 3
+        assert sorted(p.name for p in tmp_path.glob('metrics-*.json')) == [live.name, 'metrics-totals.json']
+        assert sum(worker.collect()[REQUESTS]['main.index']['counts']) == 3
+        assert worker.fold_exited() == 0
+
+class TestMetricsEndpoint:
+    def test_requires_token(self, client, metrics_api):
+        """Test that metrics are only served to admins and the scrape token"""
+        assert client.get('/metrics').status_code == 403
+
+    def test_prometheus_text_format(self, client, metrics_api):
+        """Test the exposition format Prometheus parses"""
+        client.get('/auth/login').data
+        response = client.get('/metrics', headers={'Authorization': 'Bearer scrape-token'})
+        assert response.status_code == 200
+        assert response.mimetype == 'text/plain'
+        text = response.data.decode()
+        assert f'# TYPE {REQUESTS} histogram' in text
+        assert f'{REQUESTS}_bucket{{endpoint="auth_bp.login",le="+Inf"}}' in text
+        assert f'{SQL_QUERIES}_count{{endpoint="auth_bp.login"}}' in text
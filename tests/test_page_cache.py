@@ -0,0 +1,105 @@
+import brotli
+import pytest
+from flask import Flask, flash, render_template_string, session
+from src.utils.compression import init_compression
+from src.utils.page_cache import PageCache
+
+@pytest.fixture
+def cache_app():
+    """A bare app with a cached page that counts its renders"""
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = 'test'
+    init_compression(app)
+    cache = PageCache(app)
+    renders = []
+
+    @app.route('/page')
+    @cache.cached
+    def page_view():
+        renders.append(session.get('user_id'))
+        return render_template_string(
+            '{% for m in get_flashed_messages() %}<b>{{ m }}</b>{% endfor %}'
+            '<p>{{ "signed in" if session.user_id else "guest" }}</p>' + '<p>Once upon a time.</p>' * 100)
+
+    @app.route('/login')
+    def login():
+        session['user_id'] = 1
+        return 'ok'
+
+    @app.route('/notify')
+    def notify():
+        flash('Saved!')
+        return 'ok'
+
+    app.renders = renders
+    return app, cache
+
+class TestPageCache:
+    def test_repeat_request_served_from_cache(self, cache_app):
+        """The second anonymous request is answered without rendering"""
+        app, cache = cache_app
+        client = app.test_client()
+        first = client.get('/page')
+        second = client.get('/page')
+        assert app.renders == [None]
+        assert second.headers['X-Page-Cache'] == 'HIT'
+        assert second.data == first.data
+        assert 'Cookie' in second.headers['Vary']
+
+    def test_precompressed_variant_negotiated(self, cache_app):
+        """A hit is sent in the encoding the client prefers"""
+        app, cache = cache_app
+        client = app.test_client()
+        plain = client.get('/page').data
+        response = client.get('/page', headers={'Accept-Encoding': 'br'})
+        assert response.headers['Content-Encoding'] == 'br'
+        assert brotli.decompress(response.data) == plain
+        assert int(response.headers['Content-Length']) == len(response.data)
+
+    def test_logged_in_viewer_gets_own_copy(self, cache_app):
+        """Anonymous and authenticated pages are cached separately"""
+        app, cache = cache_app
+        client = app.test_client()
+        assert b'guest' in client.get('/page').data
+        client.get('/login')
+        assert b'signed in' in client.get('/page').data
+        assert b'signed in' in client.get('/page').data
+        assert app.renders == [None, 1]
+
+    def test_pending_flash_renders(self, cache_app):
+        """A page with a flash message waiting is rendered, not served from cache"""
+        app, cache = cache_app
+        client = app.test_client()
+        client.get('/page')
+        client.get('/notify')
+        assert b'Saved!' in client.get('/page').data
+        assert b'Saved!' not in client.get('/page').data
+        assert len(app.renders) == 2
+
+    def test_expired_page_rendered_again(self, cache_app):
+        """Once the TTL passes the next request renders a fresh copy"""
+        app, cache = cache_app
+        app.config['PAGE_CACHE_TTL'] = 0
+        client = app.test_client()
+        client.get('/page')
+        client.get('/page')
+        assert len(app.renders) == 2
+
+    def test_purge(self, cache_app):
+        """Purging a path drops its pages and the next request renders"""
+        app, cache = cache_app
+        client = app.test_client()
+        client.get('/page')
+        assert cache.purge('/other') == 0
+        assert cache.purge('/page') == 1
+        client.get('/page')
+        assert len(app.renders) == 2
+
+    def test_disabled(self, cache_app):
+        """With the cache off every request renders"""
+        app, cache = cache_app
+        app.config['PAGE_CACHE_ENABLED'] = False
+        client = app.test_client()
+        client.get('/page')
+        client.get('/page')
+        assert len(app.renders) == 2
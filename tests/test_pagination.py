@@ -0,0 +1,100 @@
+import pytest
+from datetime import datetime, timedelta
+from src.models import db, User, Story
+from src.utils.pagination import encode_cursor, decode_cursor
+
+def create_shared_stories(user_id, count):
+    """Create shared stories with repeated and missing share dates"""
+    base = datetime(2025, 1, 1)
+    for i in range(count):
+        share_date = None if i % 5 == 0 else base + timedelta(days=i // 3)
+        db.session.add(Story(
+            title=f'Paged Story {i}',
+            description='A story for paging',
+            age_group='7-9',
+            user_id=user_id,
+            is_public=True,
+            is_shared=True,
+            share_date=share_date
+        ))
+    db.session.commit()
+
+def expected_order():
+    """All shared stories by share_date DESC (NULLs last), then id DESC"""
+    stories = Story.query.filter_by(is_public=True, is_shared=True).all()
+    dated = sorted([s for s in stories if s.share_date], key=lambda s: (s.share_date, s.id), reverse=True)
+    undated = sorted([s for s in stories if not s.share_date], key=lambda s: s.id, reverse=True)
+    return [s.id for s in dated + undated]
+
+def get_page(client, cursor=None, per_page=4):
+    """Fetch one JSON page of shared stories"""
+    url = f'/viral/shared?format=json&per_page={per_page}'
+    if cursor:
+        url += f'&cursor={cursor}'
+    response = client.get(url)
+    assert response.status_code == 200
+    return response.get_json()
+
+class TestKeysetPagination:
+    """Cursor pagination across story listing endpoints"""
+    
+    def test_cursor_round_trip(self):
+        """Test that cursors decode to what was encoded and reject junk"""
+        token = encode_cursor('next', '2025-01-01 00:00:00.000000', 7)
+        assert decode_cursor(token) == ('next', '2025-01-01 00:00:00.000000', 7)
+        assert decode_cursor('not-a-cursor') is None
+        assert decode_cursor(encode_cursor('sideways', None, 1)) is None
+    
+    def test_walk_forward_and_back(self, client, app, db, test_user):
+        """Test that next/prev cursors visit every story exactly once, in order"""
+        create_shared_stories(test_user.id, 23)
+        expected = expected_order()
+        
+        seen, pages, cursor = [], [], None
+        while True:
+            page = get_page(client, cursor)
+            pages.append([s['id'] for s in page['stories']])
+            seen.extend(pages[-1])
+            cursor = page['next_cursor']
+            if not cursor:
+                break
+        assert seen == expected
+        assert len(pages) == 6
+        
+        # Walk back from the last page using prev cursors
+        cursor = page['prev_cursor']
+        for previous in reversed(pages[:-1]):
+            page = get_page(client, cursor)
+            assert [s['id'] for s in page['stories']] == previous
+            cursor = page['prev_cursor']
+        assert cursor is None
+    
+    def test_first_page_has_no_prev(self, client, app, db, test_user):
+        """Test the cursors on the first page"""
+        create_shared_stories(test_user.id, 3)
+        page = get_page(client)
+        assert page['prev_cursor'] is None
+        assert page['next_cursor'] is None
+        assert len(page['stories']) == 3
+    
+    def test_invalid_cursor_returns_first_page(self, client, app, db, test_user):
+        """Test that a tampered cursor falls back to the first page"""
+        create_shared_stories(test_user.id, 6)
+        assert get_page(client, 'garbage') == get_page(client)
+    
+    def test_html_next_link(self, client, app, db, test_user):
+        """Test that HTML listings link to the next page"""
+        create_shared_stories(test_user.id, 6)
+        response = client.get('/story/filter?age_group=7-9&per_page=4')
+        assert response.status_code == 200
+        assert b'Next &raquo;' in response.data
+        assert b'cursor=' in response.data
+    
+    @pytest.mark.parametrize('url', ['/story/search?q=Paged', '/story/filter?age_group=7-9'])
+    def test_search_and_filter_json(self, client, app, db, test_user, url):
+        """Test JSON listings for search and filter"""
+        create_shared_stories(test_user.id, 5)
+        response = client.get(url, headers={'Accept': 'application/json'})
+        data = response.get_json()
+        assert len(data['stories']) == 5
+        assert data['stories'][0]['author_username'] == 'testuser'
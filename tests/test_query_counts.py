@@ -0,0 +1,72 @@
+import pytest
+from datetime import datetime, timedelta
+from src.models import db, User, Story, Challenge
+
+def create_stories(start, count, challenge_id=None):
+    """Create public shared stories, each by a different author"""
+    for i in range(start, start + count):
+        user = User(username=f'author{i}', email=f'author{i}@example.com', age_group='7-9', password='unused')
+        db.session.add(user)
+        db.session.flush()
+        db.session.add(Story(
+            title=f'Story {i}',
+            description=f'Story number {i}',
+            age_group='7-9',
+            user_id=user.id,
+            is_public=True,
+            is_shared=True,
+            share_date=datetime.utcnow(),
+            challenge_id=challenge_id
+        ))
+    db.session.commit()
+    db.session.expunge_all()
+
+def count_queries(client, query_counter, url):
+    """Render a page and return how many SQL statements it issued"""
+    del query_counter[:]
+    response = client.get(url)
+    assert response.status_code == 200
+    return len(query_counter)
+
+class TestAuthorLoading:
+    """Story list pages resolve authors in a constant number of queries"""
+    
+    def test_author_relationship(self, app, db):
+        """Test that Story.author is the User backref, not a per-access lookup"""
+        create_stories(0, 1)
+        story = Story.query.first()
+        assert story.author.username == 'author0'
+        assert story in story.author.stories
+    
+    @pytest.mark.parametrize('url', ['/viral/shared', '/story/search?q=Story', '/story/filter?age_group=7-9'])
+    def test_story_list_query_count_is_constant(self, client, app, db, query_counter, url):
+        """Test that rendering N story cards does not issue N author queries"""
+        create_stories(0, 3)
+        few = count_queries(client, query_counter, url)
+        
+        create_stories(3, 12)
+        many = count_queries(client, query_counter, url)
+        
+        assert many == few
+    
+    def test_challenge_page_query_count_is_constant(self, client, app, db, query_counter):
+        """Test that the challenge page batches submitted story authors"""
+        challenge = Challenge(
+            title='Author Challenge',
+            description='Write a story',
+            start_date=datetime.utcnow(),
+            end_date=datetime.utcnow() + timedelta(days=7),
+            difficulty='easy',
+            age_group='7-9'
+        )
+        db.session.add(challenge)
+        db.session.commit()
+        challenge_id = challenge.id
+        
+        create_stories(0, 2, challenge_id)
+        few = count_queries(client, query_counter, f'/viral/challenge/{challenge_id}')
+        
+        create_stories(2, 8, challenge_id)
+        many = count_queries(client, query_counter, f'/viral/challenge/{challenge_id}')
+        
+        assert many == few
@@ -0,0 +1,103 @@
+import pytest
+from datetime import datetime
+from sqlalchemy import tuple_
+from src.models import db, User, Story, StoryLike, Character, Setting, StoryElement, Progress, Challenge
+from tests.query_plans import assert_no_full_scan, assert_index_order
+
+# Queries as issued by routes/story.py, routes/progress.py, routes/viral.py and the models
+HOT_QUERIES = {
+    'story.edit elements': lambda: StoryElement.query.filter_by(story_id=1).order_by(StoryElement.position),
+    'story.edit characters': lambda: Character.query.filter_by(user_id=1),
+    'story.edit settings': lambda: Setting.query.filter_by(user_id=1),
+    'story.search': lambda: Story.query.filter(
+        Story.is_public == True,
+        Story.title.ilike('%dragon%') | Story.description.ilike('%dragon%')
+    ),
+    'story.filter_stories': lambda: Story.query.filter_by(is_public=True, age_group='7-9'),
+    'story.resume progress': lambda: Progress.query.filter_by(user_id=1, story_id=1),
+    'story.characters relationship': lambda: Character.query.filter_by(story_id=1),
+    'story.settings relationship': lambda: Setting.query.filter_by(story_id=1),
+    'story.progress relationship': lambda: Progress.query.filter_by(story_id=1),
+    'Story.get_user_stories': lambda: Story.query.filter_by(user_id=1, is_draft=False).order_by(Story.updated_at.desc()),
+    'Story.get_public_stories': lambda: Story.query.filter_by(is_public=True).order_by(Story.share_date.desc()).limit(10),
+    'Story.get_featured_stories': lambda: Story.query.filter_by(is_public=True).order_by(
+        Story.view_count.desc(), Story.like_count.desc(), Story.created_at.desc()
+    ).limit(6),
+    'viral.view_challenge stories': lambda: Story.query.filter_by(challenge_id=1, is_public=True),
+    'viral.view_challenge user stories': lambda: Story.query.filter_by(user_id=1, challenge_id=None),
+    'viral.shared_stories': lambda: Story.query.filter_by(is_public=True, is_shared=True).order_by(Story.share_date.desc()),
+    'viral.challenge counts': lambda: Story.query.filter(Story.user_id == 1, Story.challenge_id != None),
+    'viral.sharing counts': lambda: Story.query.filter_by(user_id=1, is_shared=True),
+    'StoryLike.has_liked': lambda: db.select(StoryLike.story_id).where(StoryLike.user_id == 1, StoryLike.story_id == 1),
+    'story likes cascade': lambda: StoryLike.query.filter_by(story_id=1),
+    'viral.active challenges': lambda: Challenge.query.filter(
+        Challenge.start_date <= datetime.utcnow(),
+        Challenge.end_date >= datetime.utcnow(),
+        Challenge.is_active == True
+    ),
+    'viral.past challenges': lambda: Challenge.query.filter(
+        Challenge.end_date < datetime.utcnow()
+    ).order_by(Challenge.end_date.desc()).limit(5),
+}
+
+# Hot queries whose ORDER BY an index is meant to answer
+ORDERED_QUERIES = {
+    'story.edit elements', 'Story.get_user_stories', 'Story.get_public_stories',
+    'Story.get_featured_stories', 'viral.shared_stories', 'viral.past challenges',
+}
+
+# Keyset-paginated listings must also read rows in index order, so a deep
+# page is a range seek rather than a sort of every matching row
+PAGED_QUERIES = {
+    'story.search page': lambda: Story.query.filter(
+        Story.is_public == True, tuple_(Story.updated_at, Story.id) < tuple_(datetime.utcnow(), 100)
+    ).order_by(Story.updated_at.desc(), Story.id.desc()).limit(21),
+    'story.filter_stories page': lambda: Story.query.filter(
+        Story.is_public == True, Story.age_group == '7-9',
+        tuple_(Story.updated_at, Story.id) < tuple_(datetime.utcnow(), 100)
+    ).order_by(Story.updated_at.desc(), Story.id.desc()).limit(21),
+    'viral.view_challenge page': lambda: Story.query.filter(
+        Story.challenge_id == 1, Story.is_public == True,
+        tuple_(Story.updated_at, Story.id) < tuple_(datetime.utcnow(), 100)
+    ).order_by(Story.updated_at.desc(), Story.id.desc()).limit(21),
+    'viral.shared_stories page': lambda: Story.query.filter(
+        Story.is_public == True, Story.is_shared == True,
+        tuple_(Story.share_date, Story.id) < tuple_(datetime.utcnow(), 100)
+    ).order_by(Story.share_date.desc(), Story.id.desc()).limit(21),
+    'viral.shared_stories null tail': lambda: Story.query.filter(
+        Story.is_public == True, Story.is_shared == True, Story.share_date.is_(None), Story.id < 100
+    ).order_by(Story.id.desc()).limit(21),
+}
+
+class TestQueryPlans:
+    """Query-plan regression tests for the hot queries"""
+
+    @pytest.mark.parametrize('name', sorted(HOT_QUERIES))
+    def test_hot_query_uses_index(self, app, db, name):
+        """Test that a hot query is answered from an index"""
+        assert_no_full_scan(HOT_QUERIES[name]())
+
+    @pytest.mark.parametrize('name', sorted(ORDERED_QUERIES))
+    def test_hot_query_reads_in_order(self, app, db, name):
+        """Test that a sorted hot query reads rows in index order"""
+        assert_index_order(HOT_QUERIES[name]())
+
+    def test_detects_full_scan(self, app, db):
+        """Test that an unindexed filter is reported as a full scan"""
+        with pytest.raises(AssertionError):
+            assert_no_full_scan(Story.query.filter_by(theme='adventure'))
+        # Walking a whole index is a full scan too
+        with pytest.raises(AssertionError):
+            assert_no_full_scan(Story.query.order_by(Story.updated_at.desc()))
+
+    def test_detects_sort(self, app, db):
+        """Test that an ORDER BY no index matches is reported"""
+        with pytest.raises(AssertionError):
+            assert_index_order(Story.query.filter_by(is_public=True).order_by(Story.title))
+
+    @pytest.mark.parametrize('name', sorted(PAGED_QUERIES))
+    def test_paged_query_avoids_sort(self, app, db, name):
+        """Test that a keyset page seeks an index in sort order"""
+        query = PAGED_QUERIES[name]()
+        assert_no_full_scan(query)
+        assert_index_order(query)
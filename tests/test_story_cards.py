@@ -0,0 +1,41 @@
+import pytest
+from datetime import datetime
+from src.models import db, Story, StoryCard
+
+class TestStoryCards:
+    """Listing pages use StoryCard projections instead of full Story rows"""
+    
+    def test_card_fields(self, app, db, shared_story):
+        """Test that a card carries the listing fields and the author name"""
+        cards = StoryCard.fetch(StoryCard.select().where(Story.id == shared_story.id))
+        assert len(cards) == 1
+        card = cards[0]
+        assert card.title == 'Test Story'
+        assert card.author_username == 'testuser'
+        assert card.is_shared is True
+        assert not hasattr(card, '__dict__')
+        assert not hasattr(card, 'content')
+    
+    def test_card_select_skips_large_columns(self, app, db):
+        """Test that the card select never reads content or share_message"""
+        sql = str(StoryCard.select())
+        assert 'stories.content' not in sql
+        assert 'stories.share_message' not in sql
+    
+    @pytest.mark.parametrize('url, title', [
+        ('/viral/shared', b'Test Story'),
+        ('/story/search?q=Test', b'<mark>Test</mark> Story'),
+        ('/story/filter?age_group=7-9', b'Test Story'),
+    ])
+    def test_listing_pages_use_cards(self, client, app, db, shared_story, query_counter, url, title):
+        """Test that listing pages render without loading story content"""
+        response = client.get(url)
+        assert response.status_code == 200
+        assert title in response.data
+        assert not [s for s in query_counter if 'stories.content' in s]
+    
+    def test_featured_stories(self, app, db, shared_story):
+        """Test that featured stories come back as cards"""
+        featured = Story.get_featured_stories(6)
+        assert [card.id for card in featured] == [shared_story.id]
+        assert isinstance(featured[0], StoryCard)
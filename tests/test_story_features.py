@@ -240,17 +240,19 @@ class TestStoryFeatures:
             db.session.commit()
         
         # Search for "adventure"
+        # Matched words in the result headings are highlighted
         response = client.get('/story/search?q=adventure')
         assert response.status_code == 200
-        assert b'Adventure in the Forest' in response.data
-        assert b'Space Adventure' in response.data
-        assert b'Mystery at Sea' not in response.data
+        assert b'<h5 class="card-title"><mark>Adventure</mark> in the Forest</h5>' in response.data
+        assert b'<h5 class="card-title">Space <mark>Adventure</mark></h5>' in response.data
+        assert b'at Sea' not in response.data
+        assert b'&lt;mark&gt;' not in response.data
         
         # Search for "mystery"
         response = client.get('/story/search?q=mystery')
         assert response.status_code == 200
-        assert b'Mystery at Sea' in response.data
-        assert b'Adventure in the Forest' not in response.data
+        assert b'<h5 class="card-title"><mark>Mystery</mark> at Sea</h5>' in response.data
+        assert b'in the Forest' not in response.data
     
     def test_filter_stories_by_age_group(self, client, app, test_user):
         """Test filtering stories by age group"""
@@ -0,0 +1,94 @@
+import pytest
+from src.models import db, User, Story, StoryCard, StoryLike
+
+def login(client, user):
+    """Log in as a fixture user"""
+    return client.post('/auth/login', data={
+        'username': user.username,
+        'password': 'password123'
+    })
+
+def like_count(story_id):
+    """Stored like_count of a story"""
+    return db.session.execute(db.select(Story.like_count).where(Story.id == story_id)).scalar()
+
+@pytest.fixture
+def other_user(app, db):
+    """A second user to like stories"""
+    user = User(username='otheruser', email='other@example.com', age_group='7-9')
+    user.set_password('password123')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+class TestStoryLikes:
+    """One like per user per story, with idempotent like/unlike endpoints"""
+
+    def test_like_is_idempotent(self, client, app, db, test_user, test_story):
+        """Test that liking twice counts once"""
+        login(client, test_user)
+        first = client.post(f'/viral/story/{test_story.id}/like').get_json()
+        second = client.post(f'/viral/story/{test_story.id}/like').get_json()
+
+        assert first == {'success': True, 'liked': True, 'likes': 1}
+        assert second == {'success': True, 'liked': True, 'likes': 1}
+        assert like_count(test_story.id) == 1
+        assert StoryLike.query.count() == 1
+
+    def test_unlike_is_idempotent(self, client, app, db, test_user, test_story):
+        """Test that unliking removes the like once and never goes negative"""
+        login(client, test_user)
+        client.post(f'/viral/story/{test_story.id}/like')
+        first = client.post(f'/viral/story/{test_story.id}/unlike').get_json()
+        second = client.post(f'/viral/story/{test_story.id}/unlike').get_json()
+
+        assert first == {'success': True, 'liked': False, 'likes': 0}
+        assert second == {'success': True, 'liked': False, 'likes': 0}
+        assert like_count(test_story.id) == 0
+        assert not StoryLike.has_liked(test_user.id, test_story.id)
+
+    def test_unlike_requires_login(self, client, test_story):
+        """Test that unliking needs a logged in user"""
+        response = client.post(f'/viral/story/{test_story.id}/unlike')
+        assert response.get_json()['success'] == False
+
+    def test_likes_from_different_users(self, client, app, db, test_user, other_user, test_story):
+        """Test that each user's like counts"""
+        assert StoryLike.add(test_user.id, test_story.id)
+        assert StoryLike.add(other_user.id, test_story.id)
+        assert not StoryLike.add(test_user.id, test_story.id)
+        db.session.commit()
+
+        assert StoryLike.has_liked(other_user.id, test_story.id)
+        assert StoryLike.query.filter_by(story_id=test_story.id).count() == 2
+
+    def test_annotate_cards_in_one_query(self, app, db, test_user, test_story, query_counter):
+        """Test that a page of cards gets liked flags from a single query"""
+        other = Story(title='Other Story', age_group='7-9', user_id=test_user.id)
+        db.session.add(other)
+        StoryLike.add(test_user.id, test_story.id)
+        db.session.commit()
+        cards = StoryCard.fetch(StoryCard.select().order_by(Story.id))
+
+        query_counter.clear()
+        StoryLike.annotate(cards, test_user.id)
+
+        assert len(query_counter) == 1
+        assert [card.liked for card in cards] == [True, False]
+        assert cards[0].to_dict()['liked'] is True
+
+    def test_annotate_anonymous(self, app, db, test_story, query_counter):
+        """Test that anonymous visitors cost no query"""
+        cards = StoryCard.fetch(StoryCard.select())
+        query_counter.clear()
+        StoryLike.annotate(cards, None)
+        assert query_counter == []
+        assert cards[0].liked is False
+
+    def test_deleting_story_removes_likes(self, app, db, test_user, test_story):
+        """Test that likes go with their story"""
+        StoryLike.add(test_user.id, test_story.id)
+        db.session.commit()
+        db.session.delete(db.session.get(Story, test_story.id))
+        db.session.commit()
+        assert StoryLike.query.count() == 0
@@ -0,0 +1,108 @@
+import json
+import pytest
+from src.models import db, Story, StoryElement, search_stories
+from src.models.story_search import build_match_query
+
+def add_story(user_id, title, description='', content='', age_group='7-9', theme='adventure', is_public=True):
+    """Create a story and return its id"""
+    story = Story(title=title, description=description, content=content, age_group=age_group,
+                  theme=theme, user_id=user_id, is_public=is_public)
+    db.session.add(story)
+    db.session.commit()
+    return story.id
+
+def result_ids(query, **filters):
+    """Ids of the first page of search results"""
+    return [result.id for result in search_stories(query, **filters).items]
+
+class TestStorySearch:
+    """FTS5-backed story search"""
+    
+    def test_match_query_quotes_user_input(self):
+        """Test that FTS5 operators typed by users are treated as words"""
+        assert build_match_query('dragon OR "castle') == '"dragon" "OR" "castle"*'
+        assert build_match_query('  ') is None
+    
+    def test_ranks_title_above_body(self, app, db, test_user):
+        """Test that BM25 ranks title matches above body matches"""
+        body = add_story(test_user.id, 'The Lost Key', content='a dragon slept in the cave')
+        title = add_story(test_user.id, 'The Dragon Who Sneezed', content='once upon a time')
+        assert result_ids('dragon') == [title, body]
+    
+    def test_searches_content_and_elements(self, app, db, test_user):
+        """Test that story content and element text are indexed"""
+        story_id = add_story(test_user.id, 'Plain Title', content='a wizard appears')
+        assert result_ids('wizard') == [story_id]
+        
+        db.session.add(StoryElement(story_id=story_id, element_type='plot_point', position=0,
+                                    content=json.dumps({'text': 'the unicorn galloped'})))
+        db.session.commit()
+        assert result_ids('unicorn') == [story_id]
+    
+    def test_index_follows_updates_and_deletes(self, app, db, test_user):
+        """Test that triggers keep the index in sync with the stories table"""
+        story_id = add_story(test_user.id, 'Robots at School')
+        story = db.session.get(Story, story_id)
+        story.title = 'Pirates at School'
+        db.session.commit()
+        assert result_ids('robots') == []
+        assert result_ids('pirates') == [story_id]
+        
+        db.session.delete(story)
+        db.session.commit()
+        assert result_ids('pirates') == []
+    
+    def test_private_stories_are_hidden(self, app, db, test_user):
+        """Test that only public stories are returned"""
+        add_story(test_user.id, 'Secret Garden', is_public=False)
+        assert result_ids('secret') == []
+    
+    def test_filters(self, app, db, test_user):
+        """Test filtering by age group and theme"""
+        young = add_story(test_user.id, 'Moon Trip', age_group='4-6', theme='space')
+        older = add_story(test_user.id, 'Moon Mystery', age_group='10-12', theme='mystery')
+        assert result_ids('moon', age_group='4-6') == [young]
+        assert result_ids('moon', theme='mystery') == [older]
+    
+    def test_highlight_escapes_html(self, client, app, db, test_user):
+        """Test that highlighted snippets escape story text"""
+        add_story(test_user.id, 'Castle Tale', content='<script>alert(1)</script> the castle gate')
+        response = client.get('/story/search?q=castle&format=json')
+        snippet = response.get_json()['stories'][0]['snippet']
+        assert '<script>' not in snippet
+        assert '<mark>' in snippet
+    
+    def test_results_page_highlights_title(self, client, app, db, test_user):
+        """Test that the results page shows the highlighted, escaped title"""
+        add_story(test_user.id, 'Castle <b>Tale</b>')
+        html = client.get('/story/search?q=castle').get_data(as_text=True)
+        assert '<h5 class="card-title"><mark>Castle</mark> &lt;b&gt;Tale&lt;/b&gt;</h5>' in html
+    
+    def test_result_links_name_their_story(self, client, app, db, test_user):
+        """Test that each Read Story link tells screen readers which story it opens"""
+        add_story(test_user.id, 'Castle "Tale" & <Moat>')
+        add_story(test_user.id, 'Castle Keep')
+        html = client.get('/story/search?q=castle').get_data(as_text=True)
+        assert 'aria-label="Read Castle &#34;Tale&#34; &amp; &lt;Moat&gt;">Read Story</a>' in html
+        assert 'aria-label="Read Castle Keep">Read Story</a>' in html
+    
+    def test_ranked_pagination(self, client, app, db, test_user):
+        """Test that next cursors walk every ranked result once"""
+        ids = {add_story(test_user.id, f'Forest Story {i}', content='forest ' * (i + 1)) for i in range(7)}
+        seen, cursor = [], None
+        while True:
+            url = '/story/search?q=forest&format=json&per_page=3' + (f'&cursor={cursor}' if cursor else '')
+            page = client.get(url).get_json()
+            seen.extend(story['id'] for story in page['stories'])
+            cursor = page['next_cursor']
+            if not cursor:
+                break
+        assert sorted(seen) == sorted(ids)
+        assert len(seen) == len(ids)
+    
+    def test_rebuild_command(self, app, db, runner, test_user):
+        """Test the rebuild-search-index CLI command"""
+        add_story(test_user.id, 'Rebuilt Story')
+        result = runner.invoke(args=['rebuild-search-index'])
+        assert 'Search index rebuilt with 1 stories' in result.output
+        assert len(result_ids('rebuilt')) == 1
@@ -0,0 +1,73 @@
+import pytest
+from datetime import datetime
+from sqlalchemy.exc import InvalidRequestError
+from src.models import db, User, Story, Achievement
+
+def login(client, user):
+    """Log in as a fixture user"""
+    return client.post('/auth/login', data={
+        'username': user.username,
+        'password': 'password123'
+    })
+
+class TestStrictLoading:
+    """Routes declare their relationship loading; strict mode catches the rest"""
+    
+    def test_undeclared_lazy_load_raises(self, app, db, test_story, strict_loading):
+        """Test that strict mode raises on a lazy load no loader option asked for"""
+        db.session.expunge_all()
+        story = Story.query.filter_by(id=test_story.id).first()
+        with pytest.raises(InvalidRequestError):
+            story.author
+    
+    def test_declared_loads_are_allowed(self, app, db, test_story, strict_loading):
+        """Test that explicit loader options still work in strict mode"""
+        db.session.expunge_all()
+        story = Story.with_authors(Story.query.filter_by(id=test_story.id)).first()
+        assert story.author.username == 'testuser'
+        
+        db.session.expunge_all()
+        user = User.get_by_id(story.user_id, options=[db.selectinload(User.achievements)])
+        assert user.achievements == []
+    
+    def test_lazy_by_default(self, app, db, test_user):
+        """Test that loading a user does not pull in achievements"""
+        db.session.expunge_all()
+        user = User.get_by_id(test_user.id)
+        assert 'achievements' not in user.__dict__
+    
+    def test_login(self, client, app, test_user, strict_loading):
+        """Test that login does not touch achievements"""
+        response = login(client, test_user)
+        assert response.status_code == 302
+    
+    def test_achievements_page(self, client, app, db, test_user, test_achievement, strict_loading):
+        """Test that the achievements page loads achievements explicitly"""
+        db.session.expunge_all()
+        user = User.get_by_id(test_user.id, options=[db.selectinload(User.achievements)])
+        user.achievements.append(db.session.get(Achievement, test_achievement.id))
+        db.session.commit()
+        
+        login(client, test_user)
+        response = client.get('/viral/achievements')
+        assert response.status_code == 200
+        assert test_achievement.name.encode() in response.data
+    
+    def test_sharing_awards_achievement(self, client, app, db, test_user, test_story, strict_loading):
+        """Test that the achievement check and award path declares its loads"""
+        db.session.add(Achievement(name='First Share', description='Shared a story', points=5))
+        db.session.commit()
+        
+        login(client, test_user)
+        response = client.post(f'/viral/share/{test_story.id}', data={'share_message': 'Read it!'})
+        assert response.status_code == 200
+        
+        db.session.expunge_all()
+        user = User.get_by_id(test_user.id, options=[db.selectinload(User.achievements)])
+        assert [a.name for a in user.achievements] == ['First Share']
+    
+    def test_shared_stories_page(self, client, app, db, shared_story, strict_loading):
+        """Test that the shared stories page batch-loads authors"""
+        response = client.get('/viral/shared')
+        assert response.status_code == 200
+        assert b'testuser' in response.data
@@ -0,0 +1,64 @@
+import os
+import pytest
+from flask import Flask, render_template
+from src.utils.template_cache import init_template_cache, warm_templates
+
+@pytest.fixture
+def template_dir(tmp_path):
+    templates = tmp_path / 'templates'
+    (templates / 'main').mkdir(parents=True)
+    (templates / 'base.html').write_text('<main>{% block content %}{% endblock %}</main>')
+    (templates / 'main' / 'index.html').write_text(
+        '{% extends "base.html" %}{% block content %}Hello {{ name }}{% endblock %}')
+    return templates
+
+def make_app(template_dir, cache_dir):
+    app = Flask(__name__, template_folder=str(template_dir))
+    app.config['TEMPLATE_BYTECODE_CACHE_DIR'] = str(cache_dir)
+    init_template_cache(app)
+    return app
+
+class TestTemplateCache:
+    def test_warmup_loads_every_template(self, template_dir, tmp_path):
+        """Test that warm-up compiles all templates and stores their bytecode"""
+        app = make_app(template_dir, tmp_path / 'cache')
+        timings = warm_templates(app)
+        assert sorted(timings) == ['base.html', 'main/index.html']
+        assert len(os.listdir(tmp_path / 'cache')) == 2
+        assert len(app.jinja_env.cache) == 2
+
+    def test_new_worker_loads_bytecode(self, template_dir, tmp_path, monkeypatch):
+        """Test that a second app reuses the first one's compiled templates"""
+        warm_templates(make_app(template_dir, tmp_path / 'cache'))
+        app = make_app(template_dir, tmp_path / 'cache')
+        compiled = []
+        original = app.jinja_env.compile
+        monkeypatch.setattr(app.jinja_env, 'compile', lambda *a, **kw: compiled.append(a) or original(*a, **kw))
+        warm_templates(app)
+        assert compiled == []
+        with app.app_context():
+            assert render_template('main/index.html', name='Pip') == '<main>Hello Pip</main>'
+
+    def test_changed_template_recompiled(self, template_dir, tmp_path):
+        """Test that an edited template is not served from stale bytecode"""
+        warm_templates(make_app(template_dir, tmp_path / 'cache'))
+        (template_dir / 'main' / 'index.html').write_text(
+            '{% extends "base.html" %}{% block content %}Goodbye{% endblock %}')
+        app = make_app(template_dir, tmp_path / 'cache')
+        with app.app_context():
+            assert render_template('main/index.html') == '<main>Goodbye</main>'
+
+    def test_broken_template_skipped(self, template_dir, tmp_path):
+        """Test that warm-up logs a template that does not compile and carries on"""
+        (template_dir / 'broken.html').write_text('{% if %}')
+        app = make_app(template_dir, tmp_path / 'cache')
+        assert sorted(warm_templates(app)) == ['base.html', 'main/index.html']
+
+    def test_cache_dir_from_environment(self, template_dir, tmp_path, monkeypatch):
+        """Test that STORYQUEST_TEMPLATE_CACHE_DIR moves the cache out of the instance folder"""
+        monkeypatch.setenv('STORYQUEST_TEMPLATE_CACHE_DIR', str(tmp_path / 'env-cache'))
+        app = Flask(__name__, template_folder=str(template_dir), instance_path=str(tmp_path / 'instance'))
+        init_template_cache(app)
+        warm_templates(app)
+        assert len(os.listdir(tmp_path / 'env-cache')) == 2
+        assert not os.path.exists(tmp_path / 'instance')